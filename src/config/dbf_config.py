@@ -10,8 +10,16 @@ class DBFConfig:
     encryption_password: str = None
     source_directory: str = None
     limit_rows: int = None  # Optional, set to None for no limit
+    parallel_reads: bool = False  # Read receipt tables on worker connections
+    reader_backend: str = 'advantage'  # 'advantage' (encrypted, needs the DLL) or 'mmap' (unencrypted copies)
+    day_cache: bool = False  # Serve closed days of unchanged DBF files from the local day cache
+    cache_dir: str = None  # Directory of the day cache, <project>/cache/dbf by default
+    cache_open_days: int = 2  # Days, counting today, that are always read from the DBF
+    days_in_flight: int = 0  # Days WorkFlow processes at once, 0 processes the whole range in one pass
     
-    def __init__(self, dll_path=None, encryption_password=None, source_directory=None, limit_rows=None):
+    def __init__(self, dll_path=None, encryption_password=None, source_directory=None, limit_rows=None, parallel_reads=None,
+                 reader_backend=None, day_cache=None, cache_dir=None, cache_open_days=None,
+                 days_in_flight=None):
         # Load from .env if values not provided
         limit_rows=None
         load_dotenv()
@@ -20,12 +28,25 @@ class DBFConfig:
         self.encryption_password = encryption_password or os.getenv('DBF_ENCRYPTION_PASSWORD')
         self.source_directory = source_directory or os.getenv('DBF_SOURCE_DIR')
         self.limit_rows = limit_rows
+        if parallel_reads is None:
+            parallel_reads = os.getenv('DBF_PARALLEL_READS', 'False').lower() == 'true'
+        self.parallel_reads = parallel_reads
+        self.reader_backend = (reader_backend or os.getenv('DBF_READER_BACKEND') or 'advantage').lower()
+        if day_cache is None:
+            day_cache = os.getenv('DBF_DAY_CACHE', 'False').lower() == 'true'
+        self.day_cache = day_cache
+        self.cache_dir = cache_dir or os.getenv('DBF_CACHE_DIR') or str(Path(__file__).parent.parent.parent / 'cache' / 'dbf')
+        self.cache_open_days = int(cache_open_days or os.getenv('DBF_CACHE_OPEN_DAYS', '2'))
+        if days_in_flight is None:
+            days_in_flight = os.getenv('DBF_DAYS_IN_FLIGHT', '0')
+        self.days_in_flight = max(int(days_in_flight), 0)
         
         # Validate required fields
-        if not self.dll_path:
-            raise ValueError("dll_path is required. Set it directly or via DBF_DLL_PATH in .env")
-        if not self.encryption_password:
-            raise ValueError("encryption_password is required. Set it directly or via DBF_ENCRYPTION_PASSWORD in .env")
+        if self.reader_backend == 'advantage':
+            if not self.dll_path:
+                raise ValueError("dll_path is required. Set it directly or via DBF_DLL_PATH in .env")
+            if not self.encryption_password:
+                raise ValueError("encryption_password is required. Set it directly or via DBF_ENCRYPTION_PASSWORD in .env")
         if not self.source_directory:
             raise ValueError("source_directory is required. Set it directly or via DBF_SOURCE_DIR in .env")
     
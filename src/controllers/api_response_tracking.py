@@ -75,7 +75,8 @@ class APIResponseTracking:
             item.get('hash'),
             estado,
             action,
-            fecha_date
+            fecha_date,
+            item.get('hash_version')
         )
    
     def _details_completed(self, records):
@@ -134,7 +135,8 @@ class APIResponseTracking:
                     item.get('hash'),
                     estado,
                     action,
-                    fecha_date
+                    fecha_date,
+                    item.get('hash_version')
                 )
 
         return {'done': done, 'execute':execute}
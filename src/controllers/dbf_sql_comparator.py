@@ -1,8 +1,14 @@
 import logging
+import os
 from datetime import datetime, date
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Set, Tuple
 from src.config.db_config import PostgresConnection
 from src.db.postgres_tracking import PostgresTracking
+from src.dbf_enc_reader.converters import parse_legacy_date
+from src.dbf_enc_reader.day_cache import iter_days, day_ranges
+from src.utils.hash_tree import DayTree, build_day_trees
+from src.utils.merge_diff import CREATE, DELETE, NEXT_CHECK, UPDATE, DiffEvent, merge_diff, sort_by_folio
+from src.utils.record_hasher import HASH_VERSION_JSON
 
 
 class DBFSQLComparator:
@@ -10,15 +16,31 @@ class DBFSQLComparator:
     Dedicated class for comparing DBF records with SQL database records.
     Handles both day-level batch comparisons and detailed record-by-record comparisons.
     """
+
+    # Whether lote_diario.arbol_hash was checked in this process
+    _tree_column_ready = False
+    
+    # Diff engines: 'hash' builds dictionaries by folio (compare_records_by_hash),
+    # 'merge' merge-joins both sides ordered by folio (compare_records_by_merge),
+    # 'sql' diffs the DBF hashes in Postgres (compare_records_in_db)
+    ENGINES = ('hash', 'merge', 'sql')
     
-    def __init__(self, db_config: Any = None):
+    # Rows moved to the current hash version per UPDATE while merging
+    REHASH_BATCH_SIZE = 1000
+    
+    def __init__(self, db_config: Any = None, engine: Optional[str] = None):
         """
         Initialize the comparator with database configuration.
         
         Args:
             db_config: Either a PostgresConnection object or a dictionary with database connection parameters.
                        If None, default configuration will be used.
+            engine: Diff engine (see ENGINES), the DIFF_ENGINE setting if None
         """
+        self.engine = (engine or os.getenv('DIFF_ENGINE', 'hash')).lower()
+        if self.engine not in self.ENGINES:
+            raise ValueError(f"Unsupported diff engine {self.engine}, expected one of {self.ENGINES}")
+        
         # Check if db_config is a PostgresConnection object or a dictionary
         if isinstance(db_config, PostgresConnection):
             self.db = db_config
@@ -85,86 +107,140 @@ class DBFSQLComparator:
 
 
     
-    def compare_batch_by_day(self, dbf_records: Dict[str, Any], sql_records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def compare_batch_by_day(self, dbf_records: Dict[str, Any], start_date: date, end_date: date) -> Dict[str, Any]:
         """
-        Compare DBF records with SQL records by the day batch MD5 hash.
+        Compare DBF records with SQL records day by day through the hash trees saved in lote_diario.
+        
+        Days whose root matches their saved tree are skipped without querying
+        their SQL records. In the other days only the folios whose node
+        changed are compared record by record; with the sql engine they are
+        diffed in Postgres and the SQL rows are not fetched, with the merge
+        engine the rows of those days are streamed through a server-side cursor.
         
         Args:
             dbf_records: Dictionary containing DBF records data
-            sql_records: List of SQL records
+            start_date: First day of the range
+            end_date: Last day of the range
             
         Returns:
-            Dictionary with comparison results
+            Dictionary with the same structure as compare_records_by_hash, plus
+            'hash_trees' (trees of the compared days) and 'unchanged_days'
         """
-        # Extract date from first DBF record
-        if not dbf_records or 'data' not in dbf_records or not dbf_records['data']:
-            logging.error("No DBF records to compare")
-            return {"matched": False, "error": "No DBF records to compare"}
-            
-        # Get the first record's date
-        first_record = dbf_records['data'][0]
-        if 'fecha' not in first_record:
-            logging.error("DBF record missing fecha field")
-            return {"matched": False, "error": "DBF record missing fecha field"}
-            
-        # Parse the date from the first record
-        try:
-            # Handle Spanish format with periods in AM/PM (a. m. / p. m.)
-            fecha = first_record['fecha']
-            # Try different date formats - DBF uses MM/DD/YYYY format
-            date_formats = [
-                '%d/%m/%Y %I:%M:%S %p',  # MM/DD/YYYY with AM/PM
-                '%d/%m/%Y %I:%M:%S %a. m.',  # MM/DD/YYYY with Spanish AM
-                '%d/%m/%Y %I:%M:%S %p. m.',  # MM/DD/YYYY with Spanish PM
-                '%d/%m/%Y %H:%M:%S',  # MM/DD/YYYY with 24-hour time
-                '%d/%m/%Y'  # MM/DD/YYYY date only
-            ]
-            
-            record_date = None
-            for fmt in date_formats:
-                try:
-                    # Replace Spanish AM/PM format to standard format if needed
-                    temp_fecha = fecha.replace('a. m.', 'AM').replace('p. m.', 'PM')
-                    record_date = datetime.strptime(temp_fecha, fmt)
-                    print(f"Successfully parsed date {fecha} using format {fmt}")
-                    break
-                except ValueError:
-                    continue
-                   
-            if record_date is None:
-                raise ValueError(f"Could not parse date: {fecha} with any known format")
-                
-            start_date = record_date.date()
-        except Exception as e:
-            logging.error(f"Error parsing date: {e}")
-            return {"matched": False, "error": f"Error parsing date: {e}"}
+        records = dbf_records.get('data') or []
+        trees = build_day_trees(records)
+
+        if not DBFSQLComparator._tree_column_ready:
+            DBFSQLComparator._tree_column_ready = self.tracker.has_hash_tree_column()
+        # Without the arbol_hash column every day is compared and no tree is saved
+        stored = {}
+        if DBFSQLComparator._tree_column_ready:
+            stored = {day: DayTree.from_json(day, data)
+                      for day, data in self.tracker.get_day_trees(start_date, end_date).items()}
+
+        unchanged_days = []
+        changed_days = []
+        changed_folios = set()
+        for day in iter_days(start_date, end_date):
+            tree = trees.get(day) or DayTree(day)
+            previous = stored.get(day)
+            if previous is not None and previous.root == tree.root:
+                unchanged_days.append(day)
+            else:
+                changed_days.append(day)
+                changed_folios.update(tree.changed_folios(previous))
+
+        dbf_folios = {folio for tree in trees.values() for folio in tree.folios}
+        compared_days = set(changed_days)
+        dbf_subset = []
+        for record in records:
+            day = parse_legacy_date(record.get('fecha'))
+            # Records without a valid date are not in any tree, they are always compared
+            if day is None or (day in compared_days and str(record.get('Folio')) in changed_folios):
+                dbf_subset.append(record)
+
+        logging.info(f"Hash trees: {len(unchanged_days)} days unchanged, {len(changed_days)} compared, "
+                     f"{len(dbf_subset)} of {len(records)} folios compared")
+
+        if self.engine == 'sql' and changed_days:
+            # Postgres diffs the changed days, the rows of the folios whose node did not change are left out
+            result = self.compare_records_in_db(dbf_records={'data': dbf_subset}, start_date=start_date,
+                                                end_date=end_date, days=changed_days,
+                                                skip_folios=dbf_folios - changed_folios)
+        elif self.engine in ('merge', 'sql'):
+            # Only the SQL rows of the changed days are streamed, without those of the folios in sync.
+            # The subset is ours, it is sorted in place instead of copied
+            sort_by_folio(dbf_subset, 'Folio', in_place=True)
+            result = self.compare_records_by_merge(dbf_records={'data': dbf_subset}, start_date=start_date,
+                                                   end_date=end_date, days=changed_days,
+                                                   skip_folios=dbf_folios - changed_folios)
+        else:
+            # SQL records are only fetched for the days that changed
+            sql_records = []
+            for low, high in day_ranges(changed_days):
+                sql_records.extend(self.tracker.get_records_by_date_range(low, high))
+            sql_subset = [record for record in sql_records
+                          if str(record.get('folio')) in changed_folios or str(record.get('folio')) not in dbf_folios]
+
+            if not sql_subset:
+                result = self.add_all(dbf_records={'data': dbf_subset})
+            else:
+                result = self.compare_records_by_hash(dbf_records={'data': dbf_subset}, sql_records=sql_subset,
+                                                      start_date=start_date, end_date=end_date)
+        result['hash_trees'] = {day: trees.get(day) or DayTree(day) for day in changed_days}
+        result['unchanged_days'] = unchanged_days
+        return result
+
+    @staticmethod
+    def pending_work(comparison_result: Dict[str, Any]) -> Tuple[Set[str], Set[Any]]:
+        """
+        Get the folios with a create, update or delete and the days of the deletes.
         
-        # Get a single record from lote_diario by start date
-        lote_record = self.tracker.get_single_lote_by_date(start_date)
+        Taken before the retried folios are discarded, so days holding a
+        folio that is not sent because of its retries are not saved as in sync.
         
-        if not lote_record:
-            logging.info(f"No lote record found for date {start_date}")
-            return {"matched": False, "error": f"No lote record found for date {start_date}"}
+        Args:
+            comparison_result: Result of compare_batch_by_day
+            
+        Returns:
+            (pending folios, fecha_emision of the rows to delete)
+        """
+        operations = comparison_result.get('api_operations', {})
+        folios = {str(op.get('folio')) for name in ('create', 'update', 'delete') for op in operations.get(name, [])}
+        deleted_days = {(op.get('sql_record') or {}).get('fecha_emision') for op in operations.get('delete', [])}
+        return folios, deleted_days
+
+    def save_synced_days(self, comparison_result: Dict[str, Any],
+                         pending: Optional[Tuple[Set[str], Set[Any]]] = None) -> List[date]:
+        """
+        Save the hash tree of every compared day that has no pending operation left.
         
-        # Calculate MD5 hash for the DBF records
-        dbf_hash = self._calculate_md5(dbf_records)
-    
-        # Compare the hashes
-        sql_hash = lote_record.get('hash_lote')
-        if not sql_hash:
-            logging.error("SQL record missing hash_lote field")
-            return {"matched": False, "error": "SQL record missing hash_lote field"}
-        
-        is_match = dbf_hash == sql_hash
-        # print(f"DBF Hash: {dbf_hash}")
-        # print(f"SQL Hash: {sql_hash}")
-        
-        # Perform record-by-record comparison directly instead of just checking batch hashes
-        # This ensures we always get the same structure as compare_records_by_hash
-        print("Performing record-by-record comparison...")
-        result = self.compare_records_by_hash(dbf_records, start_date=start_date, end_date=start_date)
+        A saved tree means the day's DBF records were in sync with SQL, so
+        days with creates, updates or deletes, including those of folios
+        discarded by their retries, are compared again on the next run.
+        
+        Args:
+            comparison_result: Result of compare_batch_by_day
+            pending: pending_work of the result taken before discarding the retried
+                     folios, taken from the result as it is now if None
             
-        return result
+        Returns:
+            Days whose tree was saved
+        """
+        if not DBFSQLComparator._tree_column_ready:
+            return []
+        trees = comparison_result.get('hash_trees') or {}
+        pending_folios, deleted_days = pending if pending is not None else self.pending_work(comparison_result)
+
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        saved = []
+        for day, tree in trees.items():
+            if day in deleted_days or pending_folios.intersection(tree.folios):
+                continue
+            if self.tracker.insert_day_tree(f"{stamp}_{day:%Y%m%d}", day, tree.root, tree.to_json(), tree.version):
+                saved.append(day)
+        if saved:
+            logging.info(f"Hash trees saved for {len(saved)} days in sync")
+        return saved
     
     def compare_records_by_hash(self, dbf_records: Dict[str, Any], sql_records, start_date: date, end_date: date) -> Dict[str, Any]:
         """
@@ -208,14 +284,19 @@ class DBFSQLComparator:
         in_sql_only = []  # Records to delete
         matching = []    # Records that don't need any changes (hash matches)
         
+        rehash = []  # (id, hash, hash_version) of matching rows stored with an older hash version
+        
         # Check each DBF record
         for folio, dbf_record in dbf_records_by_folio.items():
             if folio in sql_records_by_folio:
                 sql_record = sql_records_by_folio[folio]
                 
+                # Rows written with another hash version are compared with the record hashed the same way
+                dbf_hash = self._hash_for_version(dbf_record, sql_record.get('hash_version') or HASH_VERSION_JSON)
+                
                 # Compare hashes - if different, it needs to be updated
-                print(f'////////-----------DBF { dbf_record.get('md5_hash')}  vs  SQL {sql_record.get('hash')}')
-                if dbf_record.get('md5_hash') != sql_record.get('hash'):
+                print(f'////////-----------DBF { dbf_hash}  vs  SQL {sql_record.get('hash')}')
+                if dbf_hash != sql_record.get('hash'):
                     # Store mismatched records for update
                     mismatched.append({
                         "folio": folio,
@@ -226,6 +307,8 @@ class DBFSQLComparator:
                         "sql_hash": sql_record.get('hash')
                     })
                 else:
+                    if dbf_hash != dbf_record.get('md5_hash'):
+                        rehash.append((sql_record.get('id'), dbf_record.get('md5_hash'), dbf_record.get('hash_version')))
                     # Store records that match (no changes needed)
                     matching.append({
                         "folio": folio,
@@ -253,6 +336,10 @@ class DBFSQLComparator:
                     "sql_hash": sql_record.get('hash')
                 })
                 
+        # Matching rows move to the current hash version as they are found
+        if rehash:
+            self.tracker.rehash_records(rehash)
+        
         # Organize data by required API operations
         api_operations = {
             "create": in_dbf_only,
@@ -275,6 +362,220 @@ class DBFSQLComparator:
             }
         }
     
+    def iter_operations(self, dbf_records: Dict[str, Any], start_date: date, end_date: date,
+                        sql_records: Optional[List[Dict[str, Any]]] = None,
+                        days: Optional[List[date]] = None,
+                        skip_folios: Optional[Set[str]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Stream the API operations of the DBF records against SQL, ordered by folio.
+        
+        Both sides are merge-joined by folio (see merge_diff). The SQL rows
+        are read through a server-side cursor unless they are given, so
+        neither side is indexed by folio and each operation is produced as
+        soon as its folio is reached. The DBF records are already in memory,
+        they are sorted by folio without a copy when their list is already
+        in that order.
+        
+        Args:
+            dbf_records: Dictionary containing DBF records data
+            start_date: The start date to query records for
+            end_date: The end date to query records for
+            sql_records: Already fetched SQL rows to compare with, in any order
+            days: Days of the range whose SQL rows are streamed, all if None
+            skip_folios: Folios known to be in sync, their SQL rows are not taken as deletes
+            
+        Yields:
+            (operation, entry) with the operation name of api_operations and
+            an entry like those of compare_records_by_hash
+        """
+        dbf_stream = sort_by_folio(dbf_records.get('data') or [], 'Folio')
+        if sql_records is not None:
+            sql_stream = sort_by_folio(sql_records, 'folio')
+        elif days is not None and not days:
+            sql_stream = iter(())
+        else:
+            sql_stream = self.tracker.iter_records_by_date_range(start_date, end_date, days=days)
+        if skip_folios:
+            sql_stream = (record for record in sql_stream if str(record.get('folio')) not in skip_folios)
+        
+        rehash = []  # (id, hash, hash_version) of matching rows stored with an older hash version
+        for event in merge_diff(dbf_stream, sql_stream, self._hash_for_version):
+            if event.operation == NEXT_CHECK and event.dbf_hash != event.dbf_record.get('md5_hash'):
+                rehash.append((event.sql_record.get('id'), event.dbf_record.get('md5_hash'),
+                               event.dbf_record.get('hash_version')))
+                if len(rehash) >= self.REHASH_BATCH_SIZE:
+                    self.tracker.rehash_records(rehash)
+                    rehash = []
+            yield event.operation, self._operation_entry(event)
+        
+        if rehash:
+            self.tracker.rehash_records(rehash)
+    
+    def compare_records_by_merge(self, dbf_records: Dict[str, Any], start_date: date, end_date: date,
+                                 sql_records: Optional[List[Dict[str, Any]]] = None,
+                                 days: Optional[List[date]] = None,
+                                 skip_folios: Optional[Set[str]] = None,
+                                 keep_matching: bool = False) -> Dict[str, Any]:
+        """
+        Compare DBF records with database records by hash with the streaming merge engine.
+        
+        The operations are consumed from iter_operations as they are produced.
+        Only the creates, updates and deletes are kept; matching folios are
+        counted, so their SQL rows are released as soon as they are compared.
+        
+        Args:
+            dbf_records: Dictionary containing DBF records data
+            start_date: The start date to query records for
+            end_date: The end date to query records for
+            sql_records: Already fetched SQL rows, streamed from the database if None
+            days: Days of the range whose SQL rows are streamed, all if None
+            skip_folios: Folios known to be in sync, their SQL rows are not taken as deletes
+            keep_matching: Keep the next_check entries of the matching folios too
+            
+        Returns:
+            Dictionary with the same structure as compare_records_by_hash, its
+            next_check list is empty unless keep_matching. With no SQL records
+            every DBF record is a create, as with add_all.
+        """
+        api_operations = {CREATE: [], UPDATE: [], DELETE: [], NEXT_CHECK: []}
+        counts = dict.fromkeys(api_operations, 0)
+        for operation, entry in self.iter_operations(dbf_records, start_date, end_date, sql_records,
+                                                     days=days, skip_folios=skip_folios):
+            counts[operation] += 1
+            if operation != NEXT_CHECK or keep_matching:
+                api_operations[operation].append(entry)
+        
+        logging.info(f"Merge diff: {counts[CREATE]} create, {counts[UPDATE]} update, "
+                     f"{counts[DELETE]} delete, {counts[NEXT_CHECK]} matching")
+        return {
+            "status": "completed",
+            "total_dbf_records": counts[CREATE] + counts[UPDATE] + counts[NEXT_CHECK],
+            "total_sql_records": counts[UPDATE] + counts[DELETE] + counts[NEXT_CHECK],
+            "api_operations": api_operations,
+            "summary": {
+                "create_count": counts[CREATE],
+                "update_count": counts[UPDATE],
+                "delete_count": counts[DELETE],
+                "matching_count": counts[NEXT_CHECK],
+                "total_actions_needed": counts[CREATE] + counts[UPDATE] + counts[DELETE]
+            }
+        }
+    
+    def compare_records_in_db(self, dbf_records: Dict[str, Any], start_date: date, end_date: date,
+                              days: Optional[List[date]] = None,
+                              skip_folios: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """
+        Compare DBF records with database records by hash inside Postgres.
+        
+        The (folio, hash_version, hash) tuples of the DBF records, including
+        their compat hashes, are copied to a temporary table and diffed with
+        estado_factura_venta in one query (PostgresTracking.diff_by_folio).
+        Only the folio, the operation and the row's id, hash_version and
+        fecha_emision come back. As with the other engines, the folios of
+        the retries ignore list are discarded afterwards by
+        MatchesProcess.dischard_by_retries.
+        
+        Args:
+            dbf_records: Dictionary containing DBF records data
+            start_date: The start date to query records for
+            end_date: The end date to query records for
+            days: Days of the range whose SQL rows are compared, all if None
+            skip_folios: Folios known to be in sync, their SQL rows are not taken as deletes
+            
+        Returns:
+            Dictionary with the same structure as compare_records_by_hash. The
+            sql_record of the entries only has id, folio, hash_version and fecha_emision.
+        """
+        dbf_records_by_folio = {}
+        for record in dbf_records.get('data') or []:
+            if record.get('Folio') and record.get('md5_hash'):
+                dbf_records_by_folio[str(record.get('Folio'))] = record
+        
+        def hashes():
+            for folio, record in dbf_records_by_folio.items():
+                yield folio, record.get('hash_version', HASH_VERSION_JSON), record.get('md5_hash')
+                for version, compat_hash in (record.get('compat_hashes') or {}).items():
+                    yield folio, version, compat_hash
+        
+        api_operations = {CREATE: [], UPDATE: [], DELETE: [], NEXT_CHECK: []}
+        rehash = []  # (id, hash, hash_version) of matching rows stored with an older hash version
+        for row in self.tracker.diff_by_folio(hashes(), start_date, end_date, days):
+            folio = row['folio']
+            if skip_folios and folio in skip_folios:
+                continue
+            dbf_record = dbf_records_by_folio.get(folio)
+            sql_record = None
+            dbf_hash = dbf_record.get('md5_hash') if dbf_record else None
+            if row['operation'] != CREATE:
+                sql_record = {'id': row['id'], 'folio': folio, 'hash_version': row['hash_version'],
+                              'fecha_emision': row['fecha_emision']}
+            if dbf_record is not None and sql_record is not None:
+                dbf_hash = self._hash_for_version(dbf_record, row['hash_version'] or HASH_VERSION_JSON)
+                if row['operation'] == NEXT_CHECK and dbf_hash != dbf_record.get('md5_hash'):
+                    rehash.append((row['id'], dbf_record.get('md5_hash'), dbf_record.get('hash_version')))
+            event = DiffEvent(row['operation'], folio, dbf_record, sql_record, dbf_hash)
+            api_operations[event.operation].append(self._operation_entry(event))
+        
+        if rehash:
+            self.tracker.rehash_records(rehash)
+        
+        counts = {operation: len(entries) for operation, entries in api_operations.items()}
+        return {
+            "status": "completed",
+            "total_dbf_records": len(dbf_records_by_folio),
+            "total_sql_records": counts[UPDATE] + counts[DELETE] + counts[NEXT_CHECK],
+            "api_operations": api_operations,
+            "summary": {
+                "create_count": counts[CREATE],
+                "update_count": counts[UPDATE],
+                "delete_count": counts[DELETE],
+                "matching_count": counts[NEXT_CHECK],
+                "total_actions_needed": counts[CREATE] + counts[UPDATE] + counts[DELETE]
+            }
+        }
+    
+    @staticmethod
+    def _operation_entry(event: DiffEvent) -> Dict[str, Any]:
+        """
+        Get the api_operations entry of a diff event, as compare_records_by_hash builds it.
+        
+        The entries reference the DBF record and SQL row, they are not copied.
+        
+        Args:
+            event: Event of merge_diff
+            
+        Returns:
+            The entry
+        """
+        if event.operation == CREATE:
+            return {"folio": event.folio, "dbf_record": event.dbf_record, "dbf_hash": event.dbf_record.get('md5_hash')}
+        if event.operation == DELETE:
+            return {"id": int(event.sql_record.get('id', 0)), "folio": event.folio,
+                    "sql_record": event.sql_record, "sql_hash": event.sql_record.get('hash')}
+        entry = {"folio": event.folio, "id": int(event.sql_record.get('id', 0)),
+                 "dbf_record": event.dbf_record, "sql_record": event.sql_record}
+        if event.operation == UPDATE:
+            entry.update(dbf_hash=event.dbf_record.get('md5_hash'), sql_hash=event.sql_record.get('hash'))
+        else:
+            entry["hash"] = event.dbf_record.get('md5_hash')  # Both hashes are the same
+        return entry
+    
+    @staticmethod
+    def _hash_for_version(dbf_record: Dict[str, Any], version: int) -> Optional[str]:
+        """
+        Get the hash of a DBF record made with a given hash version.
+        
+        Args:
+            dbf_record: DBF record with md5_hash, hash_version and compat_hashes
+            version: Hash version of the SQL row it is compared with
+            
+        Returns:
+            The hash, or None if the record was not hashed with that version
+        """
+        if version == dbf_record.get('hash_version', HASH_VERSION_JSON):
+            return dbf_record.get('md5_hash')
+        return (dbf_record.get('compat_hashes') or {}).get(version)
+    
     def _calculate_md5(self, dbf_records: Dict[str, Any]) -> str:
         """
         Calculate MD5 hash for DBF records.
@@ -285,11 +586,7 @@ class DBFSQLComparator:
         Returns:
             MD5 hash as string
         """
-        import hashlib
-        import json
-        
-        # Generate hash for the entire dataset
-        dataset_str = json.dumps(dbf_records['data'], sort_keys=True)
-        dataset_hash = hashlib.md5(dataset_str.encode('utf-8')).hexdigest()
+        from src.utils.record_hasher import RecordHasher
         
-        return dataset_hash
+        # The dataset hash is built from the record hashes, as in MatchesProcess.get_dbf_data
+        return RecordHasher.combine(record['md5_hash'] for record in dbf_records['data'])
@@ -2,11 +2,11 @@ import os
 import sys
 from datetime import date
 import hashlib
-from turtle import reset
 
 from requests import post
 from src.config.db_config import PostgresConnection
 from src.db.detail_tracking import DetailTracking
+from src.utils.record_hasher import HASH_VERSION_JSON
 from .send_details import SendDetails
 
 
@@ -143,6 +143,8 @@ class DetailsController:
                             'parent_id': record.get('id'),
                             'fecha': fecha,
                             'detail_hash':detail.get('detail_hash'),
+                            'hash_version': detail.get('hash_version'),
+                            'compat_hashes': detail.get('compat_hashes'),
                             'operation': 'next_check'  # Mark as next_check operation
                         })
         
@@ -193,6 +195,10 @@ class DetailsController:
     def process_operations(self, data, send_details): #receive data and send_details object to post data
         operations = data["operations"]
         
+        # Matching rows move to the current hash version as they are found
+        if data.get("rehash"):
+            DetailTracking(self.db).rehash_details(data["rehash"])
+        
         # Process CREATE operations if data exists
         if operations["create"]:  # Checks if list is non-empty
             # Add your create validation/processing logic here
@@ -279,6 +285,7 @@ class DetailsController:
         to_update = []
         to_delete = []
         unchanged = []
+        rehash = []  # (id, hash_detalle, hash_version) of matching rows stored with an older hash version
 
         # Process records only in combined (create)
         for key in set(combined_counts) - set(sql_counts):
@@ -325,7 +332,9 @@ class DetailsController:
             if combined_master:
                 print(f' master {combined_master}')
                 for sql_item in sql_items[key]:
-                    if sql_item['hash_detalle'] != combined_master['detail_hash']:
+                    # Rows written with another hash version are compared with the partida hashed the same way
+                    detail_hash = self._hash_for_version(combined_master, sql_item.get('hash_version') or HASH_VERSION_JSON)
+                    if sql_item['hash_detalle'] != detail_hash:
                         to_update.append({
                             'sql_id': sql_item['id'],
                             'folio': key[0],
@@ -333,10 +342,13 @@ class DetailsController:
                             'fecha': combined_master['fecha'],
                             'old_hash': sql_item['hash_detalle'],
                             'detail_hash': combined_master['detail_hash'],
+                            'hash_version': combined_master.get('hash_version'),
                             'accion':'modificado',
                             'details': combined_master,
                             'parent_id': combined_master.get('parent_id',None)
                         })
+                    elif detail_hash != combined_master['detail_hash']:
+                        rehash.append((sql_item['id'], combined_master['detail_hash'], combined_master.get('hash_version')))
         print(f'PARA BORRAR delete {to_delete}')
         print(f'PARA BORRAR diff {difference}')
       
@@ -346,6 +358,7 @@ class DetailsController:
                 "update": to_update,
                 "delete": to_delete
             },
+            "rehash": rehash,
             "metadata": {
                 "total_combined": len(combined_details),
                 "total_sql": len(sql_records),
@@ -354,6 +367,22 @@ class DetailsController:
             }
         }
 
+    @staticmethod
+    def _hash_for_version(detail, version):
+        """
+        Get the hash of a partida made with a given hash version.
+        
+        Args:
+            detail: Combined detail with detail_hash, hash_version and compat_hashes
+            version: Hash version of the detalle_estado row it is compared with
+            
+        Returns:
+            The hash, or None if the partida was not hashed with that version
+        """
+        if version == (detail.get('hash_version') or HASH_VERSION_JSON):
+            return detail.get('detail_hash')
+        return (detail.get('compat_hashes') or {}).get(version)
+
     def print_sync_report(self, analysis_result):
         """Updated print function with accurate duplicate counts"""
         ops = analysis_result['operations']
@@ -1,7 +1,6 @@
 import os
 import sys
 import logging
-from turtle import st
 from pathlib import Path
 from src.config.db_config import PostgresConnection
 import hashlib
@@ -17,6 +16,8 @@ from src.models.ventas_model import VentasModel
 from src.controllers.dbf_sql_comparator import DBFSQLComparator
 from src.controllers.insertion_process import InsertionProcess
 from src.db.retries_tracking import RetriesTracking
+from src.db.velneo_mapping_cache import VelneoMappingCache
+from src.utils.record_hasher import RecordHasher, get_compat_versions
 
 class MatchesProcess:
 
@@ -44,6 +45,11 @@ class MatchesProcess:
         print(f"Looking for records with date exactly matching: {start_date} - {end_date}")
         
         
+        # The Velneo mappings are loaded and revalidated while the DBF files are read,
+        # DataMap waits for them before building the payloads
+        if os.getenv('VELNEO_MAP_CACHE', 'True').lower() == 'true':
+            VelneoMappingCache.warm_up(self.db_config)
+
         #fetch dbf data
         dbf_results = self.get_dbf_data(config, start_date, end_date)
 
@@ -52,22 +58,39 @@ class MatchesProcess:
         # Process DBF data through DataMap for API formatting
         dbf_results = self.db_map_implementations(dbf_results)
         
-        # Obtener registros SQL
-        sql_records = self.get_sql_data(start_date, end_date)
-        
-        if not sql_records:
-            print(f"No hay registros en SQL entre {start_date} y {end_date}. Insertando nuevos registros")
-            # When no SQL records, use add_all to directly process all DBF records
-            comparison_result = self.comparator.add_all(dbf_records=dbf_results)
+        use_hash_tree = os.getenv('HASH_TREE', 'True').lower() == 'true'
+        if use_hash_tree:
+            # Skip the days, and inside the others the folios, whose hash tree did not change
+            comparison_result = self.comparator.compare_batch_by_day(dbf_results, start_date, end_date)
+        elif self.comparator.engine == 'sql':
+            # Only the folios and their operations come back from Postgres
+            comparison_result = self.comparator.compare_records_in_db(dbf_records=dbf_results, start_date=start_date, end_date=end_date)
+        elif self.comparator.engine == 'merge':
+            # SQL rows are streamed ordered by folio and merge-joined with the DBF records
+            comparison_result = self.comparator.compare_records_by_merge(dbf_records=dbf_results, start_date=start_date, end_date=end_date)
         else:
-            # When SQL records exist, compare them with DBF records
-            comparison_result = self.comparator.compare_records_by_hash(dbf_records=dbf_results, sql_records=sql_records, start_date=start_date, end_date=end_date)
+            # Obtener registros SQL
+            sql_records = self.get_sql_data(start_date, end_date)
+            
+            if not sql_records:
+                print(f"No hay registros en SQL entre {start_date} y {end_date}. Insertando nuevos registros")
+                # When no SQL records, use add_all to directly process all DBF records
+                comparison_result = self.comparator.add_all(dbf_records=dbf_results)
+            else:
+                # When SQL records exist, compare them with DBF records
+                comparison_result = self.comparator.compare_records_by_hash(dbf_records=dbf_results, sql_records=sql_records, start_date=start_date, end_date=end_date)
         
         # Print summary of operations
         self.print_comparison_results(comparison_result)
 
+        # Folios discarded by their retries still keep their day from being saved as in sync
+        pending = self.comparator.pending_work(comparison_result) if use_hash_tree else None
+
         self.dischard_by_retries(comparison_result, start_date, end_date)
 
+        if use_hash_tree:
+            self.comparator.save_synced_days(comparison_result, pending)
+
         # print('STOP')
         # sys.exit()
 
@@ -93,25 +116,31 @@ class MatchesProcess:
         
     def get_dbf_data(self, config, start_date, end_date):
         """Obtiene datos DBF y agrega hashes MD5"""
-        import hashlib
-        import json
-        
         # Initialize mapping manager
         mapping_file = Path(project_root) / "mappings.json"
         mapping_manager = MappingManager(str(mapping_file))
         controller = VentasController(mapping_manager, config)
         
         # Obtener datos originaales
-        data = controller.get_sales_in_range(start_date, end_date)
-        
-        # Agregar hash MD5 a cada registro
-        for i, record in enumerate(data):
-            record_str = json.dumps(record, sort_keys=True)
-            record['md5_hash'] = hashlib.md5(record_str.encode('utf-8')).hexdigest()
-        
-        # Generar hash para todo el dataset
-        dataset_str = json.dumps(data, sort_keys=True)
-        dataset_hash = hashlib.md5(dataset_str.encode('utf-8')).hexdigest()
+        try:
+            data = controller.get_sales_in_range(start_date, end_date)
+        finally:
+            controller.close()
+        
+        # Agregar hash a cada registro, el hash del dataset se arma con los de los registros.
+        # Con las versiones anteriores se calculan tambien para comparar las filas aun no migradas
+        hasher = RecordHasher()
+        compat_versions = get_compat_versions(hasher.version)
+        for record in data:
+            if compat_versions:
+                hashes = hasher.hash_record_versions(record, [hasher.version, *compat_versions])
+                record['md5_hash'] = hashes.pop(hasher.version)
+                record['compat_hashes'] = hashes
+                hasher.add_digest(record['md5_hash'])
+            else:
+                record['md5_hash'] = hasher.add(record)
+            record['hash_version'] = hasher.version
+        dataset_hash = hasher.dataset_hash()
         
         return {
             'data': data,
@@ -206,12 +235,22 @@ class MatchesProcess:
         
         # Initialize the DataMap class
         data_mapper = DataMap()
+        hasher = RecordHasher()
+        compat_versions = get_compat_versions(hasher.version)
         
-        # Create a deep copy of the original structure to preserve it
+        # Records are updated in place, the header-level values are shared with
+        # the partidas through Partida.attach instead of being copied to each one
         processed_results = dbf_results.copy()
         
         if dbf_results and 'data' in dbf_results and dbf_results['data']:
-            for i, record in enumerate(dbf_results['data']):
+            # Resolve the articulos of every partida in a few batched queries
+            data_mapper.prefetch_articulos(
+                detail.get('REF')
+                for record in dbf_results['data'] if record.get('Cabecera') == 'FA'
+                for detail in (record.get('detalles') or [])
+            )
+            
+            for record in dbf_results['data']:
                 # Check if this is a valid invoice record with the expected structure
                 if 'Cabecera' in record and record['Cabecera'] == 'FA':
                     # Process the header (factura)
@@ -231,45 +270,31 @@ class MatchesProcess:
                     header_mapped = data_mapper.process_record_fac(header_data)
                     
                     # Add mapped fields to the original record
-                    for key, value in header_mapped.items():
-                        processed_results['data'][i][key] = value
+                    record.update(header_mapped)
                     
                     # Process the detail records if they exist
                     if 'detalles' in record and isinstance(record['detalles'], list):
-                        for j, detail in enumerate(record['detalles']):
-                            # Add any missing references from the header that might be needed
-                            detail_with_refs = detail.copy()
-                            
-                            # Generate hash from original detail before adding any mapped fields
-                            detail_str = str(sorted(detail.items()))
-                            detail_with_refs['detail_hash'] = hashlib.md5(detail_str.encode()).hexdigest()
+                        for detail in record['detalles']:
+                            # Generate hash from original detail before adding any mapped fields,
+                            # with the older versions too for the partidas not migrated yet
+                            if compat_versions:
+                                hashes = hasher.hash_detail_versions(detail, [hasher.version, *compat_versions])
+                                detail['detail_hash'] = hashes.pop(hasher.version)
+                                detail['compat_hashes'] = hashes
+                            else:
+                                detail['detail_hash'] = hasher.hash_detail(detail)
+                            detail['hash_version'] = hasher.version
                             
-                            # Add references from header
-                            detail_with_refs['metodo_pago'] = record.get('fpg')  # Copy payment method from header
-                            detail_with_refs['hor'] = record.get('hor')
-                            detail_with_refs['emp'] = record.get('emp')
-                            detail_with_refs['emp_div'] = record.get('emp_div')
-                            detail_with_refs['ser_vta'] = record.get('ser_vta')
-                            detail_with_refs['clt'] = record.get('clt')
+                            # Payment method, hour, emp, emp_div, ser_vta, clt and alm come from the header
+                            detail.attach(record)
                             
-                            # Get mapped fields for the detail
-                            detail_mapped = data_mapper.process_record_det(detail_with_refs)
-                            
-                            # Add mapped fields to the original detail record
-                            for key, value in detail_mapped.items():
-                                processed_results['data'][i]['detalles'][j][key] = value
+                            # Add the mapped fields of the detail itself
+                            detail.update(data_mapper.process_detail_fields(detail))
                     
                     # Process the receipts records if they exist
                     if 'recibos' in record and isinstance(record['recibos'], list):
-                        for n, receipt in enumerate(record['recibos']):
-                            receipt_with_refs = receipt.copy()
-                            
-                             # Get mapped fields for the detail
-                            recepit_mapped = data_mapper.process_record_rec(receipt_with_refs)
-                            
-                            # Add mapped fields to the original detail record
-                            for key, value in recepit_mapped.items():
-                                processed_results['data'][i]['recibos'][n][key] = value
+                        for receipt in record['recibos']:
+                            receipt.update(data_mapper.process_receipt_fields(receipt))
         
         return processed_results
 
@@ -64,6 +64,7 @@ class InsertionProcess:
                     'total_partidas': len(record.get('detalles', [])) if record.get('detalles') is not None else 0,
                     'descripcion': f"empleado : {record.get('empleado')}",
                     'hash': md5_hash,
+                    'hash_version': record.get('hash_version'),
                     'fecha_emision': fecha_emision
                 })
                 valid_records += 1
@@ -5,6 +5,9 @@ from .api_response_tracking import APIResponseTracking
 from .send_request import SendRequest
 from .details_controller import DetailsController
 from .op import OP
+from src.dbf_enc_reader.session import DBFSession
+from src.dbf_enc_reader.day_cache import iter_days
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import date
 import os
 import sys
@@ -13,6 +16,11 @@ import logging
 class WorkFlow:
     def start(self, config, start_date, end_date):
 
+        if getattr(config, 'days_in_flight', 0) > 0:
+            # Returns the summed summary and the summary of each day instead of the
+            # comparison result, the api_operations of a day are released once sent
+            return self.start_by_day(config, start_date, end_date)
+
         self.matches_process = MatchesProcess()
         result = self.matches_process.compare_data(config, start_date, end_date)
         print(f' MAIN W Result {result}')
@@ -92,4 +100,98 @@ class WorkFlow:
             #     #check anyways the details
             
 
-        return  result 
\ No newline at end of file
+        return  result
+
+    def start_by_day(self, config, start_date, end_date, days=None):
+        """
+        Runs the workflow one day at a time, with config.days_in_flight days
+        processed at once. A day is only submitted when one of the days in
+        flight is done, and only its summary is kept once it is sent, so
+        memory is bounded by the days in flight. A day that fails is logged
+        and reported without stopping the others.
+        
+        Days in flight share no per-day state (see _run_day): each one gets
+        its own MatchesProcess (comparator, trackers), OP and DBF session,
+        and every Postgres call opens its own connection. Only the Velneo
+        mapping cache is shared, it is guarded by its own locks.
+        
+        Args:
+            config: DBFConfig instance
+            start_date: First day of the range
+            end_date: Last day of the range
+            days: Optional list of days to run instead of the whole range,
+                  e.g. the failed days of a previous run
+            
+        Returns:
+            dict: {'status', 'summary': counts of the comparison summaries summed over the days,
+                   'days': {day: summary of the day}, 'failed': {day: error message}}
+        """
+        days = sorted(days) if days else list(iter_days(start_date, end_date))
+        days_in_flight = max(getattr(config, 'days_in_flight', 1), 1)
+        logging.info(f"Processing {len(days)} days, {days_in_flight} at a time")
+
+        summaries = {}
+        failed = {}
+        pending = iter(days)
+        with ThreadPoolExecutor(max_workers=days_in_flight, thread_name_prefix='day') as executor:
+            in_flight = {}
+            while True:
+                for day in pending:
+                    in_flight[executor.submit(self._run_day, config, day)] = day
+                    if len(in_flight) >= days_in_flight:
+                        break
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    day = in_flight.pop(future)
+                    try:
+                        summaries[day] = future.result()
+                    except Exception as e:
+                        logging.error(f"Day {day} failed: {e}", exc_info=True)
+                        failed[day] = str(e)
+
+        if failed:
+            print(f"Failed days: {', '.join(str(day) for day in sorted(failed))}")
+            logging.error(f"Failed days, run them again with start_by_day(days=...): {sorted(failed)}")
+        else:
+            logging.info(f"All {len(days)} days processed")
+
+        total = {}
+        for summary in summaries.values():
+            for key, count in summary.items():
+                if isinstance(count, int):
+                    total[key] = total.get(key, 0) + count
+
+        return {
+            'status': 'failed_days' if failed else 'completed',
+            'summary': total,
+            'days': dict(sorted(summaries.items())),
+            'failed': failed,
+        }
+
+    def _run_day(self, config, day):
+        """
+        Compares and sends the records of a single day.
+        
+        Runs in a worker thread of start_by_day, so it builds everything it
+        uses instead of reusing self.matches_process or another day's objects.
+        
+        Args:
+            config: DBFConfig instance
+            day: Day to process
+            
+        Returns:
+            dict: Summary of the day's comparison, empty if there was no result
+        """
+        try:
+            result = MatchesProcess().compare_data(config, day, day)
+            if not result:
+                return {}
+            if len(result['api_operations']['create'])==0:
+                logging.info(f'Nothing to send for {day}...')
+            OP().execute(result['api_operations'])
+            return dict(result.get('summary') or {})
+        finally:
+            # Each worker thread has its own DBF connection, release it with the day
+            DBFSession.close_thread_sessions()
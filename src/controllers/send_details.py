@@ -93,6 +93,7 @@ class SendDetails:
                     "fecha": record.get('fecha'),
                     'success': False,
                     'hash_detail': record.get('detail_hash'),
+                    'hash_version': record.get('hash_version'),
                     'detail_id':record.get('sql_id')
                 }
                 
@@ -238,7 +239,8 @@ class SendDetails:
                     'status_code': status_code,
                     "fecha": self._format_date_to_iso(parent_ref.get("fecha")),
                     'success': False,
-                    'hash_detail': record.get('detail_hash')
+                    'hash_detail': record.get('detail_hash'),
+                    'hash_version': record.get('hash_version')
                 }
                 
                 # Check if the request was successful
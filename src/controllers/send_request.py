@@ -1,7 +1,5 @@
-from ast import Try
 import os
 import sys
-from turtle import st
 from pathlib import Path
 from src.config.db_config import PostgresConnection
 from src.db.response_tracking import ResponseTracking
@@ -131,6 +129,7 @@ class SendRequest:
                         'fecha_emision': dbf_record.get('fecha'),
                         'total_partidas': len(dbf_record.get('detalles', [])),
                         'hash': "",
+                        'hash_version': dbf_record.get('hash_version'),
                         'status': 500,
                         'error_msg': "Skipped due to empty recibos or partidas"
                     })
@@ -238,6 +237,7 @@ class SendRequest:
                             'fecha_emision': dbf_record.get('fecha'),
                             'total_partidas': len(dbf_record.get('detalles', [])),
                             'hash': record.get('dbf_hash', ''),
+                            'hash_version': dbf_record.get('hash_version'),
                             # 'details': dbf_record.get('detalles', []),
                             # 'receipts': dbf_record.get('recibos', []),
                             'status': response.status_code,
@@ -266,6 +266,7 @@ class SendRequest:
                                     # Add art from the matching detail
                                     partida_data['art'] = matching_detail.get('art', '')
                                     partida_data['detail_hash'] = matching_detail.get('detail_hash', '')
+                                    partida_data['hash_version'] = matching_detail.get('hash_version')
                                     # Check for REF in both uppercase and lowercase keys
                                     if 'REF' in matching_detail:
                                         partida_data['ref'] = matching_detail['REF']
@@ -343,6 +344,7 @@ class SendRequest:
                         'fecha_emision': dbf_record.get('fecha'),
                         'total_partidas': len(dbf_record.get('detalles', [])),
                         'hash': record.get('dbf_hash', ''),
+                        'hash_version': dbf_record.get('hash_version'),
                         'status': response.status_code,
                         'error_msg': f"Error processing response: {str(e)}"
                     })
@@ -357,6 +359,7 @@ class SendRequest:
                     'fecha_emision': dbf_record.get('fecha'),
                     'total_partidas': len(dbf_record.get('detalles', [])),
                     'hash': record.get('dbf_hash', ''),
+                    'hash_version': dbf_record.get('hash_version'),
                     'status': response.status_code,
                     'error_msg': error_message
                 })
@@ -370,6 +373,7 @@ class SendRequest:
                 'folio': folio, 
                 'fecha_emision': dbf_record.get('fecha'),
                 'hash': record.get('dbf_hash', ''),
+                'hash_version': dbf_record.get('hash_version'),
                 'status': None,
                 'error_msg': error_message
             })
@@ -1,16 +1,28 @@
 from datetime import datetime, timedelta, date
 import logging
-from typing import Dict, Any, List
-import json
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import replace
 from ..dbf_enc_reader.core import DBFReader
 from ..dbf_enc_reader.connection import DBFConnection
+from ..dbf_enc_reader.converters import parse_legacy_date, normalize_reference
+from ..dbf_enc_reader.day_cache import DayCache, DayCacheWriter, iter_days, day_ranges
+from ..dbf_enc_reader.schema_cache import SchemaCache
+from ..dbf_enc_reader.filters import build_folio_filters
+from ..dbf_enc_reader.stats import ReadStats
+from ..dbf_enc_reader.watermarks import TableWatermark, read_table_state
 from ..dbf_enc_reader.mapping_manager import MappingManager
+from ..models.sales_records import Venta, Partida, Recibo
 from ..config.dbf_config import DBFConfig
 import os
 import sys
 
 class VentasController:
+    # Whether an example transformed record was printed already
+    _printed_transform = False
+
     def __init__(self, mapping_manager: MappingManager, config: DBFConfig):
         """Initialize the CAT_PROD controller.
         
@@ -22,53 +34,107 @@ class VentasController:
         self.mapping_manager = mapping_manager
         self.venta_dbf = "VENTA.DBF"  # Header table
         self.partvta_dbf = "PARTVTA.DBF"  # Details table
+        self.receipt_dbfs = ["FLUJORES.DBF", "FLUJO01.DBF"]  # Receipt tables
        
         
         # Initialize DBF reader
-        DBFConnection.set_dll_path(self.config.dll_path)
-        self.reader = DBFReader(self.config.source_directory, self.config.encryption_password)
+        if self.config.reader_backend == 'advantage':
+            DBFConnection.set_dll_path(self.config.dll_path)
+        schema_cache = SchemaCache(os.path.join(self.config.cache_dir, 'schema.json'))
+        self.reader = DBFReader(self.config.source_directory, self.config.encryption_password,
+                                backend=self.config.reader_backend, on_stats=self._collect_read_stats,
+                                schema_cache=schema_cache)
+        self.day_cache = DayCache(self.config.cache_dir, self.config.cache_open_days) if self.config.day_cache else None
+
+        # Read time and reader stats per table of the last get_sales_in_range call
+        self.read_timings: Dict[str, float] = {}
+        self.read_stats: Dict[str, ReadStats] = {}
+
+        # Worker threads used by parallel reads, each with its own connection
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._worker_local = threading.local()
+        self._worker_readers: List[DBFReader] = []
+        self._worker_lock = threading.Lock()
     
     def get_sales_in_range(self, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
         """Get sales data within the specified date range, including details.
         
+        The tables are streamed from the DBFs and mapped as they are read.
+        With the day cache on, closed days cached from the current state of
+        the DBF files are loaded from it and the closed days read are stored
+        for later runs.
+        
         Args:
             start_date: Start date for data range
             end_date: End date for data range
             
         Returns:
-            List of dictionaries containing the mapped data with nested details
+            List of Venta records (used like dictionaries) with their Partida and Recibo records nested
         """
         start_time = time.time()
+        self.read_timings = {}
+        self.read_stats = {}
+
+        start_date = start_date.date() if isinstance(start_date, datetime) else start_date
+        end_date = end_date.date() if isinstance(end_date, datetime) else end_date
+        days = list(iter_days(start_date, end_date))
+        columns = {table: self._get_read_columns(table) for table in self._get_sales_tables()}
+        sources = self._get_source_states() if self.day_cache is not None else None
+        cached = self._load_cached_days(days, columns, sources)
+        segments = self._get_segments(days, cached)
+        writer = self._get_cache_writer([day for day in days if day not in cached], columns, sources)
+
+        # Receipt scans only depend on the date range, so in parallel mode they
+        # run on worker connections while the header -> detail chain runs here
+        receipt_futures = None
+        if self.config.parallel_reads:
+            executor = self._get_executor()
+            receipt_futures = {
+                table: [executor.submit(self._read_receipts, table, start, end, True)
+                        for start, end, from_cache in segments if not from_cache]
+                for table in self.receipt_dbfs
+            }
         
-        # First get headers for the date range
+        # Map the header records as they are read
         headers_start = time.time()
 
-        headers = self._get_headers_in_range(start_date, end_date)
+        read_folios: List[str] = []
+        headers = self.mapping_manager.transform_many(
+            self.venta_dbf, self._iter_headers(segments, cached, read_folios, writer), Venta)
         headers_time = time.time() - headers_start
 
+        # Print first record for debugging
+        if headers and not VentasController._printed_transform:
+            print("\nTransformed record example:", headers[0])
+            VentasController._printed_transform = True
+
         print(f"\nTime to get headers: {headers_time:.2f} seconds")
 
        
         
         
-        # Get folios to filter details
-        folios = [str(header['Folio']) for header in headers]
+        # Get folios to match receipts
         receipts_num = [{'ref_recibo': str(header['ref_recibo']), 'folio': str(header['Folio'])} for header in headers]
 
         
-        # Then get details only for these folios
+        # Then get details only for these folios, and the receipts
         details_start = time.time()
 
         logging.info(f'/// /// /// Total cabeceras found: {len(headers)}')
 
-        details_by_folio = self._get_details_for_folios(folios) if folios else {}
-        receipts_by_ref = self._get_receipts_for_folios(receipts_num, start_date, end_date) if receipts_num else {}
+        details_by_folio = self._get_details_by_folio(self._iter_details(days, cached, read_folios, writer))
+        raw_receipts = [self._get_raw_receipts(table, segments, cached, receipt_futures, writer)
+                        for table in self.receipt_dbfs]
+        receipts_by_ref = self._get_receipts_for_folios(receipts_num, raw_receipts) if receipts_num else {}
         
 
         
 
         details_time = time.time() - details_start
         print(f"Time to get filtered details: {details_time:.2f} seconds")
+
+        if writer is not None:
+            writer.store()
         
         # Join headers with their details
         join_start = time.time()
@@ -82,154 +148,353 @@ class VentasController:
         
         total_time = time.time() - start_time
         print(f"Total processing time: {total_time:.2f} seconds")
+        timings = ", ".join(f"{table}: {seconds:.2f}s" for table, seconds in self.read_timings.items())
+        logging.info(f"DBF read timings ({'parallel' if self.config.parallel_reads else 'sequential'}): {timings}, total: {total_time:.2f}s")
+        for stats in self.read_stats.values():
+            logging.info(f"DBF read stats: {stats.summary()}")
         
         return headers
-        
-    def _get_details_for_folios(self, folios: List[str]) -> Dict[str, List[Dict[str, Any]]]:
-        """Get sales details for specific folios and organize them by folio number.
+
+    def _get_sales_tables(self) -> List[str]:
+        """Get the DBF tables a sales read goes through."""
+        return [self.venta_dbf, self.partvta_dbf] + self.receipt_dbfs
+
+    @staticmethod
+    def _folio_key(record: Dict[str, Any]) -> str:
+        """Get the NO_REFEREN of a raw header or detail as stored in the DBF, padded to 6 digits."""
+        return str(record.get('NO_REFEREN', '')).strip().zfill(6)
+
+    def _get_source_states(self) -> Optional[Dict[str, TableWatermark]]:
+        """Get the state of each sales DBF file, the day cache is only used while they stay the same."""
+        try:
+            return {table: read_table_state(self.reader.backend.get_table_path(table))
+                    for table in self._get_sales_tables()}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Cannot read the state of the sales DBFs, not using the day cache: {e}")
+            return None
+
+    def _load_cached_days(self, days: List[date], columns: Dict[str, List[str]],
+                          sources: Optional[Dict[str, TableWatermark]]) -> Dict[date, Dict[str, List[Dict[str, Any]]]]:
+        """Load the closed days whose tables are all cached from the current DBF files.
         
         Args:
-            folios: List of folio numbers to get details for
+            days: Days of the range
+            columns: Columns each table is read with
+            sources: State of each DBF file, nothing is loaded if None
             
         Returns:
-            Dictionary mapping folio numbers to lists of detail records
+            Dictionary mapping each cached day to the raw records of every table
         """
-        field_mappings = self.mapping_manager.get_field_mappings(self.partvta_dbf)
-        
-        # Create filter for specific folios using OR
-        filters = []
-        for folio in folios:
-            # Pad the folio with leading zeros to 6 digits to match DBF format
-            filter_dict = {
-                'field': 'NO_REFEREN',
-                'operator': '=',
-                'value': str(folio).zfill(6),  # Pad with leading zeros
-                'is_numeric': False  # Treat as string to preserve leading zeros
-            }
-            filters.append(filter_dict)
+        if self.day_cache is None or sources is None:
+            return {}
 
-        # Get filtered details
-        read_start = time.time()
+        cache_start = time.time()
+        cached = {}
+        for day in days:
+            if not self.day_cache.is_closed(day):
+                continue
+            entries = {table: self.day_cache.load(table, day, columns[table], sources[table]) for table in columns}
+            if all(rows is not None for rows in entries.values()):
+                cached[day] = entries
+        if cached:
+            cache_time = time.time() - cache_start
+            print(f"\nLoaded {len(cached)} closed days from the day cache in {cache_time:.2f} seconds")
+        return cached
 
-        raw_data_str = self.reader.to_json(self.partvta_dbf, 0, filters)
+    @staticmethod
+    def _get_segments(days: List[date], cached: Dict[date, Any]) -> List[Tuple[date, date, bool]]:
+        """Split the days into contiguous (first, last, from_cache) ranges, in date order."""
+        segments = [(low, high, True) for low, high in day_ranges(day for day in days if day in cached)]
+        segments.extend((low, high, False) for low, high in day_ranges(day for day in days if day not in cached))
+        return sorted(segments)
 
-        read_time = time.time() - read_start
-        print(f"Time to read PARTVTA.DBF with filter: {read_time:.2f} seconds")
+    def _get_cache_writer(self, read_days: List[date], columns: Dict[str, List[str]],
+                          sources: Optional[Dict[str, TableWatermark]]) -> Optional[DayCacheWriter]:
+        """Get the writer that stores the closed days being read, None if there are none to store."""
+        if self.day_cache is None or sources is None or self.config.limit_rows:
+            return None
+        closed_days = [day for day in read_days if self.day_cache.is_closed(day)]
+        if not closed_days:
+            return None
+        return DayCacheWriter(self.day_cache, closed_days, columns, sources)
+
+    def _iter_headers(self, segments: List[Tuple[date, date, bool]], cached: Dict[date, Dict[str, List[Dict[str, Any]]]],
+                      read_folios: List[str], writer: Optional[DayCacheWriter]) -> Iterator[Dict[str, Any]]:
+        """Yield the raw FA headers of every segment, cached or read from VENTA.DBF.
         
-        parse_start = time.time()
+        Args:
+            segments: Ranges of _get_segments
+            cached: Days loaded from the day cache
+            read_folios: Receives the folios of the headers read from the DBF
+            writer: Collects the rows of the closed days read, if any
+            
+        Yields:
+            Raw header records
+        """
+        for start, end, from_cache in segments:
+            if from_cache:
+                for day in iter_days(start, end):
+                    yield from cached[day][self.venta_dbf]
+                continue
+            for record in self._iter_headers_in_range(start, end):
+                if record.get('NO_REFEREN') not in (None, ''):
+                    read_folios.append(str(record['NO_REFEREN']))
+                if writer is not None:
+                    day = parse_legacy_date(record.get('F_EMISION'))
+                    writer.folio_days[self._folio_key(record)] = day
+                    writer.add(self.venta_dbf, day, record)
+                yield record
 
-        raw_data = json.loads(raw_data_str)
-        logging.info(f'/// /// /// Total detalles found: {len(raw_data)}')
+    def _iter_details(self, days: List[date], cached: Dict[date, Dict[str, List[Dict[str, Any]]]],
+                      read_folios: List[str], writer: Optional[DayCacheWriter]) -> Iterator[Dict[str, Any]]:
+        """Yield the raw details of the cached days and of the folios read from VENTA.DBF.
         
+        Called once the headers were read, as it needs their folios.
         
-        parse_time = time.time() - parse_start
-        print(f"Time to parse PARTVTA JSON: {parse_time:.2f} seconds")
+        Args:
+            days: Days of the range
+            cached: Days loaded from the day cache
+            read_folios: Folios of the headers read from the DBF
+            writer: Collects the rows of the closed days read, if any
+            
+        Yields:
+            Raw detail records
+        """
+        for day in days:
+            if day in cached:
+                yield from cached[day][self.partvta_dbf]
+        if not read_folios:
+            return
+        for record in self._iter_details_for_folios(read_folios):
+            if writer is not None:
+                # Details belong to the day of their header
+                writer.add(self.partvta_dbf, writer.folio_days.get(self._folio_key(record)), record)
+            yield record
 
-        # Organize details by folio
-        details_by_folio = {}
-        for record in raw_data:
-            transformed = self.transform_record(record, field_mappings)
-            if transformed:
-                folio = transformed['Folio']  # Using the mapped name
-                if folio not in details_by_folio:
-                    details_by_folio[folio] = []
-                details_by_folio[folio].append(transformed)
+    def _get_raw_receipts(self, table_name: str, segments: List[Tuple[date, date, bool]],
+                          cached: Dict[date, Dict[str, List[Dict[str, Any]]]],
+                          receipt_futures: Optional[Dict[str, List[Future]]],
+                          writer: Optional[DayCacheWriter]) -> List[Dict[str, Any]]:
+        """Get the raw records of a receipts table for every segment.
         
-        return details_by_folio
-
-    def _get_receipts_for_folios(self, reference_records: List[str], start_date: date, end_date: date) -> Dict[str, List[Dict[str, Any]]]:
-        """Get sales details for specific reference_records and organize them by folio number.
+        Receipts are matched against every header, so they are kept in memory.
         
         Args:
-            reference_records: List of folio numbers to get details for
+            table_name: Receipts table
+            segments: Ranges of _get_segments
+            cached: Days loaded from the day cache
+            receipt_futures: Reads already running on worker connections, one per segment read
+            writer: Collects the rows of the closed days read, if any
             
         Returns:
-            Dictionary mapping folio numbers to lists of detail records
+            List of raw receipt records
+        """
+        rows = []
+        reads = 0
+        for start, end, from_cache in segments:
+            if from_cache:
+                for day in iter_days(start, end):
+                    rows.extend(cached[day][table_name])
+                continue
+            if receipt_futures is not None:
+                read = receipt_futures[table_name][reads].result()
+            else:
+                read = self._read_receipts(table_name, start, end)
+            reads += 1
+            if writer is not None:
+                for record in read:
+                    writer.add(table_name, parse_legacy_date(record.get('FECHA')), record)
+            rows.extend(read)
+        return rows
+
+    def _get_read_columns(self, table_name: str) -> List[str]:
+        """Get the columns a sales table is read with, the date fields included for the day cache."""
+        if table_name == self.venta_dbf:
+            return self.mapping_manager.get_source_columns(table_name, ['TIPO_DOC', 'F_EMISION'])
+        if table_name in self.receipt_dbfs:
+            return self.mapping_manager.get_source_columns(table_name, ['REF_NUM', 'FECHA'])
+        return self.mapping_manager.get_source_columns(table_name)
 
+    def _collect_read_stats(self, stats: ReadStats) -> None:
+        """Add the stats of a finished read to the per table stats of the current call."""
+        with self._worker_lock:
+            table_stats = self.read_stats.get(stats.table_name)
+            if table_stats is None:
+                self.read_stats[stats.table_name] = replace(stats)
+            else:
+                table_stats.merge(stats)
+
+    def _add_read_time(self, table_name: str, seconds: float) -> None:
+        """Add the read time of a table to the timings of the current call."""
+        with self._worker_lock:
+            self.read_timings[table_name] = self.read_timings.get(table_name, 0.0) + seconds
+
+    def close(self) -> None:
+        """Stop the worker threads and close their connections."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._worker_lock:
+            readers = self._worker_readers
+            self._worker_readers = []
+        for reader in readers:
+            reader.close()
+        self._worker_local = threading.local()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Get the thread pool used for parallel reads."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=len(self.receipt_dbfs), thread_name_prefix="dbf-read")
+        return self._executor
+
+    def _get_worker_reader(self) -> DBFReader:
+        """Get the reader of the current worker thread, with its own connection."""
+        reader = getattr(self._worker_local, 'reader', None)
+        if reader is None:
+            reader = self.reader.fork()
+            with self._worker_lock:
+                self._worker_readers.append(reader)
+            self._worker_local.reader = reader
+        return reader
+        
+    def _iter_details_for_folios(self, folios: List[str]) -> Iterator[Dict[str, Any]]:
+        """Stream the raw sales details of specific folios.
+        
+        Args:
+            folios: List of folio numbers to get details for
+            
+        Yields:
+            Raw detail records
         """
+        # Pad the folios with leading zeros to 6 digits to match DBF format and
+        # collapse them into a few range filters, each one read separately
+        wanted_folios = {str(folio).strip().zfill(6) for folio in folios}
+        filter_chunks = build_folio_filters('NO_REFEREN', wanted_folios, width=6)
+        print(f"Reading PARTVTA.DBF for {len(wanted_folios)} folios in {len(filter_chunks)} filtered scans")
 
-        target_table = "FLUJORES.DBF"
-        target_table_2 = "FLUJO01.DBF"
+        # Stream the filtered details, the time includes mapping them as they are read
+        read_start = time.time()
 
-        field_mappings = self.mapping_manager.get_field_mappings(target_table)
-        field_mappings_2 = self.mapping_manager.get_field_mappings(target_table_2)
+        total_details = 0
+        columns = self._get_read_columns(self.partvta_dbf)
+        for filters in filter_chunks:
+            for record in self.reader.iter_table(self.partvta_dbf, 0, filters, columns):
+                # Ranges may cover folios that were not requested
+                if str(record.get('NO_REFEREN', '')).zfill(6) not in wanted_folios:
+                    continue
+                total_details += 1
+                yield record
 
+        read_time = time.time() - read_start
+        self._add_read_time(self.partvta_dbf, read_time)
+        print(f"Time to read PARTVTA.DBF with filter: {read_time:.2f} seconds")
+        logging.info(f'/// /// /// Total detalles found: {total_details}')
+
+    def _get_details_by_folio(self, raw_details: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Map raw sales details and organize them by folio number.
+        
+        Args:
+            raw_details: Raw detail records, mapped as they are read
+            
+        Returns:
+            Dictionary mapping folio numbers to lists of detail records
+        """
+        details_by_folio = {}
+        for transformed in self.mapping_manager.transform_many(self.partvta_dbf, raw_details, Partida):
+            folio = transformed['Folio']  # Using the mapped name
+            if folio not in details_by_folio:
+                details_by_folio[folio] = []
+            details_by_folio[folio].append(transformed)
+        return details_by_folio
+
+    def _read_receipts(self, table_name: str, start_date: date, end_date: date, use_worker: bool = False) -> List[Dict[str, Any]]:
+        """Read the raw receipt records of one receipts table within a date range.
+        
+        Args:
+            table_name: Receipts table to read (FLUJORES.DBF or FLUJO01.DBF)
+            start_date: Start date for data range
+            end_date: End date for data range
+            use_worker: Read with the current worker thread's own connection
+            
+        Returns:
+            List of raw receipt records
+        """
         str_start = start_date.strftime("%m-%d-%Y")
         str_end = end_date.strftime("%m-%d-%Y")
         
-        # Create filter for specific reference_records using OR
-        filters = []
-        
-        # for ref_rec in reference_records:
-            # Pad the folio with leading zeros to 6 digits to match DBF format
-        filter_dict = {
+        filters = [{
             'field': 'FECHA',
             'operator': 'range',
             'from_value': str_start,  # Format to match DBF M/D/Y
             'to_value':str_end,  # End of day
             'is_date': False  # F_
-        }
-        filters.append(filter_dict)
-
-        # Get filtered details
-        read_start = time.time()
+        }]
 
-        raw_data_str = self.reader.to_json(target_table, 0, filters)
-        raw_data_2_str = self.reader.to_json(target_table_2, 0, filters)
+        reader = self._get_worker_reader() if use_worker else self.reader
+        columns = self._get_read_columns(table_name)
 
+        read_start = time.time()
+        raw_data = list(reader.iter_table(table_name, 0, filters, columns))
         read_time = time.time() - read_start
-        print(f"Time to read tables with filter: {read_time:.2f} seconds")
-        
-        parse_start = time.time()
+        self._add_read_time(table_name, read_time)
+        print(f"Time to read {table_name} with filter: {read_time:.2f} seconds")
 
-        # Parse both JSON strings
-        raw_data_1 = json.loads(raw_data_str)
-        raw_data_2 = json.loads(raw_data_2_str)
-        
-        # Combine the data from both tables
-        raw_data = raw_data_1 + raw_data_2
+        return raw_data
 
-        logging.info(f'/// /// /// Total recibos found: {len(raw_data)}')
+    def _get_receipts_for_folios(self, reference_records: List[Dict[str, str]],
+                                 raw_receipts: List[List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Join the receipts to their headers and organize them by folio number.
         
-        print(f"Records from {target_table}: {len(raw_data_1)}")
-        print(f"Records from {target_table_2}: {len(raw_data_2)}")
-        print(f"Total combined records: {len(raw_data)}")
+        Receipt rows are transformed once, each with its own table's mappings,
+        and indexed by normalized REF_NUM, so every header is matched with a
+        single lookup.
         
+        Args:
+            reference_records: Dictionaries with the 'folio' and 'ref_recibo' of each header
+            raw_receipts: Raw records of each receipts table, in the order of self.receipt_dbfs
+            
+        Returns:
+            Dictionary mapping folio numbers to lists of receipt records
+        """
+        total = sum(len(rows) for rows in raw_receipts)
+        logging.info(f'/// /// /// Total recibos found: {total}')
+        
+        # Index the transformed receipts by reference
+        receipts_by_ref: Dict[str, List[Dict[str, Any]]] = {}
+        for table, rows in zip(self.receipt_dbfs, raw_receipts):
+            print(f"Records from {table}: {len(rows)}")
+            plan = self.mapping_manager.get_plan(table)
+            for record in rows:
+                ref_num = normalize_reference(record.get('REF_NUM'))
+                if not ref_num:
+                    continue
+                transformed = self.mapping_manager.apply_plan(record, plan)
+                if transformed:
+                    receipts_by_ref.setdefault(ref_num, []).append(Recibo(transformed))
+        print(f"Total combined records: {total}")
 
-      
-
-        parse_time = time.time() - parse_start
-        print(f"Time to parse {target_table} JSON: {parse_time:.2f} seconds")
-        # print(raw_data_str)
-
-        # Create a dictionary to store matched receipts by folio
+        # Attach the receipts of each header's reference
         receipts_by_folio = {}
-        
-        # Process each reference record
+        attached_refs = set()
         for ref in reference_records:
             ref_recibo = ref.get('ref_recibo')
             folio = ref.get('folio')
             
             if ref_recibo and folio:
-                # Initialize an empty list for this folio if it doesn't exist
                 if folio not in receipts_by_folio:
                     receipts_by_folio[folio] = []
-                
-                # Find all matching records in raw_data where REF_NUM equals ref_recibo
-                for record in raw_data:
-                    if 'REF_NUM' in record and str(record['REF_NUM']) == str(ref_recibo):
-                        # Transform the record and add it to the list for this folio
-                        transformed = self.transform_record(record, field_mappings)
-                        if transformed:
-                            receipts_by_folio[folio].append(transformed)
-
-        # print(f' receipts {receipts_by_folio}')
+                ref_num = normalize_reference(ref_recibo)
+                matches = receipts_by_ref.get(ref_num, [])
+                # Headers sharing a reference get their own copies, records are updated in place later
+                if ref_num in attached_refs:
+                    matches = [receipt.copy() for receipt in matches]
+                attached_refs.add(ref_num)
+                receipts_by_folio[folio].extend(matches)
         
         return receipts_by_folio
         
-    def _get_headers_in_range(self, start_date: date, end_date: date) -> List[Dict[str, Any]]:
-        """Get sales headers within the specified date range."""
-        field_mappings = self.mapping_manager.get_field_mappings(self.venta_dbf)
+    def _iter_headers_in_range(self, start_date: date, end_date: date) -> Iterator[Dict[str, Any]]:
+        """Stream the raw FA sales headers within the specified date range."""
         str_start = start_date.strftime("%m-%d-%Y")
         str_end = end_date.strftime("%m-%d-%Y")
         
@@ -243,29 +508,23 @@ class VentasController:
         }]
         print(f"\nSearching for date range: {start_date} to {end_date}")
         
+        # The time includes mapping the headers as they are read
         read_start = time.time()
-        raw_data_str = self.reader.to_json(self.venta_dbf, self.config.limit_rows, filters)
-        read_time = time.time() - read_start
-        print(f"Time to read VENTA.DBF: {read_time:.2f} seconds")
-        
-        parse_start = time.time()
-        raw_data = json.loads(raw_data_str)
-        parse_time = time.time() - parse_start
-        print(f"Time to parse VENTA JSON: {parse_time:.2f} seconds")
-
-        transformed_data = []
-        for record in raw_data:
+        columns = self._get_read_columns(self.venta_dbf)
+        for record in self.reader.iter_table(self.venta_dbf, self.config.limit_rows, filters, columns):
           
             if record.get('TIPO_DOC') == 'FA':#only add FA records
-                transformed = self.transform_record(record, field_mappings)
-                if transformed:
-                    transformed_data.append(transformed)
-        
-        return transformed_data
+                yield record
+        read_time = time.time() - read_start
+        self._add_read_time(self.venta_dbf, read_time)
+        print(f"Time to read VENTA.DBF: {read_time:.2f} seconds")
 
     def transform_record(self, record: Dict[str, Any], field_mappings: Dict[str, Any]) -> Dict[str, Any]:
         """Transform a DBF record using the field mappings.
         
+        The sales tables are transformed with the compiled plans of the
+        mapping manager, this compiles the given mappings on every call.
+        
         Args:
             record: Raw record from DBF
             field_mappings: Field mapping configuration
@@ -273,22 +532,4 @@ class VentasController:
         Returns:
             Transformed record with mapped field names and types
         """
-        transformed = {}
-        for target_field, mapping in field_mappings.items():
-            dbf_field = mapping['dbf']
-            if dbf_field in record:
-                value = record[dbf_field]
-                if mapping['type'] == 'number':
-                    try:
-                        value = float(value) if '.' in str(value) else int(value)
-                    except (ValueError, TypeError):
-                        value = 0
-                
-                transformed[mapping['velneo_table']] = value
-                
-        # Print first record for debugging
-        if not hasattr(VentasController, '_printed_transform'):
-            print("\nTransformed record example:", transformed)
-            setattr(VentasController, '_printed_transform', True)
-                
-        return transformed
+        return self.mapping_manager.apply_plan(record, self.mapping_manager.compile_plan(field_mappings))
@@ -1,15 +1,32 @@
 import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_batch
 from datetime import datetime, date
 from typing import List, Dict, Optional
 import logging
 import pytz
+from src.db.postgres_tracking import PostgresTracking
 
 class DetailTracking:
     """Sistema de seguimiento para detalles de facturas"""
     
     def __init__(self, db_config: dict):
         self.config = db_config
+
+    @staticmethod
+    def _version_sql(with_version: bool) -> Dict[str, sql.SQL]:
+        """Fragmentos para escribir hash_version en los INSERT ... ON CONFLICT de detalle_estado"""
+        return {
+            'version_column': sql.SQL(", hash_version" if with_version else ""),
+            'version_value': sql.SQL(", %s" if with_version else ""),
+            'version_update': sql.SQL("\n                            hash_version = EXCLUDED.hash_version," if with_version else ""),
+        }
+
+    def _version_select(self) -> sql.SQL:
+        """Columna hash_version de las consultas, las filas sin versión son de la versión 1"""
+        if PostgresTracking(self.config).has_hash_version_columns():
+            return sql.SQL(", COALESCE(hash_version, 1) AS hash_version")
+        return sql.SQL("")
         
     
     def insert_or_update_detail(self, 
@@ -19,21 +36,25 @@ class DetailTracking:
                                fecha: date,
                                estado,
                                accion,
-                               ref: str = '') -> bool:
+                               ref: str = '',
+                               hash_version: Optional[int] = None) -> bool:
         """
         Inserta un nuevo registro de detalle o actualiza uno existente
         
         Args:
+            id: Identificador del detalle
             folio: Número de folio
             hash_detalle: Hash MD5 del detalle
             fecha: Fecha del detalle
             estado: Estado del detalle (pendiente, procesado, error)
             accion: Tipo de operación (create, update, delete)
             ref: Referencia del detalle
+            hash_version: Versión del hash, sin versión el hash es de la versión 1
             
         Returns:
             True si la operación fue exitosa, False en caso contrario
         """
+        with_version = PostgresTracking(self.config).has_hash_version_columns()
         try:
             # Connect with explicit parameters instead of using **
             with psycopg2.connect(
@@ -46,18 +67,19 @@ class DetailTracking:
                 with conn.cursor() as cursor:
                     query = sql.SQL("""
                         INSERT INTO detalle_estado (
-                            id,folio, hash_detalle, fecha, estado, accion, ref
-                        ) VALUES (%s, %s, %s, %s, %s, %s)
+                            id,folio, hash_detalle, fecha, estado, accion, ref{version_column}
+                        ) VALUES (%s, %s, %s, %s, %s, %s, %s{version_value})
                         ON CONFLICT (id) 
                         DO UPDATE SET 
                             estado = EXCLUDED.estado,
                             accion = EXCLUDED.accion,
-                            hash_detalle = EXCLUDED.hash_detalle,
+                            hash_detalle = EXCLUDED.hash_detalle,{version_update}
                             ref = EXCLUDED.ref
                         RETURNING id
-                    """)
+                    """).format(**self._version_sql(with_version))
                     
-                    params = (folio, hash_detalle, fecha, estado, accion, ref)
+                    params = (id, folio, hash_detalle, fecha, estado, accion, ref,
+                              *((hash_version or 1,) if with_version else ()))
                     
                     cursor.execute(query, params)
                     
@@ -90,11 +112,11 @@ class DetailTracking:
             ) as conn:
                 with conn.cursor() as cursor:
                     query = sql.SQL("""
-                        SELECT id, folio, hash_detalle, fecha, estado, accion, ref
+                        SELECT id, folio, hash_detalle, fecha, estado, accion, ref{version_column}
                         FROM detalle_estado
                         WHERE folio = %s
                         ORDER BY id ASC
-                    """)
+                    """).format(version_column=self._version_select())
                     
                     cursor.execute(query, (folio,))
                     
@@ -127,11 +149,11 @@ class DetailTracking:
             ) as conn:
                 with conn.cursor() as cursor:
                     query = sql.SQL("""
-                        SELECT id, folio, hash_detalle, fecha, estado, accion, ref
+                        SELECT id, folio, hash_detalle, fecha, estado, accion, ref{version_column}
                         FROM detalle_estado
                         WHERE fecha BETWEEN %s AND %s
                         ORDER BY fecha DESC, folio ASC
-                    """)
+                    """).format(version_column=self._version_select())
                     
                     cursor.execute(query, (start_date, end_date))
                     
@@ -181,6 +203,7 @@ class DetailTracking:
                 # Track successful operations
                 deleted_count = 0
                 inserted_count = 0
+                with_version = PostgresTracking(self.config).has_hash_version_columns()
                 
                 # Process each ID in a separate transaction
                 for detail_id, id_details in details_by_id.items():
@@ -195,10 +218,10 @@ class DetailTracking:
                         # Then insert all new records for this ID
                         with conn.cursor() as cursor:
                             # Insert query
-                            insert_query = """
+                            insert_query = f"""
                                 INSERT INTO detalle_estado (
-                                    id, folio, hash_detalle, fecha, estado, accion, ref
-                                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+                                    id, folio, hash_detalle, fecha, estado, accion, ref{', hash_version' if with_version else ''}
+                                ) VALUES (%s, %s, %s, %s, %s, %s, %s{', %s' if with_version else ''})
                             """
                             
                             # Insert each detail (should be just one per ID)
@@ -230,7 +253,9 @@ class DetailTracking:
                                     fecha,
                                     estado,
                                     operation,
-                                    ref_value
+                                    ref_value,
+                                    # Sin versión el hash es de la versión 1
+                                    *((detail.get('hash_version') or 1,) if with_version else ())
                                 )
                                 
                                 # Debug print
@@ -301,17 +326,18 @@ class DetailTracking:
                     logging.warning(f"Could not retrieve existing counters: {e}")
                 
                 # Continue with inserts
+                with_version = PostgresTracking(self.config).has_hash_version_columns()
                 with conn.cursor() as cursor:
                     query = sql.SQL("""
                         INSERT INTO detalle_estado (
-                            id, folio, hash_detalle, fecha, estado, accion, ref
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+                            id, folio, hash_detalle, fecha, estado, accion, ref{version_column}
+                        ) VALUES (%s, %s, %s, %s, %s, %s, %s{version_value})
                         ON CONFLICT (folio, ref) DO UPDATE SET
                             estado = EXCLUDED.estado,
                             accion = EXCLUDED.accion,
-                            hash_detalle = EXCLUDED.hash_detalle,
+                            hash_detalle = EXCLUDED.hash_detalle,{version_update}
                             ref = EXCLUDED.ref
-                    """)
+                    """).format(**self._version_sql(with_version))
                     
                     # Track successful inserts
                     success_count = 0
@@ -354,7 +380,9 @@ class DetailTracking:
                             fecha,
                             estado,
                             operation,
-                            ref_value
+                            ref_value,
+                            # Sin versión el hash es de la versión 1
+                            *((detail.get('hash_version') or 1,) if with_version else ())
                         )
                         
                         # Detailed debug print to identify null values
@@ -379,6 +407,37 @@ class DetailTracking:
             return False
 
 
+    def rehash_details(self, details: List[tuple]) -> int:
+        """
+        Actualiza el hash de detalles que coincidieron con una versión anterior,
+        así migran a la versión actual a medida que se comparan
+        
+        Args:
+            details: Tuplas (id, hash_detalle, hash_version)
+            
+        Returns:
+            Número de filas actualizadas
+        """
+        if not details or not PostgresTracking(self.config).has_hash_version_columns():
+            return 0
+        try:
+            with psycopg2.connect(
+                host=self.config['host'],
+                database=self.config['database'],
+                user=self.config['user'],
+                password=self.config['password'],
+                port=self.config['port']
+            ) as conn:
+                with conn.cursor() as cursor:
+                    query = "UPDATE detalle_estado SET hash_detalle = %s, hash_version = %s WHERE id = %s"
+                    execute_batch(cursor, query, [(hash, version, id) for id, hash, version in details])
+                    conn.commit()
+                    logging.info(f"Rehashed {len(details)} details to the current hash version")
+                    return len(details)
+        except Exception as e:
+            logging.error(f"Error actualizando versión de hash de detalles: {e}")
+            return 0
+
     def delete_by_folio(self, folio) -> bool:
         """
         Elimina todos los registros asociados a un folio específico
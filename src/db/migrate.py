@@ -0,0 +1,49 @@
+import logging
+import sys
+from pathlib import Path
+from typing import List
+
+import psycopg2
+
+MIGRATIONS_DIR = Path(__file__).parent / 'migrations'
+
+
+def apply_migrations(db_config: dict) -> List[str]:
+    """
+    Aplica en orden los scripts de src/db/migrations
+    
+    Los scripts usan IF NOT EXISTS, así que volver a aplicarlos no cambia
+    nada. Se corren a mano antes de desplegar, el proceso nunca altera
+    tablas por su cuenta.
+    
+    Args:
+        db_config: Configuración de la base de datos (host, database, user, password, port)
+        
+    Returns:
+        Nombres de los scripts aplicados
+    """
+    scripts = sorted(MIGRATIONS_DIR.glob('*.sql'))
+    with psycopg2.connect(
+        host=db_config['host'],
+        database=db_config['database'],
+        user=db_config['user'],
+        password=db_config['password'],
+        port=db_config['port']
+    ) as conn:
+        with conn.cursor() as cursor:
+            for script in scripts:
+                logging.info(f"Aplicando migración {script.name}")
+                cursor.execute(script.read_text(encoding='utf-8'))
+        conn.commit()
+    return [script.name for script in scripts]
+
+
+if __name__ == "__main__":
+    # python -m src.db.migrate
+    project_root = Path(__file__).parent.parent.parent
+    sys.path.insert(0, str(project_root))
+    from src.config.db_config import PostgresConnection
+
+    logging.basicConfig(level=logging.INFO)
+    for name in apply_migrations(PostgresConnection.get_db_config()):
+        print(f"Migración aplicada: {name}")
@@ -0,0 +1,5 @@
+-- Versión de hash de cada fila. Las filas existentes quedan en NULL,
+-- que se lee como la versión 1 (MD5 del JSON).
+ALTER TABLE estado_factura_venta ADD COLUMN IF NOT EXISTS hash_version SMALLINT;
+ALTER TABLE detalle_estado ADD COLUMN IF NOT EXISTS hash_version SMALLINT;
+ALTER TABLE lote_diario ADD COLUMN IF NOT EXISTS hash_version SMALLINT;
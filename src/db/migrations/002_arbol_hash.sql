@@ -0,0 +1,3 @@
+-- Árbol de hashes (día -> folio -> partidas/recibos) de cada día sincronizado
+ALTER TABLE lote_diario ADD COLUMN IF NOT EXISTS arbol_hash JSONB;
+CREATE INDEX IF NOT EXISTS idx_lote_diario_fecha_ref ON lote_diario (fecha_referencia);
@@ -0,0 +1,28 @@
+-- Versión de cada tabla de mapeos de Velneo. Los triggers la suben en la
+-- misma transacción que el cambio, así que la cache de mapeos ve todo cambio
+-- confirmado (a diferencia de los contadores de pg_stat_user_tables).
+CREATE TABLE IF NOT EXISTS velneo_map_version (
+    tabla TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION velneo_map_version_bump() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO velneo_map_version (tabla, version) VALUES (TG_TABLE_NAME, 1)
+    ON CONFLICT (tabla) DO UPDATE SET version = velneo_map_version.version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['clientes', 'general_misc', 'metodo_pago', 'vendedores', 'pais',
+                             'tipo_movimiento', 'iva', 'caja_banco', 'forma_pago', 'articulos'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS velneo_map_version ON %I', t);
+        EXECUTE format('CREATE TRIGGER velneo_map_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+                       'FOR EACH STATEMENT EXECUTE PROCEDURE velneo_map_version_bump()', t);
+        INSERT INTO velneo_map_version (tabla) VALUES (t) ON CONFLICT DO NOTHING;
+    END LOOP;
+END $$;
@@ -1,13 +1,18 @@
+import io
 import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import Json, execute_batch
 from datetime import datetime, date
-from typing import List, Dict, Optional
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 import logging
 import pytz
 
 class PostgresTracking:
     """Sistema de seguimiento para estado_factura_venta"""
     
+    # Si existen las columnas hash_version, se revisa una vez por proceso
+    _hash_version_columns: Optional[bool] = None
+    
     def __init__(self, db_config: dict):
         self.config = db_config
     
@@ -143,12 +148,14 @@ class PostgresTracking:
                 port=self.config['port']
             ) as conn:
                 with conn.cursor() as cursor:
-                    query = """
+                    # Las filas sin hash_version se escribieron con la versión 1
+                    hash_version = ", COALESCE(hash_version, 1) AS hash_version" if self.has_hash_version_columns() else ""
+                    query = f"""
                         SELECT id, folio, total_partidas,
-                               hash, fecha_procesamiento,estado, fecha_emision
+                               hash, fecha_procesamiento,estado, fecha_emision{hash_version}
                         FROM estado_factura_venta
                         WHERE fecha_emision BETWEEN %s AND %s
-                        ORDER BY fecha_emision
+                        ORDER BY fecha_emision, id
                     """
                     
                     # Format dates for better debugging output
@@ -184,6 +191,67 @@ class PostgresTracking:
             logging.error(f"Error obteniendo registros: {e}")
             return []
 
+    def iter_records_by_date_range(self, start_date: date, end_date: date, itersize: int = 2000,
+                                   days: Optional[List[date]] = None) -> Iterator[Dict]:
+        """
+        Recorre los registros del rango de fechas ordenados por folio, con un cursor del lado del servidor
+        
+        Solo se tienen en memoria itersize filas a la vez. El orden es el de
+        folio como texto con la intercalacion "C", el mismo que el de las
+        cadenas de Python, para poder mezclarlos con los registros DBF
+        ordenados por folio. Las filas de un mismo folio van por
+        fecha_emision e id, y como en get_records_by_date_range la ultima es
+        la que se compara.
+        
+        Args:
+            start_date: Fecha inicial
+            end_date: Fecha final
+            itersize: Filas que se traen del servidor en cada viaje
+            days: Dias del rango a recorrer, todos si es None
+            
+        Yields:
+            Registros con las mismas columnas que get_records_by_date_range
+            
+        Raises:
+            psycopg2.Error: Si la consulta falla; a diferencia de get_records_by_date_range
+                            no se devuelve una lista vacia, porque los folios restantes
+                            se tomarian como inexistentes en SQL
+        """
+        hash_version = ", COALESCE(hash_version, 1) AS hash_version" if self.has_hash_version_columns() else ""
+        day_filter = "AND fecha_emision = ANY(%s::date[])" if days is not None else ""
+        query = f"""
+            SELECT id, folio, total_partidas,
+                   hash, fecha_procesamiento,estado, fecha_emision{hash_version}
+            FROM estado_factura_venta
+            WHERE fecha_emision BETWEEN %s AND %s {day_filter}
+            ORDER BY folio::text COLLATE "C", fecha_emision, id
+        """
+        start_date_param = start_date.date() if isinstance(start_date, datetime) else start_date
+        end_date_param = end_date.date() if isinstance(end_date, datetime) else end_date
+        params = (start_date_param, end_date_param, *((list(days),) if days is not None else ()))
+
+        conn = psycopg2.connect(
+            host=self.config['host'],
+            database=self.config['database'],
+            user=self.config['user'],
+            password=self.config['password'],
+            port=self.config['port']
+        )
+        try:
+            with conn.cursor(name='estado_factura_venta_por_folio') as cursor:
+                cursor.itersize = itersize
+                cursor.execute(query, params)
+                columns = None
+                for row in cursor:
+                    if columns is None:
+                        columns = [desc[0] for desc in cursor.description]
+                    yield dict(zip(columns, row))
+        except psycopg2.Error as e:
+            logging.error(f"Error recorriendo registros por folio: {e}")
+            raise
+        finally:
+            conn.close()
+
     def insert_batch_record(self, lote_id: str, hash_lote: str, fecha_referencia: date) -> bool:
         """
         Inserta un único registro en tabla lote_diario que representa todo el batch
@@ -275,11 +343,12 @@ class PostgresTracking:
                     cursor.execute(lote_query, lote_params)
                     
                     # 2. Insertar todas las facturas
-                    factura_query = """
+                    with_version = self.has_hash_version_columns()
+                    factura_query = f"""
                         INSERT INTO estado_factura_venta (
                             folio, total_partidas, descripcion,
-                            hash, fecha_procesamiento, id_lote, estado, fecha_emision
-                        ) VALUES (%s, %s, %s, %s, %s::date, %s, %s, %s)
+                            hash, fecha_procesamiento, id_lote, estado, fecha_emision{', hash_version' if with_version else ''}
+                        ) VALUES (%s, %s, %s, %s, %s::date, %s, %s, %s{', %s' if with_version else ''})
                     """
                     for record in batch_data:
                         # Validar campos requeridos
@@ -299,7 +368,9 @@ class PostgresTracking:
                             datetime.now().date(),
                             lote_id,
                             'pendiente',
-                            record['fecha_emision']
+                            record['fecha_emision'],
+                            # Sin versión el hash es de la versión 1
+                            *((record.get('hash_version') or 1,) if with_version else ())
                         )
                         logging.debug(f"Query factura:\n{factura_query}\nParams: {factura_params}")
                         cursor.execute(factura_query, factura_params)
@@ -385,3 +456,279 @@ class PostgresTracking:
         except Exception as e:
             logging.error(f"Error retrieving single lote by date: {e}")
             return None
+
+    def has_hash_tree_column(self) -> bool:
+        """
+        Revisa que lote_diario tenga la columna arbol_hash, creada con la
+        migración 002_arbol_hash.sql (python -m src.db.migrate)
+        
+        Returns:
+            True si la columna existe
+        """
+        if self.has_column('arbol_hash', ('lote_diario',)):
+            return True
+        logging.warning("Falta la columna lote_diario.arbol_hash, aplique src/db/migrations/002_arbol_hash.sql "
+                        "(python -m src.db.migrate). Se compararán todos los días")
+        return False
+
+    def get_day_trees(self, start_date: date, end_date: date) -> Dict[date, Dict]:
+        """
+        Obtiene el árbol de hashes más reciente de cada día del rango
+        
+        Args:
+            start_date: Fecha inicial
+            end_date: Fecha final
+            
+        Returns:
+            Diccionario {fecha_referencia: arbol_hash}, vacío si no hay árboles o hay error
+        """
+        try:
+            with psycopg2.connect(
+                host=self.config['host'],
+                database=self.config['database'],
+                user=self.config['user'],
+                password=self.config['password'],
+                port=self.config['port']
+            ) as conn:
+                with conn.cursor() as cursor:
+                    query = """
+                        SELECT DISTINCT ON (fecha_referencia) fecha_referencia, arbol_hash
+                        FROM lote_diario
+                        WHERE fecha_referencia BETWEEN %s AND %s
+                          AND arbol_hash IS NOT NULL
+                        ORDER BY fecha_referencia, fecha_insercion DESC
+                    """
+                    cursor.execute(query, (start_date, end_date))
+                    return {row[0]: row[1] for row in cursor.fetchall()}
+        except Exception as e:
+            logging.error(f"Error obteniendo árboles de hashes: {e}")
+            return {}
+
+    def insert_day_tree(self, lote_id: str, fecha_referencia: date, hash_lote: str, arbol_hash: Dict,
+                        hash_version: int = 1) -> bool:
+        """
+        Inserta un registro en lote_diario con el árbol de hashes de un día
+        
+        Args:
+            lote_id: ID único del lote
+            fecha_referencia: Día del árbol
+            hash_lote: Raíz del árbol
+            arbol_hash: Árbol serializado (día -> folio -> partidas/recibos)
+            hash_version: Versión de hash con la que se armó el árbol
+        """
+        with_version = self.has_hash_version_columns()
+        try:
+            with psycopg2.connect(
+                host=self.config['host'],
+                database=self.config['database'],
+                user=self.config['user'],
+                password=self.config['password'],
+                port=self.config['port']
+            ) as conn:
+                with conn.cursor() as cursor:
+                    query = f"""
+                        INSERT INTO lote_diario (
+                            lote, fecha_insercion,
+                            fecha_referencia, hash_lote, arbol_hash{', hash_version' if with_version else ''}
+                        ) VALUES (%s, %s, %s, %s, %s{', %s' if with_version else ''})
+                        ON CONFLICT (lote) DO NOTHING
+                    """
+                    params = [lote_id, datetime.now(pytz.utc), fecha_referencia, hash_lote, Json(arbol_hash)]
+                    if with_version:
+                        params.append(hash_version)
+                    cursor.execute(query, params)
+                    conn.commit()
+                    return cursor.rowcount > 0
+        except Exception as e:
+            logging.error(f"Error insertando árbol de hashes: {e}")
+            return False
+
+    def has_hash_version_columns(self) -> bool:
+        """
+        Revisa, una vez por proceso, que existan las columnas hash_version
+        de estado_factura_venta, detalle_estado y lote_diario
+        
+        Las columnas se crean con la migración 001_hash_version.sql
+        (python -m src.db.migrate); mientras no existan, hash_version no se
+        lee ni se escribe y todas las filas cuentan como versión 1.
+        
+        Returns:
+            True si las columnas existen
+        """
+        if PostgresTracking._hash_version_columns is None:
+            tables = ('estado_factura_venta', 'detalle_estado', 'lote_diario')
+            PostgresTracking._hash_version_columns = self.has_column('hash_version', tables)
+            if not PostgresTracking._hash_version_columns:
+                logging.warning("Faltan columnas hash_version, aplique src/db/migrations/001_hash_version.sql "
+                                "(python -m src.db.migrate). Se usará la versión de hash 1")
+        return PostgresTracking._hash_version_columns
+
+    def has_column(self, column: str, tables) -> bool:
+        """
+        Revisa en information_schema que una columna exista en todas las tablas, sin bloquearlas
+        
+        Args:
+            column: Nombre de la columna
+            tables: Nombres de las tablas
+            
+        Returns:
+            True si todas las tablas tienen la columna, False si falta en alguna o hay error
+        """
+        try:
+            with psycopg2.connect(
+                host=self.config['host'],
+                database=self.config['database'],
+                user=self.config['user'],
+                password=self.config['password'],
+                port=self.config['port']
+            ) as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT DISTINCT table_name
+                        FROM information_schema.columns
+                        WHERE column_name = %s
+                          AND table_name = ANY(%s)
+                          AND table_schema = ANY(current_schemas(false))
+                    """, (column, list(tables)))
+                    return {row[0] for row in cursor.fetchall()} >= set(tables)
+        except Exception as e:
+            logging.error(f"Error revisando la columna {column}: {e}")
+            return False
+
+    def rehash_records(self, records: List[tuple]) -> int:
+        """
+        Actualiza el hash de filas que coincidieron con una versión anterior,
+        así migran a la versión actual a medida que se comparan
+        
+        Args:
+            records: Tuplas (id, hash, hash_version)
+            
+        Returns:
+            Número de filas actualizadas
+        """
+        if not records or not self.has_hash_version_columns():
+            return 0
+        try:
+            with psycopg2.connect(
+                host=self.config['host'],
+                database=self.config['database'],
+                user=self.config['user'],
+                password=self.config['password'],
+                port=self.config['port']
+            ) as conn:
+                with conn.cursor() as cursor:
+                    query = "UPDATE estado_factura_venta SET hash = %s, hash_version = %s WHERE id = %s"
+                    execute_batch(cursor, query, [(hash, version, id) for id, hash, version in records])
+                    conn.commit()
+                    logging.info(f"Rehashed {len(records)} records to the current hash version")
+                    return len(records)
+        except Exception as e:
+            logging.error(f"Error actualizando versión de hash: {e}")
+            return 0
+
+    @staticmethod
+    def _copy_text(value) -> str:
+        """Escapa un valor para el formato de texto de COPY"""
+        if value is None:
+            return '\\N'
+        return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+                .replace('\n', '\\n').replace('\r', '\\r'))
+
+    def diff_by_folio(self, hashes: Iterable[Tuple[str, int, str]], start_date: date,
+                      end_date: date, days: Optional[List[date]] = None) -> List[Dict]:
+        """
+        Compara en el servidor los hashes DBF de una corrida con estado_factura_venta
+        
+        Los hashes se cargan con COPY en una tabla temporal y una sola
+        consulta con FULL OUTER JOIN por folio decide la operacion de cada
+        folio, sin traer las filas de estado_factura_venta. Los folios con
+        demasiados reintentos se devuelven como los demas: los descarta
+        MatchesProcess.dischard_by_retries, despues de que pending_work los
+        cuente para no guardar su dia como sincronizado.
+        
+        Args:
+            hashes: Tuplas (folio, hash_version, hash) de cada registro DBF, un
+                    folio puede tener una por cada versión con que se calculó
+            start_date: Fecha inicial
+            end_date: Fecha final
+            days: Dias del rango a comparar, todos si es None; las filas de
+                  los demas dias no se toman como borradas
+            
+        Returns:
+            Lista de {'folio', 'operation', 'id', 'hash_version', 'fecha_emision'},
+            con operation 'create', 'update', 'delete' o 'next_check'. id,
+            hash_version y fecha_emision son los de la fila SQL (None en 'create').
+            Si un folio tiene varias filas en el rango se usa la ultima por
+            fecha_emision e id, como en los motores hash y merge
+            
+        Raises:
+            psycopg2.Error: Si la comparacion falla, para no tomar todos los folios como nuevos
+        """
+        hash_version = "COALESCE(hash_version, 1)" if self.has_hash_version_columns() else "1"
+        day_filter = "AND fecha_emision = ANY(%(days)s)" if days is not None else ""
+        query = f"""
+            WITH dbf AS (
+                SELECT DISTINCT folio FROM diff_dbf
+            ),
+            sql_rows AS (
+                SELECT DISTINCT ON (folio::text)
+                       id, folio::text AS folio, hash, {hash_version} AS hash_version, fecha_emision
+                FROM estado_factura_venta
+                WHERE fecha_emision BETWEEN %(start)s AND %(end)s {day_filter}
+                  AND folio IS NOT NULL AND hash IS NOT NULL AND hash <> ''
+                ORDER BY folio::text, fecha_emision DESC, id DESC
+            )
+            SELECT COALESCE(d.folio, s.folio) AS folio,
+                   CASE
+                       WHEN s.folio IS NULL THEN 'create'
+                       WHEN d.folio IS NULL THEN 'delete'
+                       WHEN EXISTS (
+                           SELECT 1 FROM diff_dbf v
+                           WHERE v.folio = s.folio AND v.hash_version = s.hash_version AND v.hash = s.hash
+                       ) THEN 'next_check'
+                       ELSE 'update'
+                   END AS operation,
+                   s.id, s.hash_version, s.fecha_emision
+            FROM dbf d
+            FULL OUTER JOIN sql_rows s ON s.folio = d.folio
+            ORDER BY 1
+        """
+        start_date_param = start_date.date() if isinstance(start_date, datetime) else start_date
+        end_date_param = end_date.date() if isinstance(end_date, datetime) else end_date
+
+        buffer = io.StringIO()
+        rows = 0
+        for folio, version, hash_value in hashes:
+            buffer.write(f"{self._copy_text(folio)}\t{int(version)}\t{self._copy_text(hash_value)}\n")
+            rows += 1
+        buffer.seek(0)
+
+        try:
+            with psycopg2.connect(
+                host=self.config['host'],
+                database=self.config['database'],
+                user=self.config['user'],
+                password=self.config['password'],
+                port=self.config['port']
+            ) as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        CREATE TEMP TABLE diff_dbf (
+                            folio TEXT NOT NULL,
+                            hash_version SMALLINT NOT NULL,
+                            hash TEXT NOT NULL
+                        ) ON COMMIT DROP
+                    """)
+                    cursor.copy_expert("COPY diff_dbf (folio, hash_version, hash) FROM STDIN", buffer)
+                    cursor.execute("CREATE INDEX ON diff_dbf (folio, hash_version)")
+                    cursor.execute("ANALYZE diff_dbf")
+                    cursor.execute(query, {'start': start_date_param, 'end': end_date_param,
+                                           'days': list(days) if days is not None else None})
+                    columns = [desc[0] for desc in cursor.description]
+                    results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                    conn.commit()
+                    logging.info(f"Comparacion en el servidor: {rows} hashes DBF, {len(results)} folios")
+                    return results
+        except psycopg2.Error as e:
+            logging.error(f"Error comparando folios en el servidor: {e}")
+            raise
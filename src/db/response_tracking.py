@@ -4,6 +4,7 @@ from datetime import datetime, date
 from typing import List, Dict, Optional
 import logging
 import pytz
+from src.db.postgres_tracking import PostgresTracking
 
 class ResponseTracking:
     def __init__(self, db_config: dict):
@@ -50,8 +51,14 @@ class ResponseTracking:
                         hash: str,
                         estado: str,
                         accion: str,
-                        fecha_emision: date) -> bool:
-        """Actualiza o inserta estado de factura"""
+                        fecha_emision: date,
+                        hash_version: Optional[int] = None) -> bool:
+        """Actualiza o inserta estado de factura y la versión de su hash
+
+        Sin versión el hash es de la versión 1; se escribe igual para que una
+        fila con otra versión no quede con el hash nuevo y la versión anterior.
+        """
+        with_version = PostgresTracking(self.config).has_hash_version_columns()
         try:
             # Connect with explicit parameters instead of using **
             with psycopg2.connect(
@@ -66,17 +73,21 @@ class ResponseTracking:
                     query = sql.SQL("""
                         INSERT INTO estado_factura_venta (
                             id,folio, total_partidas, hash,
-                            fecha_procesamiento, estado, fecha_emision, accion
-                        ) VALUES (%s,%s, %s, %s, %s, %s, %s, %s)
+                            fecha_procesamiento, estado, fecha_emision, accion{version_column}
+                        ) VALUES (%s,%s, %s, %s, %s, %s, %s, %s{version_value})
                         ON CONFLICT (id) DO UPDATE SET
                             estado = EXCLUDED.estado,
-                            hash = EXCLUDED.hash,
+                            hash = EXCLUDED.hash,{version_update}
                             accion = EXCLUDED.accion,
                             fecha_procesamiento = %s,
                             total_partidas = EXCLUDED.total_partidas,
                             fecha_emision = EXCLUDED.fecha_emision
                         RETURNING id
-                    """)
+                    """).format(
+                        version_column=sql.SQL(", hash_version" if with_version else ""),
+                        version_value=sql.SQL(", %s" if with_version else ""),
+                        version_update=sql.SQL("\n                            hash_version = EXCLUDED.hash_version," if with_version else "")
+                    )
                     
                     current_date = datetime.now().date()
                     params = (
@@ -88,6 +99,7 @@ class ResponseTracking:
                         estado, 
                         fecha_emision, 
                         accion,
+                        *((hash_version or 1,) if with_version else ()),
                         current_date  # For the update
                     )
                     #print(f"\nSQL Operation for folio: {folio}")
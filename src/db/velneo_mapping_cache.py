@@ -0,0 +1,559 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import psycopg2
+
+from src.db.velneo_mappings import VelneoMappings
+
+
+class ArticuloResolver:
+    """Resuelve los IDs de Velneo de los articulos por lotes.
+
+    El catalogo de articulos es demasiado grande para precargarlo, asi que
+    se consultan solo las REF de las partidas, en bloques de
+    ARTICULOS_CHUNK_SIZE con pvsi_clave = ANY(%s). Los resultados se
+    guardan en un LRU de ARTICULOS_CACHE_SIZE entradas que dura toda la
+    ejecucion, y las REF sin articulo se recuerdan aparte, en otro LRU del
+    mismo tamaño, para no volver a consultarlas en cada partida.
+    """
+
+    def __init__(self, db_config: dict, max_size: Optional[int] = None, chunk_size: Optional[int] = None):
+        """
+        Args:
+            db_config: Configuracion de la base de datos
+            max_size: Entradas del LRU, ARTICULOS_CACHE_SIZE si es None
+            chunk_size: REF por consulta, ARTICULOS_CHUNK_SIZE si es None
+        """
+        self.config = db_config
+        self.max_size = max_size or int(os.getenv('ARTICULOS_CACHE_SIZE', '50000'))
+        self.chunk_size = chunk_size or int(os.getenv('ARTICULOS_CHUNK_SIZE', '1000'))
+        self._cache: 'OrderedDict[str, Any]' = OrderedDict()
+        self._misses: 'OrderedDict[str, None]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def prefetch(self, references: Iterable[str]) -> None:
+        """Consulta de una vez las REF que aun no se conocen.
+
+        Args:
+            references: REF de las partidas, con o sin repetidos
+        """
+        with self._lock:
+            pending = [ref for ref in dict.fromkeys(references)
+                       if ref and ref not in self._cache and ref not in self._misses]
+        if not pending:
+            return
+
+        conn = None
+        cursor = None
+        try:
+            conn = psycopg2.connect(**self.config)
+            cursor = conn.cursor()
+            for start in range(0, len(pending), self.chunk_size):
+                chunk = pending[start:start + self.chunk_size]
+                cursor.execute(
+                    "SELECT pvsi_clave, velneo_id FROM articulos WHERE pvsi_clave = ANY(%s)",
+                    (chunk,)
+                )
+                found = {}
+                for pvsi_clave, velneo_id in cursor.fetchall():
+                    # Como el LIMIT 1 de get_articulo, gana la primera fila
+                    found.setdefault(pvsi_clave, velneo_id)
+                with self._lock:
+                    for ref in chunk:
+                        if ref in found:
+                            self._store(ref, found[ref])
+                        else:
+                            self._store_miss(ref)
+
+        except Exception as e:
+            # Las REF que no se pudieron consultar se reintentan en la siguiente llamada
+            logging.error(f"Error retrieving articulos Velneo IDs: {e}")
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def get(self, reference: str) -> Any:
+        """Obtiene el ID de Velneo de una REF, consultandola si no se conoce.
+
+        Args:
+            reference: REF de la partida
+
+        Returns:
+            El velneo_id o None si no hay articulo con esa REF
+        """
+        if not reference:
+            return None
+        for attempt in range(2):
+            with self._lock:
+                if reference in self._cache:
+                    self._cache.move_to_end(reference)
+                    return self._cache[reference]
+                if reference in self._misses:
+                    return None
+            if attempt == 0:
+                self.prefetch([reference])
+        return None
+
+    def clear(self) -> None:
+        """Olvida los articulos resueltos y las REF sin articulo."""
+        with self._lock:
+            self._cache.clear()
+            self._misses.clear()
+
+    def _store(self, reference: str, velneo_id: Any) -> None:
+        """Guarda un resultado en el LRU, descartando los menos usados (con el lock tomado)."""
+        self._cache[reference] = velneo_id
+        self._cache.move_to_end(reference)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def _store_miss(self, reference: str) -> None:
+        """Recuerda una REF sin articulo, descartando las mas antiguas (con el lock tomado)."""
+        self._misses[reference] = None
+        self._misses.move_to_end(reference)
+        while len(self._misses) > self.max_size:
+            self._misses.popitem(last=False)
+
+
+class VelneoMappingCache(VelneoMappings):
+    """Mapeos de Velneo precargados en memoria.
+
+    Carga en una sola consulta el cliente VTPUB y las tablas general_misc,
+    metodo_pago, vendedores, pais, tipo_movimiento, iva, caja_banco y
+    forma_pago, de modo que los getters son busquedas en diccionarios en
+    lugar de una conexion por valor. Los articulos se resuelven por lotes
+    con ArticuloResolver. Si la carga falla, los getters consultan la base
+    de datos como VelneoMappings.
+
+    Las tablas cargadas se guardan con sus versiones en un snapshot JSON
+    (VELNEO_MAP_SNAPSHOT_PATH). Al iniciar el proceso (warm_up) se toma el
+    snapshot y se revalida contra Postgres en segundo plano mientras se
+    leen los DBF; shared espera a la revalidacion, asi que los mapeos del
+    snapshot nunca llegan a los payloads sin validar.
+    """
+
+    # Tabla -> (columna de la clave, columna del ID de Velneo)
+    TABLES = {
+        'general_misc': ('title', 'id_velneo'),
+        'metodo_pago': ('pvsi', 'velneo'),
+        'vendedores': ('pvsi_clave', 'velneo'),
+        'pais': ('description', 'id'),
+        'tipo_movimiento': ('pvsi', 'velneo'),
+        'iva': ('pvsi', 'velneo'),
+        'caja_banco': ('pvsi', 'velneo'),
+        'forma_pago': ('pvsi', 'velneo'),
+    }
+
+    _shared: Dict[tuple, 'VelneoMappingCache'] = {}
+    _shared_lock = threading.Lock()
+
+    # Tablas cuyos cambios se vigilan: las precargadas, clientes (VTPUB) y articulos
+    WATCHED_TABLES = ('clientes', *TABLES, 'articulos')
+
+    # Version de cada tabla, la suben los triggers de la migracion 003_velneo_map_version.sql
+    # en la misma transaccion que cualquier INSERT, UPDATE, DELETE o TRUNCATE
+    WATERMARK_QUERY = """
+    SELECT tabla, version
+    FROM velneo_map_version
+    WHERE tabla = ANY(%s)
+    """
+
+    VERSION_TABLE_QUERY = "SELECT to_regclass('velneo_map_version') IS NOT NULL"
+
+    # Formato del snapshot, los de otro formato se descartan
+    SNAPSHOT_FORMAT = 2
+
+    # Si existe velneo_map_version, se revisa una vez por proceso
+    _version_table: Optional[bool] = None
+
+    def __init__(self, db_config: dict, snapshot_path: Optional[str] = None):
+        """
+        Args:
+            db_config: Configuracion de la base de datos
+            snapshot_path: Archivo JSON del snapshot de los mapeos, sin snapshot si es None
+        """
+        super().__init__(db_config)
+        self.cliente = None
+        self.tables: Optional[Dict[str, Dict[str, Any]]] = None
+        self.watermarks: Dict[str, int] = {}
+        self.loaded_at: Optional[datetime] = None
+        # True cuando los mapeos cargados se comprobaron contra Postgres
+        self.validated = False
+        self.articulos = ArticuloResolver(db_config)
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self._refresh_lock = threading.Lock()
+        self._revalidation: Optional[threading.Thread] = None
+
+    @staticmethod
+    def get_snapshot_path() -> Optional[str]:
+        """Archivo del snapshot segun VELNEO_MAP_SNAPSHOT y VELNEO_MAP_SNAPSHOT_PATH.
+
+        Returns:
+            Optional[str]: Ruta del archivo, <proyecto>/cache/velneo_mappings.json por
+                           defecto, None si VELNEO_MAP_SNAPSHOT=False
+        """
+        if os.getenv('VELNEO_MAP_SNAPSHOT', 'True').lower() != 'true':
+            return None
+        default = str(Path(__file__).parent.parent.parent / 'cache' / 'velneo_mappings.json')
+        return os.getenv('VELNEO_MAP_SNAPSHOT_PATH') or default
+
+    @classmethod
+    def load_query(cls, tables: Optional[Iterable[str]] = None, cliente: bool = True) -> str:
+        """Consulta que trae cada tabla como un objeto JSON clave -> ID de Velneo.
+
+        Args:
+            tables: Tablas de TABLES a traer, todas si es None
+            cliente: Si se trae tambien el cliente VTPUB (primera columna)
+        """
+        columns = []
+        if cliente:
+            columns.append("(SELECT velneo FROM clientes WHERE pvsi_clave = 'VTPUB' LIMIT 1) AS cliente")
+        for table in (cls.TABLES if tables is None else tables):
+            key, value = cls.TABLES[table]
+            columns.append(
+                f"(SELECT json_object_agg({key}, {value}) FROM {table} WHERE {key} IS NOT NULL) AS {table}"
+            )
+        return "SELECT\n    " + ",\n    ".join(columns)
+
+    def _read_watermarks(self, cursor) -> Dict[str, int]:
+        """Lee las versiones de las tablas vigiladas.
+
+        Sin la migracion no hay versiones, y todas las tablas se consideran
+        cambiadas en cada revision.
+        """
+        if VelneoMappingCache._version_table is None:
+            cursor.execute(self.VERSION_TABLE_QUERY)
+            VelneoMappingCache._version_table = bool(cursor.fetchone()[0])
+            if not VelneoMappingCache._version_table:
+                logging.warning("Falta la tabla velneo_map_version, aplique src/db/migrations/003_velneo_map_version.sql "
+                                "(python -m src.db.migrate); los mapeos de Velneo se recargan en cada revision")
+        if not VelneoMappingCache._version_table:
+            return {}
+        cursor.execute(self.WATERMARK_QUERY, (list(self.WATCHED_TABLES),))
+        return {table: int(version) for table, version in cursor.fetchall()}
+
+    def _load_tables(self, cursor, tables: Iterable[str], cliente: bool) -> None:
+        """Carga un grupo de mapeos y los cambia por los actuales.
+
+        Args:
+            cursor: Cursor abierto
+            tables: Tablas de TABLES a cargar
+            cliente: Si se carga tambien el cliente VTPUB
+        """
+        tables = list(tables)
+        if not tables and not cliente:
+            return
+        cursor.execute(self.load_query(tables, cliente))
+        row = list(cursor.fetchone())
+        loaded = dict(self.tables or {})
+        if cliente:
+            self.cliente = row.pop(0)
+        loaded.update({table: dict(values or {}) for table, values in zip(tables, row)})
+        # El diccionario se reemplaza entero para que los getters nunca vean una carga a medias
+        self.tables = loaded
+        self.loaded_at = datetime.now()
+        logging.info(
+            "Mapeos de Velneo cargados: "
+            + ", ".join(f"{table}={len(loaded[table])}" for table in tables)
+            + (" y cliente" if cliente else "")
+        )
+
+    def load(self) -> bool:
+        """Carga (o recarga) todos los mapeos en una sola consulta.
+
+        Returns:
+            bool: True si se cargaron, False si se seguira consultando la base de datos
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = psycopg2.connect(**self.config)
+            cursor = conn.cursor()
+            # Las versiones se leen antes, un cambio durante la carga se recarga en la siguiente revision
+            watermarks = self._read_watermarks(cursor)
+            self._load_tables(cursor, self.TABLES, cliente=True)
+            self.watermarks = watermarks
+            self.validated = True
+            self.save_snapshot()
+            return True
+
+        except Exception as e:
+            logging.error(f"Error al precargar los mapeos de Velneo, se consultaran uno por uno: {e}")
+            return False
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def _source(self) -> str:
+        """Base de datos de los mapeos, un snapshot de otra base no se usa."""
+        database = self.config.get('database') or self.config.get('dbname')
+        return f"{self.config.get('host')}:{self.config.get('port')}/{database}"
+
+    def load_snapshot(self) -> bool:
+        """Carga los mapeos del snapshot, sin consultar Postgres.
+
+        Returns:
+            bool: True si habia un snapshot valido de esta base de datos
+        """
+        if not self.snapshot_path or not self.snapshot_path.exists():
+            return False
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignorando el snapshot de mapeos {self.snapshot_path}: {e}")
+            return False
+
+        tables = snapshot.get('tables') or {}
+        if (snapshot.get('format') != self.SNAPSHOT_FORMAT or snapshot.get('source') != self._source()
+                or set(tables) != set(self.TABLES)):
+            return False
+        self.cliente = snapshot.get('cliente')
+        self.watermarks = {table: int(value) for table, value in (snapshot.get('watermarks') or {}).items()}
+        self.tables = tables
+        self.loaded_at = datetime.now()
+        logging.info(f"Mapeos de Velneo cargados del snapshot {self.snapshot_path} ({snapshot.get('saved_at')})")
+        return True
+
+    def save_snapshot(self) -> None:
+        """Guarda los mapeos cargados y sus versiones en el snapshot."""
+        if not self.snapshot_path or self.tables is None:
+            return
+        snapshot = {
+            'format': self.SNAPSHOT_FORMAT,
+            'source': self._source(),
+            'saved_at': datetime.now().isoformat(),
+            'watermarks': self.watermarks,
+            'cliente': self.cliente,
+            'tables': self.tables,
+        }
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.snapshot_path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning(f"Error al guardar el snapshot de mapeos {self.snapshot_path}: {e}")
+
+    def revalidate_in_background(self) -> threading.Thread:
+        """Revisa en un hilo aparte si las tablas cambiaron desde el snapshot (ver refresh).
+
+        Returns:
+            threading.Thread: Hilo de la revalidacion
+        """
+        self._revalidation = threading.Thread(target=self.refresh, name='velneo-mappings-revalidation', daemon=True)
+        self._revalidation.start()
+        return self._revalidation
+
+    def wait_for_revalidation(self, timeout: Optional[float] = None) -> bool:
+        """Espera a la revalidacion en segundo plano antes de usar los mapeos.
+
+        Si no termina a tiempo o no pudo revisar Postgres, los mapeos se
+        cargan de nuevo; si tampoco se pueden cargar se descarta el snapshot
+        y los getters consultan la base de datos.
+
+        Args:
+            timeout: Segundos de espera, VELNEO_MAP_REVALIDATION_TIMEOUT si es None
+
+        Returns:
+            bool: True si los mapeos cargados estan validados
+        """
+        if timeout is None:
+            timeout = float(os.getenv('VELNEO_MAP_REVALIDATION_TIMEOUT', '30'))
+        revalidation, self._revalidation = self._revalidation, None
+        if revalidation is not None:
+            revalidation.join(timeout)
+            if revalidation.is_alive():
+                logging.warning(f"La revalidacion de los mapeos de Velneo no termino en {timeout}s, se cargan de nuevo")
+        if not self.validated and not self.load():
+            # Un snapshot sin validar puede tener IDs que ya no existen en Velneo
+            self.tables = None
+        return self.validated
+
+    def refresh(self) -> List[str]:
+        """Recarga solo las tablas que cambiaron desde la ultima carga.
+
+        Compara las versiones de velneo_map_version con las de la ultima
+        carga. Las tablas precargadas que cambiaron se vuelven a traer en
+        una consulta; si cambiaron los articulos se vacia su LRU y la lista
+        de REF sin articulo. Una tabla sin version (sin la migracion o sin
+        su trigger) se recarga siempre.
+
+        Returns:
+            List[str]: Tablas que cambiaron
+        """
+        with self._refresh_lock:
+            if self.tables is None:
+                self.load()
+                return []
+            return self._refresh_changed()
+
+    def _refresh_changed(self) -> List[str]:
+        """Recarga las tablas cuya version cambio (con el lock de refresh tomado)."""
+        conn = None
+        cursor = None
+        try:
+            conn = psycopg2.connect(**self.config)
+            cursor = conn.cursor()
+            watermarks = self._read_watermarks(cursor)
+            changed = [table for table in self.WATCHED_TABLES
+                       if table not in watermarks or watermarks[table] != self.watermarks.get(table)]
+            if not changed:
+                self.validated = True
+                return []
+
+            self._load_tables(cursor, [table for table in changed if table in self.TABLES],
+                              cliente='clientes' in changed)
+            if 'articulos' in changed:
+                self.articulos.clear()
+            self.watermarks = watermarks
+            self.validated = True
+            self.save_snapshot()
+            logging.info(f"Mapeos de Velneo actualizados, tablas con cambios: {', '.join(changed)}")
+            return changed
+
+        except Exception as e:
+            # Se conservan los mapeos actuales y se vuelve a revisar en el siguiente lote
+            logging.error(f"Error al revisar los cambios de los mapeos de Velneo: {e}")
+            return []
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    @classmethod
+    def warm_up(cls, db_config: dict) -> 'VelneoMappingCache':
+        """Empieza a preparar la cache del proceso sin esperarla.
+
+        Se llama al iniciar el proceso, antes de leer los DBF: toma el
+        snapshot y lo revalida, o carga los mapeos si no hay snapshot, en
+        un hilo aparte. Si la cache ya existe no hace nada.
+
+        Args:
+            db_config: Configuracion de la base de datos
+
+        Returns:
+            VelneoMappingCache: Cache compartida por todos los DataMap del proceso
+        """
+        key = tuple(sorted(db_config.items()))
+        with cls._shared_lock:
+            cache = cls._shared.get(key)
+            if cache is None:
+                cache = cls(db_config, cls.get_snapshot_path())
+                cls._shared[key] = cache
+                cache.load_snapshot()
+                cache.revalidate_in_background()
+        return cache
+
+    @classmethod
+    def shared(cls, db_config: dict) -> 'VelneoMappingCache':
+        """Obtiene la cache del proceso para una configuracion.
+
+        La primera vez espera a la carga empezada por warm_up (ver
+        wait_for_revalidation); las siguientes (un nuevo dia o lote) recarga
+        las tablas que cambiaron desde entonces.
+
+        Args:
+            db_config: Configuracion de la base de datos
+
+        Returns:
+            VelneoMappingCache: Cache compartida por todos los DataMap del proceso
+        """
+        cache = cls.warm_up(db_config)
+        with cls._shared_lock:
+            if cache._revalidation is not None:
+                cache.wait_for_revalidation()
+            else:
+                cache.refresh()
+        return cache
+
+    def _lookup(self, table: str, reference) -> Any:
+        """Busca el ID de Velneo de una clave en una tabla precargada."""
+        if reference is None:
+            return None
+        return self.tables[table].get(str(reference))
+
+    def get_cliente(self):
+        if self.tables is None:
+            return super().get_cliente()
+        return self.cliente
+
+    def get_from_general_alm(self):
+        if self.tables is None:
+            return super().get_from_general_alm()
+        return self._lookup('general_misc', 'almacen')
+
+    def get_from_general_serie(self):
+        if self.tables is None:
+            return super().get_from_general_serie()
+        return self._lookup('general_misc', 'serie')
+
+    def get_from_general_emp(self):
+        if self.tables is None:
+            return super().get_from_general_emp()
+        return self._lookup('general_misc', 'empresa')
+
+    def get_from_general_div(self):
+        if self.tables is None:
+            return super().get_from_general_div()
+        return self._lookup('general_misc', 'division')
+
+    def get_from_general_plaza(self):
+        if self.tables is None:
+            return super().get_from_general_plaza()
+        return self._lookup('general_misc', 'plaza')
+
+    def get_metodo_pago(self, reference):
+        if self.tables is None:
+            return super().get_metodo_pago(reference)
+        return self._lookup('metodo_pago', reference)
+
+    def get_vendedor(self, reference):
+        if self.tables is None:
+            return super().get_vendedor(reference)
+        return self._lookup('vendedores', reference)
+
+    def get_pais(self, reference):
+        if self.tables is None:
+            return super().get_pais(reference)
+        return self._lookup('pais', reference)
+
+    def get_tipo_mov(self, reference):
+        if self.tables is None:
+            return super().get_tipo_mov(reference)
+        return self._lookup('tipo_movimiento', reference)
+
+    def get_tipo_iva(self, reference):
+        if self.tables is None:
+            return super().get_tipo_iva(reference)
+        return self._lookup('iva', reference)
+
+    def get_caja_banco(self, reference):
+        if self.tables is None:
+            return super().get_caja_banco(reference)
+        return self._lookup('caja_banco', reference)
+
+    def get_forma_pago(self, reference):
+        if self.tables is None:
+            return super().get_forma_pago(reference)
+        return self._lookup('forma_pago', reference)
+
+    def get_articulo(self, reference):
+        return self.articulos.get(reference)
+
+    def prefetch_articulos(self, references: Iterable[str]) -> None:
+        """Resuelve de una vez los articulos de un conjunto de partidas."""
+        self.articulos.prefetch(references)
@@ -0,0 +1,273 @@
+import logging
+import time
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+from .backend import ReaderBackend, project_fields, filters_use_or
+from .converters import DataConverter
+from .schema_cache import SchemaCache, TableSchema
+from .session import DBFSession
+from .stats import ReadStats
+from .watermarks import read_table_state
+
+# Rows are fetched with one GetValues call unless fewer than this share of the
+# columns is projected, then only the projected ordinals are fetched one by one
+BULK_FETCH_MIN_SHARE = 0.25
+
+class AdvantageBackend(ReaderBackend):
+    """Reads encrypted DBF/CDX tables through the Advantage .NET provider."""
+
+    name = 'advantage'
+
+    def __init__(self, data_source: str, encryption_password: str, session: Optional[DBFSession] = None,
+                 converter: Optional[DataConverter] = None, schema_cache: Optional[SchemaCache] = None):
+        """
+        Initialize the backend.
+
+        Args:
+            data_source: Path to the DBF directory
+            encryption_password: Password for encrypted DBF
+            session: Optional session to read through. By default the session
+                     shared by every reader of the same source directory is used.
+            converter: Converter used to build the per-table conversion plans
+            schema_cache: Cache of the table schemas, kept in memory by default
+        """
+        self.data_source = data_source
+        self.encryption_password = encryption_password
+        self.session = session or DBFSession.get(data_source, encryption_password)
+        self.converter = converter or DataConverter()
+        self.schema_cache = schema_cache or SchemaCache()
+
+    def iter_table(self, table_name: str, limit: Optional[int] = None, filters: Optional[List[Dict[str, Any]]] = None,
+                   columns: Optional[List[str]] = None, stats: Optional[ReadStats] = None) -> Iterator[Dict[str, Any]]:
+        """Yield records from a table one at a time with optional filters.
+
+        Reads go through the backend's session, whose connection stays open
+        between calls. The table reader is closed when the generator is
+        exhausted or discarded.
+
+        Args:
+            table_name: Name of the table to read
+            limit: Optional limit on number of records to read
+            filters: Optional list of filter conditions
+            columns: Optional list of columns to fetch, all columns if None.
+                     Only these ordinals are read from the provider.
+            stats: Optional stats object filled while reading
+
+        Yields:
+            Records as dictionaries
+        """
+        for _, record in self._read(table_name, limit, filters, columns, stats=stats):
+            yield record
+
+    def iter_records(self, table_name: str, limit: Optional[int] = None, filters: Optional[List[Dict[str, Any]]] = None,
+                     columns: Optional[List[str]] = None, start_recno: int = 1,
+                     stats: Optional[ReadStats] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (record number, record) pairs starting at a record number.
+
+        Records before start_recno are excluded with a RECNO() term added
+        to the AOF filter.
+
+        Args:
+            table_name: Name of the table to read
+            limit: Optional limit on number of records to read
+            filters: Optional list of filter conditions
+            columns: Optional list of columns to fetch, all columns if None
+            start_recno: 1-based record number to start reading at
+            stats: Optional stats object filled while reading
+
+        Yields:
+            Tuples of record number and record
+        """
+        return self._read(table_name, limit, filters, columns, start_recno, with_recno=True, stats=stats)
+
+    def _read(self, table_name: str, limit: Optional[int], filters: Optional[List[Dict[str, Any]]],
+              columns: Optional[List[str]], start_recno: int = 1, with_recno: bool = False,
+              stats: Optional[ReadStats] = None) -> Iterator[Tuple[Optional[int], Dict[str, Any]]]:
+        """Yield (record number, record) pairs, the number is None unless with_recno is set."""
+        now = time.perf_counter
+        stats = stats if stats is not None else ReadStats()
+        stats.table_name, stats.backend = table_name, self.name
+        resumed = now()
+
+        cmd = self.session.get_command(table_name)
+
+        # Get reader
+        reader = cmd.ExecuteExtendedReader()
+        try:
+            # Apply filters if any
+            filter_expr = self.build_filter_expression(filters)
+            if start_recno > 1:
+                recno_expr = f"RECNO() >= {int(start_recno)}"
+                filter_expr = f"({filter_expr}) AND {recno_expr}" if filter_expr else recno_expr
+            if filter_expr:
+                filter_start = now()
+                try:
+                    reader.Filter = filter_expr
+                except Exception as e:
+                    print(f"\nFilter error: {str(e)}")
+                    print(f"Filter expression: {filter_expr}")
+                    raise
+                stats.filter_time += now() - filter_start
+
+            # Resolve names, ordinals and converters once per read from the table schema
+            schema = self.get_schema(table_name, reader)
+            field_count = len(schema.names)
+            fields = list(zip(range(field_count), schema.names, self.converter.build_plan(schema.types)))
+            fields = project_fields(table_name, fields, columns)
+            ordinals = [i for i, _, _ in fields]
+            names_and_converters = [(field_name, convert) for _, field_name, convert in fields]
+            record_bytes = sum(schema.sizes[i] for i in ordinals)
+
+            # Each row is copied into the same object[] with a single interop call
+            bulk = len(ordinals) >= field_count * BULK_FETCH_MIN_SHARE
+            if bulk:
+                from System import Array, Object
+                buffer = Array[Object](field_count)
+                get_values = reader.GetValues
+            else:
+                get_value = reader.GetValue
+
+            # Process results
+            count = 0
+            while True:
+                fetch_start = now()
+                if not reader.Read():
+                    stats.fetch_time += now() - fetch_start
+                    break
+                values_start = now()
+                stats.fetch_time += values_start - fetch_start
+
+                if limit and count >= limit:
+                    break
+                stats.rows_scanned += 1
+
+                if bulk:
+                    get_values(buffer)
+                    values = [buffer[i] for i in ordinals]
+                    stats.value_calls += 1
+                else:
+                    values = [get_value(i) for i in ordinals]
+                    stats.value_calls += len(ordinals)
+                convert_start = now()
+                record = {}
+                for (field_name, convert), value in zip(names_and_converters, values):
+                    record[field_name] = convert(value)
+                convert_end = now()
+                stats.value_time += convert_start - values_start
+                stats.convert_time += convert_end - convert_start
+                stats.bytes_decoded += record_bytes
+                stats.rows_returned += 1
+
+                recno = reader.RecordNumber if with_recno else None
+                stats.elapsed += now() - resumed
+                resumed = None
+                yield recno, record
+                resumed = now()
+                count += 1
+        finally:
+            reader.Close()
+            if resumed is not None:
+                stats.elapsed += now() - resumed
+
+    def get_schema(self, table_name: str, reader: Any) -> TableSchema:
+        """Get the column names, types and widths of a table.
+
+        The schema is taken from the schema cache while the table's DBF
+        header is unchanged, otherwise it is queried from the reader and cached.
+
+        Args:
+            table_name: Name of the table
+            reader: Open reader of the table
+
+        Returns:
+            The table schema
+        """
+        try:
+            header_digest = read_table_state(self.get_table_path(table_name)).header
+        except (OSError, ValueError) as e:
+            logging.debug(f"Schema cache not used for {table_name}: {e}")
+            header_digest = None
+
+        if header_digest is not None:
+            schema = self.schema_cache.get(table_name, header_digest)
+            if schema is not None and len(schema.names) == reader.FieldCount:
+                return schema
+
+        field_count = reader.FieldCount
+        names = [reader.GetName(i) for i in range(field_count)]
+        types = [reader.GetFieldType(i).FullName for i in range(field_count)]
+        column_sizes = self._get_column_sizes(reader)
+        schema = TableSchema(names, types, [column_sizes.get(name.upper(), 0) for name in names])
+        if header_digest is not None:
+            self.schema_cache.set(table_name, header_digest, schema)
+        return schema
+
+    def _get_column_sizes(self, reader: Any) -> Dict[str, int]:
+        """Get the width in bytes of each column from the reader's schema table."""
+        try:
+            schema = reader.GetSchemaTable()
+            return {str(row["ColumnName"]).upper(): int(row["ColumnSize"]) for row in schema.Rows}
+        except Exception as e:
+            logging.debug(f"Column sizes not available: {e}")
+            return {}
+
+    def build_filter_expression(self, filters: Optional[List[Dict[str, Any]]]) -> Optional[str]:
+        """Build an AOF filter expression from a list of filter conditions.
+
+        Args:
+            filters: Optional list of filter conditions
+
+        Returns:
+            Filter expression or None if there is nothing to filter
+        """
+        if not filters:
+            return None
+
+        filter_conditions = []
+        use_or = filters_use_or(filters)
+
+        for f in filters:
+            if f['operator'] == 'range':
+                filter_conditions.append(
+                    f"({f['field']} >= '{f['from_value']}' AND "
+                    f"{f['field']} <= '{f['to_value']}')"
+                )
+            else:
+                filter_conditions.append(
+                    f"{f['field']}{f['operator']} '{f['value']}'"
+                )
+
+        if not filter_conditions:
+            return None
+
+        join_op = " OR " if use_or else " AND "
+        return join_op.join(filter_conditions)
+
+    def get_table_info(self, table_name: str) -> Dict[str, Any]:
+        """
+        Get information about table structure.
+
+        Args:
+            table_name: Name of the table
+
+        Returns:
+            Dictionary containing table metadata
+        """
+        reader = self.session.get_command(table_name).ExecuteReader()
+        try:
+            return {
+                'field_count': reader.FieldCount,
+                'columns': [reader.GetName(i) for i in range(reader.FieldCount)]
+            }
+        finally:
+            reader.Close()
+
+    def fork(self) -> 'AdvantageBackend':
+        """Create a backend with its own session (and connection)."""
+        session = DBFSession(self.data_source, self.encryption_password)
+        return AdvantageBackend(self.data_source, self.encryption_password, session=session, converter=self.converter,
+                                schema_cache=self.schema_cache)
+
+    def close(self) -> None:
+        """Close the backend's session connection."""
+        self.session.close()
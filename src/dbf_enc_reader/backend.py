@@ -0,0 +1,176 @@
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+from .stats import ReadStats
+from .watermarks import WatermarkStore, IncrementalRead, TableWatermark, read_table_state
+
+class ReaderBackend(ABC):
+    """Interface of the engines DBFReader reads tables through.
+
+    A backend yields records already converted to native Python values,
+    applies the reader's filter dictionaries and fetches only the requested
+    columns. A backend that does not implement every abstract method fails
+    when it is created, not in the middle of a read.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def iter_table(self, table_name: str, limit: Optional[int] = None, filters: Optional[List[Dict[str, Any]]] = None,
+                   columns: Optional[List[str]] = None, stats: Optional[ReadStats] = None) -> Iterator[Dict[str, Any]]:
+        """Yield records from a table one at a time.
+
+        Args:
+            table_name: Name of the table to read
+            limit: Optional limit on number of records to read
+            filters: Optional list of filter conditions
+            columns: Optional list of columns to fetch, all columns if None
+            stats: Optional stats object filled while reading
+
+        Yields:
+            Records as dictionaries
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_records(self, table_name: str, limit: Optional[int] = None, filters: Optional[List[Dict[str, Any]]] = None,
+                     columns: Optional[List[str]] = None, start_recno: int = 1,
+                     stats: Optional[ReadStats] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (record number, record) pairs starting at a record number.
+
+        Args:
+            table_name: Name of the table to read
+            limit: Optional limit on number of records to read
+            filters: Optional list of filter conditions
+            columns: Optional list of columns to fetch, all columns if None
+            start_recno: 1-based record number to start reading at
+            stats: Optional stats object filled while reading
+
+        Yields:
+            Tuples of record number and record
+        """
+        raise NotImplementedError
+
+    def read_new_records(self, table_name: str, watermarks: WatermarkStore,
+                         filters: Optional[List[Dict[str, Any]]] = None, columns: Optional[List[str]] = None,
+                         key: Optional[str] = None) -> IncrementalRead:
+        """Read only the records appended to a table since the previous call.
+
+        See DBFReader.read_new_records.
+
+        Args:
+            table_name: Name of the table to read
+            watermarks: Store holding the watermark of the previous call
+            filters: Optional list of filter conditions
+            columns: Optional list of columns to fetch, all columns if None
+            key: Name the watermark is saved under, the table name by default
+
+        Returns:
+            IncrementalRead with the new records, whether the table was
+            fully rescanned and the new watermark
+        """
+        key = key or table_name.upper()
+        state = read_table_state(self.get_table_path(table_name))
+        previous = watermarks.get(key)
+
+        if previous is not None and (previous.size, previous.mtime_ns, previous.header) == (state.size, state.mtime_ns, state.header):
+            return IncrementalRead([], False, previous)
+
+        full_scan = (previous is None or state.header != previous.header
+                     or state.size < previous.size or state.recno < previous.recno)
+        start_recno = 1 if full_scan else previous.recno + 1
+
+        records = []
+        last_recno = 0 if full_scan else previous.recno
+        for recno, record in self.iter_records(table_name, None, filters, columns, start_recno):
+            records.append(record)
+            last_recno = max(last_recno, recno)
+
+        # Rows appended while reading are past the header count and were read too
+        watermark = TableWatermark(max(state.recno, last_recno), state.size, state.mtime_ns, state.header)
+        watermarks.set(key, watermark)
+        return IncrementalRead(records, full_scan, watermark)
+
+    def get_table_path(self, table_name: str) -> Path:
+        """Get the path of a table's DBF file.
+
+        Args:
+            table_name: Name of the DBF file (matched case-insensitively)
+
+        Returns:
+            Path to the file
+        """
+        return resolve_table_path(Path(self.data_source), table_name)
+
+    @abstractmethod
+    def get_table_info(self, table_name: str) -> Dict[str, Any]:
+        """Get information about table structure.
+
+        Args:
+            table_name: Name of the table
+
+        Returns:
+            Dictionary containing table metadata
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def fork(self) -> 'ReaderBackend':
+        """Create an equivalent backend with its own connection, for use in another thread."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the resources held by the backend."""
+        pass
+
+
+def resolve_table_path(data_source: Path, table_name: str) -> Path:
+    """Find a table's file in a directory, ignoring the case of its name.
+
+    Args:
+        data_source: Directory holding the DBF files
+        table_name: Name of the table, with or without the .DBF extension
+
+    Returns:
+        Path to the file
+    """
+    path = data_source / table_name
+    if path.exists():
+        return path
+    if not table_name.upper().endswith('.DBF'):
+        table_name = f"{table_name}.DBF"
+    wanted = table_name.upper()
+    for candidate in data_source.iterdir():
+        if candidate.name.upper() == wanted:
+            return candidate
+    raise FileNotFoundError(f"Table {table_name} not found in {data_source}")
+
+
+def project_fields(table_name: str, fields: List[Tuple], columns: Optional[List[str]]) -> List[Tuple]:
+    """Keep only the requested columns, in the requested order.
+
+    Args:
+        table_name: Name of the table being read (for logging)
+        fields: Tuples describing every column, with the column name at index 1
+        columns: Column names to keep (case insensitive), all columns if None
+
+    Returns:
+        Tuples for the requested columns
+    """
+    if not columns:
+        return fields
+    by_name = {field[1].upper(): field for field in fields}
+    projected = []
+    for column in dict.fromkeys(column.upper() for column in columns):
+        if column in by_name:
+            projected.append(by_name[column])
+        else:
+            logging.warning(f"Column {column} not found in {table_name}, skipping it")
+    return projected
+
+
+def filters_use_or(filters: List[Dict[str, Any]]) -> bool:
+    """Check whether a filter list is ORed (several conditions on the same field) or ANDed."""
+    return len(filters) > 1 and all(f['field'] == filters[0]['field'] for f in filters)
@@ -1,27 +1,46 @@
-import clr
+import threading
 from pathlib import Path
 from typing import Optional
 
 class DBFConnection:
+    _dll_path: Optional[str] = None
     _dll_loaded = False
+    _load_lock = threading.Lock()
 
     @classmethod
     def set_dll_path(cls, path: str) -> None:
         """Set the path to Advantage Data Provider DLL.
         
+        The CLR runtime and the DLL are not loaded here but on the first
+        connection, so code that never reads a DBF does not pay for them.
+        
         Args:
             path: Full path to Advantage.Data.Provider.dll
         """
-        try:
-            clr.AddReference(path)
+        if cls._dll_loaded and path != cls._dll_path:
+            raise RuntimeError(f"Advantage DLL already loaded from {cls._dll_path}")
+        cls._dll_path = path
+
+    @classmethod
+    def load_provider(cls) -> None:
+        """Start the CLR and load the Advantage DLL, once per process."""
+        if cls._dll_loaded:
+            return
+        with cls._load_lock:
+            if cls._dll_loaded:
+                return
+            cls._check_dll_path()
+            try:
+                import clr
+                clr.AddReference(cls._dll_path)
+            except Exception as e:
+                raise RuntimeError(f"Failed to load Advantage DLL from {cls._dll_path}: {str(e)}")
             cls._dll_loaded = True
-        except Exception as e:
-            raise RuntimeError(f"Failed to load Advantage DLL from {path}: {str(e)}")
 
     @classmethod
-    def _check_dll_loaded(cls) -> None:
-        """Check if DLL is loaded before attempting connection."""
-        if not cls._dll_loaded:
+    def _check_dll_path(cls) -> None:
+        """Check if the DLL path is set before attempting to load it."""
+        if not cls._dll_path:
             raise RuntimeError(
                 "Advantage DLL path not set. Call DBFConnection.set_dll_path() first with the path to Advantage.Data.Provider.dll"
             )
@@ -50,7 +69,7 @@ class DBFConnection:
 
     def connect(self) -> None:
         """Establish connection to the DBF file."""
-        self._check_dll_loaded()
+        self.load_provider()
         
         try:
             # Import here after DLL is loaded
@@ -1,5 +1,82 @@
-from decimal import Decimal
-from typing import Any
+from datetime import datetime, date
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, List, Optional
+
+Converter = Callable[[Any], Any]
+
+# .NET type names (Type.FullName) grouped by the Python type they map to
+STRING_TYPES = {'System.String', 'System.Char'}
+INTEGER_TYPES = {'System.Byte', 'System.SByte', 'System.Int16', 'System.Int32', 'System.Int64',
+                 'System.UInt16', 'System.UInt32', 'System.UInt64'}
+FLOAT_TYPES = {'System.Double', 'System.Single'}
+DECIMAL_TYPES = {'System.Decimal'}
+DATETIME_TYPES = {'System.DateTime'}
+BOOLEAN_TYPES = {'System.Boolean'}
+
+
+def format_legacy_datetime(value: datetime) -> str:
+    """Format a datetime the way the Advantage provider stringified it (es-MX culture).
+
+    Example: 30/04/2025 12:00:00 a. m.
+
+    Args:
+        value: Datetime to format
+
+    Returns:
+        Formatted date string
+    """
+    suffix = 'a. m.' if value.hour < 12 else 'p. m.'
+    hour = value.hour % 12 or 12
+    return f"{value.day:02d}/{value.month:02d}/{value.year:04d} {hour:02d}:{value.minute:02d}:{value.second:02d} {suffix}"
+
+
+def parse_legacy_date(value: Any) -> Optional[date]:
+    """Get the date part of a value stored in the legacy DD/MM/YYYY string format.
+
+    Args:
+        value: Date string, date or datetime
+
+    Returns:
+        The date or None if it can not be parsed
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value).split(' ')[0], '%d/%m/%Y').date()
+    except ValueError:
+        return None
+
+
+def normalize_reference(value: Any) -> str:
+    """Normalize a document reference (e.g. REF_NUM or CAMPO1) for joining.
+
+    Numeric references compare by value, so '000010', 10 and Decimal('10')
+    all give '10'. Other values are stripped.
+
+    Args:
+        value: Reference value as read from a DBF or mapped record
+
+    Returns:
+        Normalized reference, '' when empty
+    """
+    if value is None:
+        return ''
+    if isinstance(value, (int, float, Decimal)):
+        try:
+            if value == int(value):
+                return str(int(value))
+        except (ValueError, OverflowError, InvalidOperation):
+            pass
+        return str(value)
+    text = str(value).strip()
+    if text.isdigit():
+        return str(int(text))
+    return text
+
 
 class DataConverter:
     def smart_trim(self, value: Any) -> Any:
@@ -39,3 +116,117 @@ class DataConverter:
             
         # Apply smart trimming after conversion
         return self.smart_trim(value)
+
+    def build_plan(self, field_types: List[str]) -> List[Converter]:
+        """
+        Build one converter per column from the .NET field types of a table.
+
+        The plan is built once per table so rows are converted without
+        sniffing the type of every cell.
+
+        Args:
+            field_types: .NET type names (Type.FullName) in column order
+
+        Returns:
+            List of converters in column order
+        """
+        from System import DBNull
+        from System.Globalization import CultureInfo
+
+        invariant = CultureInfo.InvariantCulture
+
+        def convert_string(value):
+            if value is None or isinstance(value, DBNull):
+                return ''
+            return str(value).strip()
+
+        def convert_integer(value):
+            if value is None or isinstance(value, DBNull):
+                return None
+            return int(value)
+
+        def convert_float(value):
+            if value is None or isinstance(value, DBNull):
+                return None
+            return float(value)
+
+        def convert_decimal(value):
+            if value is None or isinstance(value, DBNull):
+                return None
+            if isinstance(value, (int, float)):
+                return Decimal(str(value))
+            return Decimal(value.ToString(invariant))
+
+        def convert_datetime(value):
+            if value is None or isinstance(value, DBNull):
+                return None
+            return datetime(value.Year, value.Month, value.Day, value.Hour, value.Minute, value.Second)
+
+        def convert_boolean(value):
+            if value is None or isinstance(value, DBNull):
+                return None
+            return bool(value)
+
+        plan = []
+        for field_type in field_types:
+            if field_type in STRING_TYPES:
+                plan.append(convert_string)
+            elif field_type in INTEGER_TYPES:
+                plan.append(convert_integer)
+            elif field_type in FLOAT_TYPES:
+                plan.append(convert_float)
+            elif field_type in DECIMAL_TYPES:
+                plan.append(convert_decimal)
+            elif field_type in DATETIME_TYPES:
+                plan.append(convert_datetime)
+            elif field_type in BOOLEAN_TYPES:
+                plan.append(convert_boolean)
+            else:
+                plan.append(self.convert_value)
+        return plan
+
+    def to_number(self, value: Any) -> Any:
+        """
+        Convert a native value to the number type used by the mappings.
+
+        Decimals with a fractional scale become floats and the rest become
+        ints, which is what parsing the provider's string output produced.
+
+        Args:
+            value: Value to convert
+
+        Returns:
+            int or float, 0 if the value is not numeric
+        """
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, int):
+            return value
+        if isinstance(value, float):
+            return int(value) if value.is_integer() else value
+        if isinstance(value, Decimal):
+            return float(value) if value.as_tuple().exponent < 0 else int(value)
+        try:
+            return float(value) if '.' in str(value) else int(value)
+        except (ValueError, TypeError, InvalidOperation):
+            return 0
+
+    def to_string(self, value: Any) -> str:
+        """
+        Convert a native value to the string form the provider used to return.
+
+        Args:
+            value: Value to convert
+
+        Returns:
+            String representation of the value
+        """
+        if isinstance(value, str):
+            return value
+        if value is None:
+            return ''
+        if isinstance(value, datetime):
+            return format_legacy_datetime(value)
+        if isinstance(value, date):
+            return format_legacy_datetime(datetime(value.year, value.month, value.day))
+        return str(value)
@@ -1,98 +1,156 @@
-import clr
 import json
-from typing import List, Dict, Any, Optional
+import logging
+from typing import List, Dict, Any, Optional, Iterator, Union, Callable, Tuple
 from pathlib import Path
 
 from .connection import DBFConnection
+from .session import DBFSession
 from .converters import DataConverter
+from .backend import ReaderBackend
+from .advantage_backend import AdvantageBackend
+from .mmap_backend import MMapDBFBackend
+from .schema_cache import SchemaCache
+from .stats import ReadStats
+from .watermarks import WatermarkStore, IncrementalRead
+
+# Backends DBFReader can be created with by name
+BACKENDS = {
+    AdvantageBackend.name: AdvantageBackend,
+    MMapDBFBackend.name: MMapDBFBackend,
+}
 
 class DBFReader:
-    def __init__(self, data_source: str, encryption_password: str):
+    def __init__(self, data_source: str, encryption_password: str, session: Optional[DBFSession] = None,
+                 backend: Union[str, ReaderBackend, None] = None, watermarks: Optional[WatermarkStore] = None,
+                 on_stats: Optional[Callable[[ReadStats], None]] = None, schema_cache: Optional[SchemaCache] = None):
         """
         Initialize DBF reader with connection parameters.
         
         Args:
             data_source: Path to the DBF file
             encryption_password: Password for encrypted DBF
+            session: Optional session for the Advantage backend. By default the session
+                     shared by every reader of the same source directory is used.
+            backend: Backend instance or name ('advantage' or 'mmap'), 'advantage' by default
+            watermarks: Store of the incremental read positions, kept in memory by default
+            on_stats: Optional hook called with the ReadStats of every finished read
+            schema_cache: Cache of the table schemas for the Advantage backend, kept in memory by default
         """
-        self.connection = DBFConnection(data_source, encryption_password)
+        self.data_source = data_source
+        self.encryption_password = encryption_password
         self.converter = DataConverter()
+        if backend is None or isinstance(backend, str):
+            backend_name = backend or AdvantageBackend.name
+            if backend_name not in BACKENDS:
+                raise ValueError(f"Unknown DBF reader backend: {backend_name}. Use one of {list(BACKENDS)}")
+            if backend_name == AdvantageBackend.name:
+                backend = AdvantageBackend(data_source, encryption_password, session=session, converter=self.converter,
+                                           schema_cache=schema_cache)
+            else:
+                backend = BACKENDS[backend_name](data_source, encryption_password)
+        self.backend = backend
+        self.watermarks = watermarks or WatermarkStore()
+        self.on_stats = on_stats
+        # Stats of the last finished read
+        self.last_stats: Optional[ReadStats] = None
 
-    def read_table(self, table_name: str, limit: Optional[int] = None, filters: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    def read_table(self, table_name: str, limit: Optional[int] = None, filters: Optional[List[Dict[str, Any]]] = None,
+                   columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """Read records from a table with optional filters.
         
         Args:
             table_name: Name of the table to read
             limit: Optional limit on number of records to read
             filters: Optional list of filter conditions
+            columns: Optional list of columns to fetch, all columns if None
             
         Returns:
             List of records as dictionaries
         """
-        results = []
-        with self.connection as conn:
-            from System.Data import CommandType
-            
-            # Create command with TableDirect for better performance
-            cmd = conn.conn.CreateCommand()
-            cmd.CommandType = CommandType.TableDirect
-            cmd.CommandText = table_name
-            cmd.AdsOptimizedFilters = True  # Enable AOF for better performance
-            
-            # Get reader
-            reader = cmd.ExecuteExtendedReader()
-            
-            # Apply filters if any
-            if filters:
-                filter_conditions = []
-                use_or = len(filters) > 1 and all(f['field'] == filters[0]['field'] for f in filters)
-                
-                for f in filters:
-                    # print(f' filter ////// {f}')
-                    if f['operator'] == 'range':
-                        filter_conditions.append(
-                            f"{f['field']} >= '{f['from_value']}' AND "
-                            f"{f['field']} <= '{f['to_value']}'"
-                        )
-                    else:
-                        filter_conditions.append(
-                            f"{f['field']}{f['operator']} '{f['value']}'"
-                        )
+        return list(self.iter_table(table_name, limit, filters, columns))
 
-                # print(f'HERE ------ {filter_conditions}')        
-                
-                if filter_conditions:
-                    join_op = " OR " if use_or else " AND "
-                    filter_expr = join_op.join(filter_conditions)
-                    # print(f"\nApplying AOF filter: {filter_expr}")
-                    
-                    try:
-                        reader.Filter = filter_expr
-                    except Exception as e:
-                        print(f"\nFilter error: {str(e)}")
-                        print(f"Filter expression: {filter_expr}")
-                        raise
+    def read_table_with_stats(self, table_name: str, limit: Optional[int] = None,
+                              filters: Optional[List[Dict[str, Any]]] = None,
+                              columns: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], ReadStats]:
+        """Read records from a table and return them with the stats of the read.
+        
+        Args:
+            table_name: Name of the table to read
+            limit: Optional limit on number of records to read
+            filters: Optional list of filter conditions
+            columns: Optional list of columns to fetch, all columns if None
             
-            # Process results
-            count = 0
-            while reader.Read():
-               
-                if limit and count >= limit:
-                    break
-                    
-                record = {}
-                for i in range(reader.FieldCount):
-                    field_name = reader.GetName(i)
-                    value = reader.GetValue(i)
-                    record[field_name] = self.converter.convert_value(value)
-                 
-                results.append(record)
-                count += 1
+        Returns:
+            Tuple of the records and their ReadStats
+        """
+        stats = ReadStats()
+        records = list(self.iter_table(table_name, limit, filters, columns, stats))
+        return records, stats
+
+    def iter_table(self, table_name: str, limit: Optional[int] = None, filters: Optional[List[Dict[str, Any]]] = None,
+                   columns: Optional[List[str]] = None, stats: Optional[ReadStats] = None) -> Iterator[Dict[str, Any]]:
+        """Yield records from a table one at a time with optional filters.
+        
+        Args:
+            table_name: Name of the table to read
+            limit: Optional limit on number of records to read
+            filters: Optional list of filter conditions
+            columns: Optional list of columns to fetch, all columns if None.
+                     Only these columns are read by the backend.
+            stats: Optional stats object to fill, a new one is used if None.
+                   When the read finishes it is kept in last_stats and passed to on_stats.
             
-            return results
+        Yields:
+            Records as dictionaries
+        """
+        stats = stats if stats is not None else ReadStats()
+        return self._publish_stats(self.backend.iter_table(table_name, limit, filters, columns, stats), stats)
+
+    def _publish_stats(self, records: Iterator[Dict[str, Any]], stats: ReadStats) -> Iterator[Dict[str, Any]]:
+        """Pass the records through and publish the stats once the read is finished."""
+        try:
+            yield from records
+        finally:
+            self.last_stats = stats
+            if self.on_stats is not None:
+                try:
+                    self.on_stats(stats)
+                except Exception as e:
+                    logging.warning(f"Error in read stats hook: {e}")
+
+    def read_new_records(self, table_name: str, filters: Optional[List[Dict[str, Any]]] = None,
+                         columns: Optional[List[str]] = None, key: Optional[str] = None) -> IncrementalRead:
+        """Read only the records appended to a table since the previous call.
+        
+        The watermark saved by the previous call (last record number, file
+        size, mtime and header digest) decides where the read starts:
+        - unchanged size and mtime: nothing is read
+        - the file grew with the same header: records after the watermark are read
+        - no watermark, the file shrank (e.g. packed) or the header changed:
+          the whole table is rescanned
+        Records changed in place are not detected, this is meant for
+        append-only tables.
+        
+        Args:
+            table_name: Name of the table to read
+            filters: Optional list of filter conditions
+            columns: Optional list of columns to fetch, all columns if None
+            key: Name the watermark is saved under, the table name by default.
+                 Use a different key per filter set.
             
+        Returns:
+            IncrementalRead with the new records, whether the table was
+            fully rescanned and the new watermark
+        """
+        return self.backend.read_new_records(table_name, self.watermarks, filters, columns, key)
+
+    def fork(self) -> 'DBFReader':
+        """Create a reader with its own backend connection, for use in another thread."""
+        return DBFReader(self.data_source, self.encryption_password, backend=self.backend.fork(),
+                         watermarks=self.watermarks, on_stats=self.on_stats)
 
-    def to_json(self, table_name: str, limit: Optional[int] = None, filters: Optional[List[Dict[str, Any]]] = None) -> str:
+    def to_json(self, table_name: str, limit: Optional[int] = None, filters: Optional[List[Dict[str, Any]]] = None,
+                columns: Optional[List[str]] = None) -> str:
         """
         Convert table records to JSON string.
         
@@ -100,16 +158,17 @@ class DBFReader:
             table_name: Name of the table to convert
             limit: Optional limit on number of records to convert
             filters: Optional list of filter conditions
+            columns: Optional list of columns to fetch, all columns if None
             
         Returns:
             JSON string representation of the records
         """
-        records = self.read_table(table_name, limit, filters)
+        records = self.read_table(table_name, limit, filters, columns)
         #print(self.get_table_info(table_name))
 
         # print(f' records  {records}')
         
-        return json.dumps(records, indent=4, ensure_ascii=False)
+        return json.dumps(records, indent=4, ensure_ascii=False, default=self.converter.to_string)
 
     def get_table_info(self, table_name: str) -> Dict[str, Any]:
         """
@@ -121,9 +180,8 @@ class DBFReader:
         Returns:
             Dictionary containing table metadata
         """
-        with self.connection as conn:
-            reader = conn.get_reader(table_name)
-            return {
-                'field_count': reader.FieldCount,
-                'columns': [reader.GetName(i) for i in range(reader.FieldCount)]
-            }
+        return self.backend.get_table_info(table_name)
+
+    def close(self) -> None:
+        """Close the reader's backend connection."""
+        self.backend.close()
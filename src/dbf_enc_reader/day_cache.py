@@ -0,0 +1,274 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+
+from .filters import coalesce_ranges
+from .watermarks import TableWatermark
+
+# Bump when the layout of the cache files changes, older files are then ignored
+CACHE_FORMAT_VERSION = 2
+
+# Tags of the values JSON has no type for
+_DATETIME_TAG = '$datetime'
+_DATE_TAG = '$date'
+_DECIMAL_TAG = '$decimal'
+_BYTES_TAG = '$bytes'
+
+
+def iter_days(start_date: date, end_date: date) -> Iterator[date]:
+    """Yield every day between two dates, both included."""
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def day_ranges(days: Iterable[date]) -> List[Tuple[date, date]]:
+    """Collapse days into contiguous (first, last) ranges.
+
+    Example: [1, 2, 3, 5] -> [(1, 3), (5, 5)]
+
+    Args:
+        days: Days in any order
+
+    Returns:
+        Sorted list of inclusive day ranges
+    """
+    ranges = coalesce_ranges(day.toordinal() for day in days)
+    return [(date.fromordinal(low), date.fromordinal(high)) for low, high in ranges]
+
+
+def _encode_value(value: Any) -> Any:
+    """Tag the values of a DBF row JSON cannot hold."""
+    if isinstance(value, datetime):
+        return {_DATETIME_TAG: value.isoformat()}
+    if isinstance(value, date):
+        return {_DATE_TAG: value.isoformat()}
+    if isinstance(value, Decimal):
+        return {_DECIMAL_TAG: str(value)}
+    if isinstance(value, bytes):
+        return {_BYTES_TAG: base64.b64encode(value).decode('ascii')}
+    raise TypeError(f"Cannot store {type(value).__name__} values in the day cache")
+
+
+def _decode_value(obj: Dict[str, Any]) -> Any:
+    """Rebuild a value tagged by _encode_value."""
+    if len(obj) == 1:
+        tag, value = next(iter(obj.items()))
+        if tag == _DATETIME_TAG:
+            return datetime.fromisoformat(value)
+        if tag == _DATE_TAG:
+            return date.fromisoformat(value)
+        if tag == _DECIMAL_TAG:
+            return Decimal(value)
+        if tag == _BYTES_TAG:
+            return base64.b64decode(value)
+    return obj
+
+
+class DayCache:
+    """On-disk cache of raw DBF rows, one file per table and day.
+
+    Rows are stored column by column (a list of values per column), so
+    loading a day is a single file read with no pythonnet calls. The files
+    are JSON with dates and decimals tagged, preceded by the SHA-256 of the
+    content: loading one never runs code, and a truncated or edited file is
+    a miss.
+
+    A day is served from here only while it is closed, older than
+    ``open_days``, and the DBF file it was read from has not changed since
+    (same size, mtime and header, see watermarks.read_table_state). Any
+    write to the table, including edits and cancellations of old invoices,
+    makes its cached days be read again.
+    """
+
+    def __init__(self, cache_dir: str, open_days: int = 2):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory where the cache files are kept
+            open_days: Number of days, counting today, that are still open
+        """
+        self.cache_dir = Path(cache_dir)
+        self.open_days = max(int(open_days), 1)
+
+    def is_closed(self, day: date, today: Optional[date] = None) -> bool:
+        """Check whether a day is closed and can be cached.
+
+        Args:
+            day: Day to check
+            today: Reference day, the current date if None
+
+        Returns:
+            True if the day is older than the open window
+        """
+        today = today or date.today()
+        return day <= today - timedelta(days=self.open_days)
+
+    def load(self, table_name: str, day: date, columns: Optional[List[str]] = None,
+             source: Optional[TableWatermark] = None) -> Optional[List[Dict[str, Any]]]:
+        """Load the cached rows of a table for one day.
+
+        Args:
+            table_name: Name of the DBF table
+            day: Day to load
+            columns: Columns the caller reads the table with. Entries stored
+                     for a different column set are treated as missing.
+            source: Current state of the DBF file, entries stored from
+                    another state are treated as missing
+
+        Returns:
+            List of records or None if the day is not cached
+        """
+        path = self._get_path(table_name, day)
+        try:
+            with open(path, 'rb') as f:
+                digest, _, payload = f.read().partition(b'\n')
+            if digest.decode('ascii') != hashlib.sha256(payload).hexdigest():
+                raise ValueError("checksum mismatch")
+            entry = json.loads(payload, object_hook=_decode_value)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable cache file {path}: {e}")
+            return None
+
+        if (entry.get('version') != CACHE_FORMAT_VERSION or entry.get('requested') != self._normalize(columns)
+                or entry.get('source') != self._source(source)):
+            return None
+
+        names = entry['columns']
+        if not names:
+            return [{} for _ in range(entry['rows'])]
+        values = [entry['data'][name] for name in names]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def store(self, table_name: str, day: date, rows: List[Dict[str, Any]], columns: Optional[List[str]] = None,
+              source: Optional[TableWatermark] = None) -> None:
+        """Store the rows of a table for one day, replacing any previous entry.
+
+        Args:
+            table_name: Name of the DBF table
+            day: Day the rows belong to
+            rows: Records read from the DBF
+            columns: Columns the table was read with
+            source: State of the DBF file the rows were read from
+
+        Raises:
+            TypeError: If a row holds a value that cannot be stored
+        """
+        names = list(dict.fromkeys(name for row in rows for name in row))
+        entry = {
+            'version': CACHE_FORMAT_VERSION,
+            'requested': self._normalize(columns),
+            'source': self._source(source),
+            'columns': names,
+            'rows': len(rows),
+            'data': {name: [row.get(name) for row in rows] for name in names},
+        }
+
+        payload = json.dumps(entry, default=_encode_value, separators=(',', ':')).encode('utf-8')
+
+        path = self._get_path(table_name, day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(hashlib.sha256(payload).hexdigest().encode('ascii') + b'\n')
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _get_path(self, table_name: str, day: date) -> Path:
+        """Get the file holding a table's rows for one day."""
+        return self.cache_dir / Path(table_name).stem.upper() / f"{day.isoformat()}.json"
+
+    @staticmethod
+    def _source(source: Optional[TableWatermark]) -> Optional[List[Any]]:
+        """Get the part of a file state that tells whether the file changed."""
+        if source is None:
+            return None
+        return [source.size, source.mtime_ns, source.header]
+
+    @staticmethod
+    def _normalize(columns: Optional[List[str]]) -> Optional[List[str]]:
+        """Normalize a column list so equivalent lists compare equal."""
+        if not columns:
+            return None
+        return sorted({column.upper() for column in columns})
+
+
+class DayCacheWriter:
+    """Collects the rows of the closed days being read and stores them once the read is complete.
+
+    Only the rows of those days are kept, the other rows are just
+    streamed through. Nothing is stored if a row has no usable date, as
+    it could belong to any of them.
+    """
+
+    def __init__(self, cache: DayCache, days: Iterable[date], columns: Dict[str, List[str]],
+                 sources: Dict[str, TableWatermark]):
+        """
+        Initialize the writer.
+
+        Args:
+            cache: Day cache to store the rows in
+            days: Closed days being read
+            columns: Columns each table is read with
+            sources: State of each DBF file before it was read
+        """
+        self.cache = cache
+        self.columns = columns
+        self.sources = sources
+        self.rows: Dict[str, Dict[date, List[Dict[str, Any]]]] = {table: {day: [] for day in days} for table in columns}
+        # Day of each header read, by padded NO_REFEREN, details are stored with the day of their header
+        self.folio_days: Dict[str, Optional[date]] = {}
+        self.undated = False
+
+    def add(self, table_name: str, day: Optional[date], record: Dict[str, Any]) -> None:
+        """Keep a row read from the DBF if it belongs to one of the days.
+
+        Args:
+            table_name: Table the row was read from
+            day: Day of the row, None if it has no usable date
+            record: Raw row
+        """
+        if day is None:
+            self.undated = True
+            return
+        rows = self.rows[table_name].get(day)
+        if rows is not None:
+            rows.append(record)
+
+    def store(self) -> List[date]:
+        """Store every day with the rows collected for each table.
+
+        Returns:
+            Days stored
+        """
+        if self.undated:
+            logging.warning("Some DBF rows have no usable date, not updating the day cache")
+            return []
+        days = sorted(next(iter(self.rows.values()), {}))
+        try:
+            for day in days:
+                for table, rows in self.rows.items():
+                    self.cache.store(table, day, rows[day], self.columns[table], self.sources[table])
+        except Exception as e:
+            logging.warning(f"Error writing the day cache: {e}")
+            return []
+        if days:
+            logging.info(f"Stored {len(days)} closed days in the day cache")
+        return days
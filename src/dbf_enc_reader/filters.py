@@ -0,0 +1,79 @@
+from typing import List, Dict, Any, Iterable, Tuple
+
+# Folios missing inside a range are read too and dropped by the exact folio check
+FOLIO_RANGE_MAX_GAP = 5
+# Upper bound of range terms ORed into a single AOF expression
+FOLIO_RANGES_PER_FILTER = 50
+
+
+def coalesce_ranges(numbers: Iterable[int], max_gap: int = 0) -> List[Tuple[int, int]]:
+    """Collapse a set of integers into sorted (start, end) ranges.
+
+    Args:
+        numbers: Integers to collapse
+        max_gap: Number of missing values allowed inside a single range
+
+    Returns:
+        List of inclusive (start, end) tuples
+    """
+    ranges = []
+    for number in sorted(set(numbers)):
+        if ranges and number - ranges[-1][1] <= max_gap + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return [(start, end) for start, end in ranges]
+
+
+def build_folio_filters(field: str, folios: Iterable[Any], width: int = 6,
+                        max_gap: int = FOLIO_RANGE_MAX_GAP,
+                        max_ranges: int = FOLIO_RANGES_PER_FILTER) -> List[List[Dict[str, Any]]]:
+    """Build bounded AOF filter lists that cover a set of zero-padded folios.
+
+    Folios are compared as fixed width strings, so ranges are only built
+    between folios of the same padded length. Folios that are not numeric
+    get an equality term.
+
+    Args:
+        field: DBF field holding the folio (e.g. 'NO_REFEREN')
+        folios: Folio numbers to cover
+        width: Width the folios are zero-padded to in the DBF
+        max_gap: Number of missing folios allowed inside a single range
+        max_ranges: Maximum number of terms per filter list
+
+    Returns:
+        List of filter lists, each one to be applied in its own read
+    """
+    numbers_by_length: Dict[int, List[int]] = {}
+    terms = []
+    for folio in folios:
+        padded = str(folio).strip().zfill(width)
+        if padded.isdigit():
+            numbers_by_length.setdefault(len(padded), []).append(int(padded))
+        else:
+            terms.append({
+                'field': field,
+                'operator': '=',
+                'value': padded,
+                'is_numeric': False
+            })
+
+    for length in sorted(numbers_by_length):
+        for start, end in coalesce_ranges(numbers_by_length[length], max_gap):
+            if start == end:
+                terms.append({
+                    'field': field,
+                    'operator': '=',
+                    'value': str(start).zfill(length),
+                    'is_numeric': False
+                })
+            else:
+                terms.append({
+                    'field': field,
+                    'operator': 'range',
+                    'from_value': str(start).zfill(length),
+                    'to_value': str(end).zfill(length),
+                    'is_numeric': False
+                })
+
+    return [terms[i:i + max_ranges] for i in range(0, len(terms), max_ranges)]
@@ -1,8 +1,29 @@
 import json
+import os
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Iterable, NamedTuple, Tuple, Callable
+
+from .converters import DataConverter, Converter
+
+
+class FieldPlan(NamedTuple):
+    """One step of a compiled mapping: copy source into target through convert."""
+    source: str
+    target: str
+    convert: Converter
+
+
+# A table's compiled mappings, in mappings.json order
+MappingPlan = Tuple[FieldPlan, ...]
+
 
 class MappingManager:
+    # Mappings and compiled plans shared by every manager of the same file, by
+    # resolved path: (mtime_ns, mappings, plans by DBF name)
+    _compiled: Dict[str, Tuple[int, Dict[str, Any], Dict[str, MappingPlan]]] = {}
+    _compiled_lock = threading.Lock()
+
     def __init__(self, mapping_file_path: str):
         """Initialize the mapping manager with the path to mappings.json.
         
@@ -11,17 +32,129 @@ class MappingManager:
         """
         self.mapping_file_path = Path(mapping_file_path)
         self.mappings: Dict[str, Any] = {}
+        self._plans: Dict[str, MappingPlan] = {}
+        self._mtime_ns: Optional[int] = None
         self.load_mappings()
 
     def load_mappings(self) -> None:
-        """Load the mappings from the JSON file."""
+        """Load the mappings from the JSON file.
+        
+        Compiled plans are reused from other managers of the same file as
+        long as its mtime has not changed.
+        """
         try:
-            with open(self.mapping_file_path, 'r', encoding='utf-8') as f:
-                self.mappings = json.load(f)
+            mtime_ns = os.stat(self.mapping_file_path).st_mtime_ns
         except FileNotFoundError:
             raise FileNotFoundError(f"Mapping file not found at {self.mapping_file_path}")
-        except json.JSONDecodeError:
-            raise ValueError(f"Invalid JSON format in mapping file {self.mapping_file_path}")
+
+        key = str(self.mapping_file_path.resolve())
+        with MappingManager._compiled_lock:
+            cached = MappingManager._compiled.get(key)
+            if cached is not None and cached[0] == mtime_ns:
+                self._mtime_ns, self.mappings, self._plans = cached
+                return
+
+            try:
+                with open(self.mapping_file_path, 'r', encoding='utf-8') as f:
+                    self.mappings = json.load(f)
+            except FileNotFoundError:
+                raise FileNotFoundError(f"Mapping file not found at {self.mapping_file_path}")
+            except json.JSONDecodeError:
+                raise ValueError(f"Invalid JSON format in mapping file {self.mapping_file_path}")
+            self._mtime_ns = mtime_ns
+            self._plans = {}
+            MappingManager._compiled[key] = (mtime_ns, self.mappings, self._plans)
+
+    def reload_if_changed(self) -> bool:
+        """Reload the mappings if mappings.json changed since they were loaded.
+        
+        Returns:
+            True if the mappings were reloaded
+        """
+        try:
+            mtime_ns = os.stat(self.mapping_file_path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime_ns == self._mtime_ns:
+            return False
+        self.load_mappings()
+        return True
+
+    def get_plan(self, dbf_name: str) -> MappingPlan:
+        """Get the compiled mapping plan of a DBF file.
+        
+        The plan is compiled once per mappings.json version and shared by
+        every manager of the same file.
+        
+        Args:
+            dbf_name: Name of the DBF file
+            
+        Returns:
+            Tuple of (source field, target key, converter) steps
+        """
+        self.reload_if_changed()
+        plan = self._plans.get(dbf_name)
+        if plan is None:
+            plan = self.compile_plan(self.get_field_mappings(dbf_name))
+            self._plans[dbf_name] = plan
+        return plan
+
+    @staticmethod
+    def compile_plan(field_mappings: Dict[str, Dict[str, str]]) -> MappingPlan:
+        """Compile field mappings into a plan.
+        
+        Fields of type 'number' are converted with DataConverter.to_number
+        and the rest with DataConverter.to_string.
+        
+        Args:
+            field_mappings: Field mappings as found in mappings.json
+            
+        Returns:
+            Tuple of (source field, target key, converter) steps
+        """
+        converter = DataConverter()
+        return tuple(
+            FieldPlan(mapping['dbf'], mapping['velneo_table'],
+                      converter.to_number if mapping['type'] == 'number' else converter.to_string)
+            for mapping in field_mappings.values()
+        )
+
+    @staticmethod
+    def apply_plan(record: Dict[str, Any], plan: MappingPlan) -> Dict[str, Any]:
+        """Transform one record with a compiled plan.
+        
+        Source fields missing from the record are left out.
+        
+        Args:
+            record: Raw record from DBF
+            plan: Compiled mapping plan
+            
+        Returns:
+            Transformed record with mapped field names and types
+        """
+        return {target: convert(record[source]) for source, target, convert in plan if source in record}
+
+    def transform_many(self, dbf_name: str, records: Iterable[Dict[str, Any]],
+                       record_type: Optional[Callable[[Dict[str, Any]], Any]] = None) -> List[Dict[str, Any]]:
+        """Transform a stream of records of a DBF file with its compiled plan.
+        
+        Records that map to no field at all are dropped.
+        
+        Args:
+            dbf_name: Name of the DBF file the records come from
+            records: Raw records from DBF
+            record_type: Optional type the transformed dictionaries are converted to
+            
+        Returns:
+            List of transformed records
+        """
+        plan = self.get_plan(dbf_name)
+        transformed = []
+        for record in records:
+            row = {target: convert(record[source]) for source, target, convert in plan if source in record}
+            if row:
+                transformed.append(record_type(row) if record_type else row)
+        return transformed
 
     def get_dbf_mappings(self, dbf_name: str) -> Optional[Dict[str, Any]]:
         """Get the mappings for a specific DBF file.
@@ -58,6 +191,20 @@ class MappingManager:
         dbf_config = self.get_dbf_mappings(dbf_name)
         return dbf_config.get('fields', {}) if dbf_config else {}
 
+    def get_source_columns(self, dbf_name: str, extra_columns: Optional[List[str]] = None) -> List[str]:
+        """Get the DBF columns a table needs to be read with.
+        
+        Args:
+            dbf_name: Name of the DBF file
+            extra_columns: Columns needed besides the mapped ones (e.g. filter fields)
+            
+        Returns:
+            List of DBF column names without duplicates
+        """
+        columns = [mapping['dbf'] for mapping in self.get_field_mappings(dbf_name).values()]
+        columns.extend(extra_columns or [])
+        return list(dict.fromkeys(columns))
+
 # Usage example:
 if __name__ == "__main__":
     mapper = MappingManager("mappings.json")
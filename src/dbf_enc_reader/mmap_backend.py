@@ -0,0 +1,405 @@
+import mmap
+import os
+import struct
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Callable, NamedTuple, Tuple
+
+from .backend import ReaderBackend, project_fields, filters_use_or
+from .stats import ReadStats
+
+# dBase language driver ids (header byte 29) and the codec they use
+CODEPAGES = {
+    0x01: 'cp437', 0x02: 'cp850', 0x03: 'cp1252', 0x57: 'cp1252', 0x58: 'cp1252',
+    0x59: 'cp1252', 0x64: 'cp852', 0x65: 'cp866', 0x7D: 'cp1255', 0x7E: 'cp1256',
+    0xC8: 'cp1250', 0xC9: 'cp1251', 0xCA: 'cp1254', 0xCB: 'cp1253',
+}
+DEFAULT_ENCODING = 'cp1252'
+VISUAL_FOXPRO_VERSIONS = {0x30, 0x31, 0x32}
+DELETED_FLAG = 0x2A  # '*'
+JULIAN_EPOCH = 2440588  # Julian day number of 1970-01-01
+# Date literal formats accepted in filter values, the first one is the one the controllers use
+FILTER_DATE_FORMATS = ['%m-%d-%Y', '%m/%d/%Y', '%Y-%m-%d']
+
+
+class DBFField(NamedTuple):
+    name: str
+    type: str
+    offset: int
+    length: int
+    decimals: int
+
+
+class DBFTableFile:
+    """Memory-mapped view of a single unencrypted DBF file."""
+
+    def __init__(self, path: Path):
+        """
+        Map the file and parse its header and field descriptors.
+
+        Args:
+            path: Path to the DBF file
+        """
+        self.path = path
+        stat = os.stat(path)
+        self.signature = (stat.st_size, stat.st_mtime_ns)
+        self._file = open(path, 'rb')
+        try:
+            self.mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        mm = self.mm
+        if len(mm) < 32:
+            self.close()
+            raise ValueError(f"{path} is not a DBF file")
+
+        self.version = mm[0]
+        record_count, self.header_length, self.record_length = struct.unpack_from('<IHH', mm, 4)
+        self.encoding = CODEPAGES.get(mm[29], DEFAULT_ENCODING)
+
+        self.fields: List[DBFField] = []
+        offset = 1  # Byte 0 of every record is the deletion flag
+        pos = 32
+        while pos + 32 <= self.header_length and mm[pos] != 0x0D:
+            name = mm[pos:pos + 11].split(b'\0', 1)[0].decode('ascii', 'replace').strip().upper()
+            field_type = chr(mm[pos + 11]).upper()
+            length = mm[pos + 16]
+            decimals = mm[pos + 17]
+            if field_type == 'C':
+                # Clipper stores the high byte of long character fields in the decimals byte
+                length += decimals << 8
+                decimals = 0
+            if field_type != '0':  # Skip the Visual FoxPro _NullFlags system field
+                self.fields.append(DBFField(name, field_type, offset, length, decimals))
+            offset += length
+            pos += 32
+
+        available = max(0, (len(mm) - self.header_length) // self.record_length) if self.record_length else 0
+        self.record_count = min(record_count, available)
+
+    def record_offset(self, recno: int) -> int:
+        """Get the byte offset of a 1-based record number."""
+        return self.header_length + (recno - 1) * self.record_length
+
+    def close(self) -> None:
+        """Unmap and close the file."""
+        try:
+            if not self.mm.closed:
+                self.mm.close()
+        except AttributeError:
+            pass
+        self._file.close()
+
+
+class MMapDBFBackend(ReaderBackend):
+    """Reads unencrypted DBF files by memory-mapping them, without the Advantage provider.
+
+    Fields are decoded straight from the mapped file using the header
+    descriptors, and only the fields needed by the filters and the requested
+    columns are decoded. CDX indexes are not used: filters are evaluated
+    while scanning. Memo fields are returned as None.
+    """
+
+    name = 'mmap'
+
+    def __init__(self, data_source: str, encryption_password: Optional[str] = None):
+        """
+        Initialize the backend.
+
+        Args:
+            data_source: Path to the directory holding the DBF files
+            encryption_password: Ignored, encrypted tables can not be read by this backend
+        """
+        self.data_source = Path(data_source)
+        self._tables: Dict[str, DBFTableFile] = {}
+
+    def open_table(self, table_name: str) -> DBFTableFile:
+        """Get the mapped file of a table, remapping it if the file changed.
+
+        Args:
+            table_name: Name of the DBF file (matched case-insensitively)
+
+        Returns:
+            The mapped table
+        """
+        key = table_name.upper()
+        path = self.get_table_path(table_name)
+        table = self._tables.get(key)
+        if table is not None:
+            stat = os.stat(path)
+            if table.path == path and table.signature == (stat.st_size, stat.st_mtime_ns):
+                return table
+            table.close()
+        table = DBFTableFile(path)
+        self._tables[key] = table
+        return table
+
+    def iter_table(self, table_name: str, limit: Optional[int] = None, filters: Optional[List[Dict[str, Any]]] = None,
+                   columns: Optional[List[str]] = None, stats: Optional[ReadStats] = None) -> Iterator[Dict[str, Any]]:
+        """Yield records from a table one at a time with optional filters.
+
+        Deleted records are skipped.
+
+        Args:
+            table_name: Name of the table to read
+            limit: Optional limit on number of records to read
+            filters: Optional list of filter conditions
+            columns: Optional list of columns to fetch, all columns if None
+            stats: Optional stats object filled while reading
+
+        Yields:
+            Records as dictionaries
+        """
+        for _, record in self.iter_records(table_name, limit, filters, columns, stats=stats):
+            yield record
+
+    def iter_records(self, table_name: str, limit: Optional[int] = None, filters: Optional[List[Dict[str, Any]]] = None,
+                     columns: Optional[List[str]] = None, start_recno: int = 1,
+                     stats: Optional[ReadStats] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (record number, record) pairs starting at a record number.
+
+        Args:
+            table_name: Name of the table to read
+            limit: Optional limit on number of records to read
+            filters: Optional list of filter conditions
+            columns: Optional list of columns to fetch, all columns if None
+            start_recno: 1-based record number to start scanning at
+            stats: Optional stats object filled while reading
+
+        Yields:
+            Tuples of record number and record
+        """
+        now = time.perf_counter
+        stats = stats if stats is not None else ReadStats()
+        stats.table_name, stats.backend = table_name, self.name
+        resumed = now()
+
+        table = self.open_table(table_name)
+        decoders = {field.name: self._decoder(field, table) for field in table.fields}
+        fields = [(field.offset, field.name, field.offset + field.length, decoders[field.name])
+                  for field in table.fields]
+        fields = project_fields(table_name, fields, columns)
+        matches = self._compile_filters(table_name, table, filters, decoders)
+        record_bytes = sum(end - start for start, _, end, _ in fields)
+
+        # Fields are decoded from views over the mapping, slicing them copies nothing
+        data = memoryview(table.mm)
+        row = None
+        record_length = table.record_length
+        count = 0
+        try:
+            for recno in range(max(start_recno, 1), table.record_count + 1):
+                if limit and count >= limit:
+                    break
+                base = table.record_offset(recno)
+                if data[base] == DELETED_FLAG:
+                    continue
+                row = data[base:base + record_length]
+                stats.rows_scanned += 1
+                if matches is not None:
+                    filter_start = now()
+                    matched = matches(row)
+                    stats.filter_time += now() - filter_start
+                    if not matched:
+                        continue
+
+                convert_start = now()
+                record = {}
+                for start, field_name, end, decode in fields:
+                    record[field_name] = decode(row[start:end])
+                stats.convert_time += now() - convert_start
+                stats.value_calls += len(fields)
+                stats.bytes_decoded += record_bytes
+                stats.rows_returned += 1
+
+                stats.elapsed += now() - resumed
+                resumed = None
+                yield recno, record
+                resumed = now()
+                count += 1
+        finally:
+            # The mapping cannot be closed while views over it are alive
+            if row is not None:
+                row.release()
+            data.release()
+            if resumed is not None:
+                stats.elapsed += now() - resumed
+            # Record lookups are not timed one by one, they take the rest of the time
+            stats.fetch_time = max(stats.elapsed - stats.filter_time - stats.convert_time, 0.0)
+
+    def get_table_info(self, table_name: str) -> Dict[str, Any]:
+        """
+        Get information about table structure.
+
+        Args:
+            table_name: Name of the table
+
+        Returns:
+            Dictionary containing table metadata
+        """
+        table = self.open_table(table_name)
+        return {
+            'field_count': len(table.fields),
+            'columns': [field.name for field in table.fields],
+            'record_count': table.record_count
+        }
+
+    def fork(self) -> 'MMapDBFBackend':
+        """Create a backend with its own file mappings."""
+        return MMapDBFBackend(str(self.data_source))
+
+    def close(self) -> None:
+        """Unmap every open table."""
+        for table in self._tables.values():
+            table.close()
+        self._tables.clear()
+
+    def _decoder(self, field: DBFField, table: DBFTableFile) -> Callable[[memoryview], Any]:
+        """Get the function decoding the raw bytes of a field (a view or bytes) to a native value."""
+        encoding = table.encoding
+        field_type = field.type
+
+        if field_type in ('C', 'V'):
+            return lambda raw: str(raw, encoding, 'replace').strip()
+
+        if field_type in ('N', 'F'):
+            exponent = Decimal(1).scaleb(-field.decimals) if field.decimals else None
+
+            def decode_numeric(raw):
+                text = str(raw, 'ascii', 'replace').strip()
+                if not text or text.startswith('*'):
+                    return None
+                try:
+                    value = Decimal(text)
+                except InvalidOperation:
+                    return None
+                return value.quantize(exponent) if exponent is not None else value
+            return decode_numeric
+
+        if field_type == 'D':
+            def decode_date(raw):
+                text = str(raw, 'ascii', 'replace').strip()
+                if not text or text == '00000000':
+                    return None
+                try:
+                    return datetime.strptime(text, '%Y%m%d')
+                except ValueError:
+                    return None
+            return decode_date
+
+        if field_type == 'L':
+            def decode_logical(raw):
+                flag = bytes(raw[:1]).upper()
+                if flag in (b'T', b'Y'):
+                    return True
+                if flag in (b'F', b'N'):
+                    return False
+                return None
+            return decode_logical
+
+        if field_type == 'I':
+            return lambda raw: struct.unpack('<i', raw)[0]
+
+        if field_type == 'B' and table.version in VISUAL_FOXPRO_VERSIONS:
+            return lambda raw: struct.unpack('<d', raw)[0]
+
+        if field_type == 'Y':
+            return lambda raw: Decimal(struct.unpack('<q', raw)[0]).scaleb(-4)
+
+        if field_type == 'T':
+            def decode_datetime(raw):
+                day, milliseconds = struct.unpack('<ii', raw)
+                if day == 0:
+                    return None
+                value = datetime(1970, 1, 1) + timedelta(days=day - JULIAN_EPOCH, milliseconds=milliseconds)
+                return value.replace(microsecond=0)
+            return decode_datetime
+
+        # Memo, general and binary fields live outside the DBF file
+        return lambda raw: None
+
+    def _compile_filters(self, table_name: str, table: DBFTableFile, filters: Optional[List[Dict[str, Any]]],
+                         decoders: Dict[str, Callable[[memoryview], Any]]) -> Optional[Callable[[memoryview], bool]]:
+        """Compile the filter dictionaries into a predicate over a mapped record.
+
+        Conditions are combined the same way the Advantage backend builds its
+        AOF expression: ORed when they all target the same field, ANDed otherwise.
+
+        Returns:
+            Predicate taking a view over the record, or None without filters
+        """
+        if not filters:
+            return None
+
+        fields_by_name = {field.name: field for field in table.fields}
+        conditions = []
+        for f in filters:
+            field = fields_by_name.get(f['field'].upper())
+            if field is None:
+                raise ValueError(f"Filter field {f['field']} not found in {table_name}")
+            test = self._compile_condition(field, f)
+            conditions.append((field.offset, field.offset + field.length, decoders[field.name], test))
+
+        use_or = filters_use_or(filters)
+
+        def matches(row):
+            for start, end, decode, test in conditions:
+                if test(decode(row[start:end])):
+                    if use_or:
+                        return True
+                elif not use_or:
+                    return False
+            return not use_or
+
+        return matches
+
+    def _compile_condition(self, field: DBFField, condition: Dict[str, Any]) -> Callable[[Any], bool]:
+        """Compile one filter dictionary into a test over the decoded field value."""
+        operator = condition['operator'].strip()
+
+        if operator == 'range':
+            low = self._filter_value(field, condition['from_value'])
+            high = self._filter_value(field, condition['to_value'])
+            return lambda value: value is not None and low <= self._comparable(field, value) <= high
+
+        expected = self._filter_value(field, condition['value'])
+        comparisons = {
+            '=': lambda a, b: a == b,
+            '==': lambda a, b: a == b,
+            '<>': lambda a, b: a != b,
+            '!=': lambda a, b: a != b,
+            '#': lambda a, b: a != b,
+            '>': lambda a, b: a > b,
+            '>=': lambda a, b: a >= b,
+            '<': lambda a, b: a < b,
+            '<=': lambda a, b: a <= b,
+        }
+        if operator not in comparisons:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+        compare = comparisons[operator]
+        return lambda value: value is not None and compare(self._comparable(field, value), expected)
+
+    def _comparable(self, field: DBFField, value: Any) -> Any:
+        if field.type in ('D', 'T'):
+            return value.date()
+        return value
+
+    def _filter_value(self, field: DBFField, value: Any) -> Any:
+        """Convert a filter literal to the type of the field it is compared to."""
+        if field.type in ('D', 'T'):
+            text = str(value).strip()
+            for fmt in FILTER_DATE_FORMATS:
+                try:
+                    return datetime.strptime(text, fmt).date()
+                except ValueError:
+                    continue
+            raise ValueError(f"Invalid date filter value for {field.name}: {value}")
+        if field.type in ('N', 'F', 'I', 'B', 'Y'):
+            return Decimal(str(value).strip())
+        if field.type == 'L':
+            return str(value).strip().upper() in ('T', 'Y', '.T.', 'TRUE')
+        return str(value).strip()
@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, NamedTuple
+
+
+class TableSchema(NamedTuple):
+    """Column names, .NET type names and widths of a table, by ordinal."""
+    names: List[str]
+    types: List[str]
+    sizes: List[int]
+
+
+class SchemaCache:
+    """Keeps the schema of each table so it is not queried from the provider on every run.
+
+    Entries are stored with the digest of the DBF header they were read
+    from (see watermarks.read_table_state), so a change in the table
+    structure invalidates them. When a path is given the cache is saved to
+    a JSON file and reused by later runs.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the cache, loading the saved schemas if any.
+
+        Args:
+            path: JSON file to persist the schemas to, memory only if None
+        """
+        self.path = Path(path) if path else None
+        self._schemas: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._schemas = json.load(f)
+            except ValueError as e:
+                logging.warning(f"Ignoring invalid schema cache file {self.path}: {e}")
+
+    def get(self, table_name: str, header_digest: str) -> Optional[TableSchema]:
+        """Get the cached schema of a table if it was read from the same header.
+
+        Args:
+            table_name: Name of the table
+            header_digest: Digest of the table's current DBF header
+
+        Returns:
+            The schema or None if it is not cached or the header changed
+        """
+        with self._lock:
+            entry = self._schemas.get(table_name.upper())
+        if entry is None or entry.get('header') != header_digest:
+            return None
+        return TableSchema(entry['names'], entry['types'], entry['sizes'])
+
+    def set(self, table_name: str, header_digest: str, schema: TableSchema) -> None:
+        """Save the schema of a table, writing the file if the cache has one.
+
+        Args:
+            table_name: Name of the table
+            header_digest: Digest of the DBF header the schema was read from
+            schema: Schema to save
+        """
+        with self._lock:
+            self._schemas[table_name.upper()] = {'header': header_digest, **schema._asdict()}
+            if not self.path:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                # Other controllers may write the same file, each one uses its own temporary file
+                fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self._schemas, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logging.warning(f"Error writing schema cache {self.path}: {e}")
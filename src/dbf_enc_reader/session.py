@@ -0,0 +1,131 @@
+import atexit
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, Tuple
+
+from .connection import DBFConnection
+
+class DBFSession:
+    """Keeps one Advantage connection open for the whole run.
+
+    Sessions are shared per source directory and thread through
+    DBFSession.get(), so every reader and table of a run reuses the same
+    AdsConnection and the prepared TableDirect command of each table, while
+    threads processing different days never share a connection. All shared
+    sessions are closed at interpreter shutdown.
+    """
+
+    _sessions: Dict[Tuple[str, str, int], 'DBFSession'] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, data_source: str, encryption_password: str) -> 'DBFSession':
+        """Get the shared session of the current thread for a source directory, creating it if needed.
+
+        Args:
+            data_source: Path to the DBF directory
+            encryption_password: Password for encrypted DBF
+
+        Returns:
+            The shared session
+        """
+        key = (str(Path(data_source).resolve()), encryption_password, threading.get_ident())
+        with cls._lock:
+            session = cls._sessions.get(key)
+            if session is None:
+                session = cls(data_source, encryption_password)
+                cls._sessions[key] = session
+            return session
+
+    @classmethod
+    def close_thread_sessions(cls) -> None:
+        """Close the shared sessions of the current thread."""
+        thread_id = threading.get_ident()
+        with cls._lock:
+            keys = [key for key in cls._sessions if key[2] == thread_id]
+            sessions = [cls._sessions.pop(key) for key in keys]
+        for session in sessions:
+            session.close()
+
+    @classmethod
+    def close_all(cls) -> None:
+        """Close every shared session."""
+        with cls._lock:
+            sessions = list(cls._sessions.values())
+            cls._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def __init__(self, data_source: str, encryption_password: str):
+        """
+        Initialize a session. The connection is opened on first use.
+
+        Args:
+            data_source: Path to the DBF directory
+            encryption_password: Password for encrypted DBF
+        """
+        self.connection = DBFConnection(data_source, encryption_password)
+        self._commands: Dict[str, Any] = {}
+
+    def is_open(self) -> bool:
+        """Check whether the underlying connection is open."""
+        conn = self.connection.conn
+        if conn is None:
+            return False
+        from System.Data import ConnectionState
+        return conn.State == ConnectionState.Open
+
+    def open(self) -> None:
+        """Open the connection if it is not open yet."""
+        if not self.is_open():
+            self._commands.clear()
+            self.connection.connect()
+
+    def get_command(self, table_name: str) -> Any:
+        """Get the prepared TableDirect command for a table.
+
+        Commands are created once per table and reused by later reads.
+        Readers executed from them must be closed before the next read of
+        the same table.
+
+        Args:
+            table_name: Name of the table
+
+        Returns:
+            AdsCommand ready to execute
+        """
+        self.open()
+        cmd = self._commands.get(table_name)
+        if cmd is None:
+            from System.Data import CommandType
+
+            # Create command with TableDirect for better performance
+            cmd = self.connection.conn.CreateCommand()
+            cmd.CommandType = CommandType.TableDirect
+            cmd.CommandText = table_name
+            cmd.AdsOptimizedFilters = True  # Enable AOF for better performance
+            self._commands[table_name] = cmd
+        return cmd
+
+    def close(self) -> None:
+        """Dispose the cached commands and close the connection."""
+        for cmd in self._commands.values():
+            try:
+                cmd.Dispose()
+            except Exception as e:
+                logging.warning(f"Error disposing DBF command: {e}")
+        self._commands.clear()
+        self.connection.reader = None
+        self.connection.close()
+        self.connection.conn = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+atexit.register(DBFSession.close_all)
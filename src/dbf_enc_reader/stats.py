@@ -0,0 +1,49 @@
+from dataclasses import dataclass, asdict
+from typing import Dict, Any
+
+
+@dataclass
+class ReadStats:
+    """Counters and timings of a single table read.
+
+    Times are in seconds and only count the time spent inside the reader,
+    not the time the caller spends between records.
+    """
+    table_name: str = ''
+    backend: str = ''
+    reads: int = 1  # Number of reads merged into these stats
+    rows_scanned: int = 0  # Rows the backend looked at (after the AOF filter for Advantage)
+    rows_returned: int = 0  # Rows yielded after filtering, projection and limit
+    value_calls: int = 0  # Field values fetched (GetValue calls for Advantage)
+    bytes_decoded: int = 0  # Bytes of the DBF record fields that were decoded
+    fetch_time: float = 0.0  # Moving through the table (reader.Read() / record lookup)
+    value_time: float = 0.0  # Fetching field values across the interop boundary
+    convert_time: float = 0.0  # Converting values to Python types
+    filter_time: float = 0.0  # Applying the filters
+    elapsed: float = 0.0  # Total time spent in the reader
+
+    @property
+    def rows_per_second(self) -> float:
+        """Rows scanned per second of reader time."""
+        return self.rows_scanned / self.elapsed if self.elapsed > 0 else 0.0
+
+    def merge(self, other: 'ReadStats') -> None:
+        """Add the counters and timings of another read of the same table."""
+        for name in ('reads', 'rows_scanned', 'rows_returned', 'value_calls', 'bytes_decoded',
+                     'fetch_time', 'value_time', 'convert_time', 'filter_time', 'elapsed'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the stats as a dictionary, including rows_per_second."""
+        data = asdict(self)
+        data['rows_per_second'] = self.rows_per_second
+        return data
+
+    def summary(self) -> str:
+        """One line description of the stats, for logging."""
+        return (f"{self.table_name} [{self.backend}] reads: {self.reads}, "
+                f"rows scanned/returned: {self.rows_scanned}/{self.rows_returned}, "
+                f"value calls: {self.value_calls}, bytes: {self.bytes_decoded}, "
+                f"fetch: {self.fetch_time:.3f}s, values: {self.value_time:.3f}s, "
+                f"convert: {self.convert_time:.3f}s, filter: {self.filter_time:.3f}s, "
+                f"total: {self.elapsed:.3f}s, {self.rows_per_second:.0f} rows/s")
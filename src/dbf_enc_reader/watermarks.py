@@ -0,0 +1,105 @@
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, NamedTuple
+
+
+class TableWatermark(NamedTuple):
+    """Position of a table read: last record number, file size, mtime and header digest."""
+    recno: int
+    size: int
+    mtime_ns: int
+    header: str
+
+
+class IncrementalRead(NamedTuple):
+    """Result of an incremental read."""
+    records: List[Dict[str, Any]]
+    full_scan: bool  # True when the table was rescanned from the first record
+    watermark: TableWatermark
+
+
+def read_table_state(path: Path) -> TableWatermark:
+    """Read the current state of a DBF file from its header.
+
+    The header digest skips the last update date and the record count,
+    which change on every append, so it only changes when the table
+    structure does. The header is not encrypted in Advantage encrypted
+    tables, so this works for both backends.
+
+    Args:
+        path: Path to the DBF file
+
+    Returns:
+        Watermark holding the record count of the file
+    """
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        prefix = f.read(32)
+        if len(prefix) < 32:
+            raise ValueError(f"{path} is not a DBF file")
+        record_count, header_length = struct.unpack_from('<IH', prefix, 4)
+        header = prefix + f.read(max(header_length - 32, 0))
+    digest = hashlib.md5(header[:1] + header[8:]).hexdigest()
+    return TableWatermark(record_count, stat.st_size, stat.st_mtime_ns, digest)
+
+
+class WatermarkStore:
+    """Keeps the watermark of each incrementally read table.
+
+    Watermarks are kept in memory and, when a path is given, saved to a
+    JSON file so the next run continues where this one stopped.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the store, loading the saved watermarks if any.
+
+        Args:
+            path: JSON file to persist the watermarks to, memory only if None
+        """
+        self.path = Path(path) if path else None
+        self._watermarks: Dict[str, TableWatermark] = {}
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                self._watermarks = {key: TableWatermark(**value) for key, value in saved.items()}
+            except (ValueError, TypeError) as e:
+                logging.warning(f"Ignoring invalid watermark file {self.path}: {e}")
+
+    def get(self, key: str) -> Optional[TableWatermark]:
+        """Get the watermark saved under a key."""
+        with self._lock:
+            return self._watermarks.get(key)
+
+    def set(self, key: str, watermark: TableWatermark) -> None:
+        """Save the watermark of a key, writing the file if the store has one."""
+        with self._lock:
+            self._watermarks[key] = watermark
+            self._save()
+
+    def reset(self, key: Optional[str] = None) -> None:
+        """Forget the watermark of a key, or every watermark if key is None."""
+        with self._lock:
+            if key is None:
+                self._watermarks.clear()
+            else:
+                self._watermarks.pop(key, None)
+            self._save()
+
+    def _save(self) -> None:
+        """Write the watermarks to the store file, if any. Called with the lock held."""
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({key: value._asdict() for key, value in self._watermarks.items()}, f, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,197 @@
+import sys
+import threading
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional
+
+# Strings up to this length are interned. Codes like REF, fpg, alm or emp
+# and the date strings repeat across the thousands of records of a month.
+INTERN_MAX_LENGTH = 32
+
+_MISSING = object()
+
+
+class RecordLayout:
+    """Field names of a record type and their positions, shared by all its records."""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def position(self, name: str) -> int:
+        """Get the position of a field, adding it to the layout if it is new.
+
+        Args:
+            name: Field name
+
+        Returns:
+            Index of the field in the records' value lists
+        """
+        position = self.positions.get(name)
+        if position is None:
+            with self._lock:
+                position = self.positions.get(name)
+                if position is None:
+                    position = len(self.names)
+                    self.names.append(sys.intern(name))
+                    self.positions[name] = position
+        return position
+
+
+class SalesRecord(MutableMapping):
+    """Compact sales record with the interface of a dictionary.
+
+    Values are kept in a list ordered by the layout of the record type
+    instead of a dictionary per record, and short strings are interned, so
+    a month of headers, partidas and recibos takes a fraction of the memory
+    of plain dictionaries. The rest of the process reads and updates them
+    like the dictionaries it used before.
+    """
+
+    __slots__ = ('_values',)
+
+    layout = RecordLayout()  # Each record type has its own
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        self._values: List[Any] = []
+        if data:
+            for name, value in data.items():
+                self[name] = value
+
+    def __getitem__(self, name: str) -> Any:
+        position = self.layout.positions.get(name)
+        if position is not None and position < len(self._values):
+            value = self._values[position]
+            if value is not _MISSING:
+                return value
+        raise KeyError(name)
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        if type(value) is str and len(value) <= INTERN_MAX_LENGTH:
+            value = sys.intern(value)
+        position = self.layout.position(name)
+        values = self._values
+        if position >= len(values):
+            values.extend([_MISSING] * (position + 1 - len(values)))
+        values[position] = value
+
+    def __delitem__(self, name: str) -> None:
+        self[name]  # Raises KeyError if the field is not set
+        self._values[self.layout.positions[name]] = _MISSING
+
+    def __iter__(self) -> Iterator[str]:
+        names = self.layout.names
+        for position, value in enumerate(self._values):
+            if value is not _MISSING:
+                yield names[position]
+
+    def __len__(self) -> int:
+        return sum(1 for value in self._values if value is not _MISSING)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def get(self, name: str, default: Any = None) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def copy(self) -> 'SalesRecord':
+        """Get a shallow copy of the record."""
+        clone = type(self)()
+        clone._values = list(self._values)
+        return clone
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the fields of the record as a plain dictionary."""
+        return dict(self.items())
+
+
+class Venta(SalesRecord):
+    """Sales header (VENTA.DBF), holding its 'detalles' and 'recibos' lists."""
+
+    __slots__ = ()
+
+    layout = RecordLayout()
+
+
+class Partida(SalesRecord):
+    """Sales detail (PARTVTA.DBF).
+
+    Once attached to its header, the header-level fields of SHARED_FIELDS
+    are read from the header instead of being copied onto every partida.
+    Fields set on the partida itself take precedence.
+    """
+
+    __slots__ = ('venta',)
+
+    layout = RecordLayout()
+
+    # Name on the partida -> name on the header
+    SHARED_FIELDS = {
+        'metodo_pago': 'fpg',
+        'hor': 'hor',
+        'emp': 'emp',
+        'emp_div': 'emp_div',
+        'ser_vta': 'ser',
+        'clt': 'clt',
+        'alm': 'alm',
+    }
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        self.venta: Optional[Venta] = None
+        super().__init__(data)
+
+    def attach(self, venta: Venta) -> None:
+        """Share the header-level fields of a header with this partida.
+
+        Args:
+            venta: Header the partida belongs to
+        """
+        self.venta = venta
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return super().__getitem__(name)
+        except KeyError:
+            if self.venta is not None and name in self.SHARED_FIELDS:
+                return self.venta.get(self.SHARED_FIELDS[name])
+            raise
+
+    def __iter__(self) -> Iterator[str]:
+        own = list(super().__iter__())
+        yield from own
+        if self.venta is not None:
+            yield from (name for name in self.SHARED_FIELDS if name not in own)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def copy(self) -> 'Partida':
+        """Get a shallow copy of the partida, attached to the same header."""
+        clone = super().copy()
+        clone.venta = self.venta
+        return clone
+
+
+class Recibo(SalesRecord):
+    """Sales receipt (FLUJORES.DBF / FLUJO01.DBF)."""
+
+    __slots__ = ()
+
+    layout = RecordLayout()
+
+
+def record_to_json(obj: Any) -> Dict[str, Any]:
+    """json.dumps default hook serializing sales records as dictionaries.
+
+    Args:
+        obj: Object json could not serialize
+
+    Returns:
+        The record's fields
+    """
+    if isinstance(obj, SalesRecord):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
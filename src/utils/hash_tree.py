@@ -0,0 +1,115 @@
+from datetime import date
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from src.dbf_enc_reader.converters import parse_legacy_date
+from src.utils.record_hasher import RecordHasher, HASH_VERSION_JSON
+
+
+class FolioNode(NamedTuple):
+    """Node of a folio: the record hash plus the hashes of its partidas and recibos.
+
+    The record hash already covers the partidas and recibos, so an equal
+    node hash means the whole sale is unchanged. The child hashes are kept in
+    lote_diario.arbol_hash to see which partidas and recibos of a changed
+    folio differ.
+    """
+    hash: str
+    partidas: List[str]
+    recibos: List[str]
+
+
+class DayTree:
+    """Hash tree of one day: day root -> folio nodes -> partida/recibo hashes."""
+
+    def __init__(self, day: date, folios: Optional[Dict[str, FolioNode]] = None, version: Optional[int] = None):
+        """
+        Initialize the tree.
+
+        Args:
+            day: Day the folios were issued
+            folios: Nodes by folio
+            version: Hash version of the node hashes, the HASH_VERSION setting if None
+        """
+        self.day = day
+        self.folios: Dict[str, FolioNode] = folios or {}
+        self.version = RecordHasher(version).version
+
+    @property
+    def root(self) -> str:
+        """Hex digest of the day, built from the folio node hashes in folio order."""
+        digest = RecordHasher(self.version).new_digest(b'DAY')
+        for folio in sorted(self.folios):
+            digest.update(folio.encode('utf-8') + b'\x00' + self.folios[folio].hash.encode('ascii') + b'\x00')
+        return digest.hexdigest()
+
+    def add_record(self, record: Dict[str, Any], hasher: RecordHasher) -> None:
+        """Add the node of a mapped sales record.
+
+        Args:
+            record: Header with its md5_hash, 'detalles' (with detail_hash) and 'recibos'
+            hasher: Hasher for the receipts
+        """
+        partidas = [detail.get('detail_hash') or hasher.hash_detail(detail) for detail in record.get('detalles') or []]
+        recibos = [hasher.hash_record(receipt) for receipt in record.get('recibos') or []]
+        self.folios[str(record.get('Folio'))] = FolioNode(record.get('md5_hash'), partidas, recibos)
+
+    def changed_folios(self, other: Optional['DayTree']) -> Set[str]:
+        """Get the folios whose node differs from another tree of the same day.
+
+        Args:
+            other: Previously stored tree, None if there is none
+
+        Returns:
+            Folios that changed or are only in one of the trees
+        """
+        if other is None or other.version != self.version:
+            return set(self.folios)
+        changed = {folio for folio, node in self.folios.items()
+                   if folio not in other.folios or other.folios[folio].hash != node.hash}
+        changed.update(folio for folio in other.folios if folio not in self.folios)
+        return changed
+
+    def to_json(self) -> Dict[str, Any]:
+        """Get the tree in the form it is stored in lote_diario.arbol_hash."""
+        return {
+            'version': self.version,
+            'root': self.root,
+            'folios': {folio: node._asdict() for folio, node in self.folios.items()},
+        }
+
+    @classmethod
+    def from_json(cls, day: date, data: Dict[str, Any]) -> 'DayTree':
+        """Rebuild a stored tree.
+
+        Args:
+            day: Day of the tree
+            data: Stored tree, as returned by to_json
+
+        Returns:
+            The tree
+        """
+        folios = {folio: FolioNode(node['hash'], list(node.get('partidas', [])), list(node.get('recibos', [])))
+                  for folio, node in (data.get('folios') or {}).items()}
+        return cls(day, folios, data.get('version') or HASH_VERSION_JSON)
+
+
+def build_day_trees(records: Iterable[Dict[str, Any]], hasher: Optional[RecordHasher] = None) -> Dict[date, DayTree]:
+    """Build the tree of each day from mapped sales records.
+
+    Args:
+        records: Headers with their md5_hash, detalles and recibos
+        hasher: Hasher for the receipts, the configured one if None
+
+    Returns:
+        Trees by day. Records without a valid 'fecha' are left out.
+    """
+    hasher = hasher or RecordHasher()
+    trees: Dict[date, DayTree] = {}
+    for record in records:
+        day = parse_legacy_date(record.get('fecha'))
+        if day is None or not record.get('Folio') or not record.get('md5_hash'):
+            continue
+        if day not in trees:
+            trees[day] = DayTree(day, version=hasher.version)
+        trees[day].add_record(record, hasher)
+    return trees
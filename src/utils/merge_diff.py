@@ -0,0 +1,123 @@
+from itertools import pairwise
+from typing import Any, Callable, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+from src.utils.record_hasher import HASH_VERSION_JSON
+
+# Operations of the events, in the keys of api_operations
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+NEXT_CHECK = 'next_check'
+
+
+class DiffEvent(NamedTuple):
+    """Operation a folio needs, as produced by merge_diff."""
+    operation: str  # CREATE, UPDATE, DELETE or NEXT_CHECK
+    folio: str
+    dbf_record: Optional[Mapping[str, Any]]  # None for DELETE
+    sql_record: Optional[Mapping[str, Any]]  # None for CREATE
+    dbf_hash: Optional[str]  # DBF hash in the SQL row's hash version, the record's md5_hash for CREATE
+
+
+def sort_by_folio(records: Iterable[Mapping[str, Any]], folio_field: str,
+                  in_place: bool = False) -> List[Mapping[str, Any]]:
+    """Sort records in the folio order merge_diff expects.
+
+    Folios are compared as strings, the order of ORDER BY folio::text COLLATE "C".
+    The sort is stable, so the last of several records with the same folio
+    stays the last one. A list already in that order is returned as is,
+    without copying it.
+
+    Args:
+        records: Records to sort
+        folio_field: Name of the folio field ('Folio' in DBF records, 'folio' in SQL rows)
+        in_place: Sort the given list itself instead of a copy, for lists the caller owns
+
+    Returns:
+        The records ordered by folio
+    """
+    def key(record: Mapping[str, Any]) -> str:
+        return str(record.get(folio_field))
+
+    if isinstance(records, list):
+        if all(key(previous) <= key(record) for previous, record in pairwise(records)):
+            return records
+        if in_place:
+            records.sort(key=key)
+            return records
+    return sorted(records, key=key)
+
+
+def unique_by_folio(records: Iterable[Mapping[str, Any]], folio_field: str,
+                    hash_field: str) -> Iterator[Tuple[str, Mapping[str, Any]]]:
+    """Yield the records of a stream ordered by folio, one per folio.
+
+    Records without folio or hash are skipped and, as in the dictionaries
+    by folio of compare_records_by_hash, the last record of a folio wins.
+
+    Args:
+        records: Records ordered by folio
+        folio_field: Name of the folio field
+        hash_field: Name of the hash field
+
+    Yields:
+        (folio, record)
+
+    Raises:
+        ValueError: If the stream is not ordered by folio
+    """
+    pending = None
+    for record in records:
+        if not record.get(folio_field) or not record.get(hash_field):
+            continue
+        folio = str(record.get(folio_field))
+        if pending is not None:
+            if folio < pending[0]:
+                raise ValueError(f"Records are not ordered by {folio_field}: {folio} after {pending[0]}")
+            if folio != pending[0]:
+                yield pending
+        pending = (folio, record)
+    if pending is not None:
+        yield pending
+
+
+def merge_diff(dbf_records: Iterable[Mapping[str, Any]], sql_records: Iterable[Mapping[str, Any]],
+               hash_for_version: Callable[[Mapping[str, Any], int], Optional[str]]) -> Iterator[DiffEvent]:
+    """Merge-join DBF records and SQL rows, both ordered by folio, into diff events.
+
+    Only the current record of each stream is held, so the memory used does
+    not grow with the number of folios, and events are produced as the
+    streams are read.
+
+    Args:
+        dbf_records: DBF records with Folio and md5_hash, ordered by folio
+        sql_records: estado_factura_venta rows with folio, hash and hash_version, ordered by folio
+        hash_for_version: Returns the hash of a DBF record in a given hash version
+
+    Yields:
+        CREATE for folios only in DBF, DELETE for folios only in SQL, and
+        UPDATE or NEXT_CHECK for folios in both depending on their hashes
+    """
+    dbf = unique_by_folio(dbf_records, 'Folio', 'md5_hash')
+    sql = unique_by_folio(sql_records, 'folio', 'hash')
+    dbf_item = next(dbf, None)
+    sql_item = next(sql, None)
+
+    while dbf_item is not None or sql_item is not None:
+        if sql_item is None or (dbf_item is not None and dbf_item[0] < sql_item[0]):
+            folio, dbf_record = dbf_item
+            yield DiffEvent(CREATE, folio, dbf_record, None, dbf_record.get('md5_hash'))
+            dbf_item = next(dbf, None)
+        elif dbf_item is None or sql_item[0] < dbf_item[0]:
+            folio, sql_record = sql_item
+            yield DiffEvent(DELETE, folio, None, sql_record, None)
+            sql_item = next(sql, None)
+        else:
+            folio, dbf_record = dbf_item
+            sql_record = sql_item[1]
+            # Rows written with another hash version are compared with the record hashed the same way
+            dbf_hash = hash_for_version(dbf_record, sql_record.get('hash_version') or HASH_VERSION_JSON)
+            operation = UPDATE if dbf_hash != sql_record.get('hash') else NEXT_CHECK
+            yield DiffEvent(operation, folio, dbf_record, sql_record, dbf_hash)
+            dbf_item = next(dbf, None)
+            sql_item = next(sql, None)
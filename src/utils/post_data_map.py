@@ -3,7 +3,9 @@
 
 from typing import Dict, Any, Optional
 import logging
+import os
 from src.db.velneo_mappings import VelneoMappings
+from src.db.velneo_mapping_cache import VelneoMappingCache
 from src.config.db_config import PostgresConnection
 
 class DataMap:
@@ -21,7 +23,11 @@ class DataMap:
                        config from PostgresConnection will be used.
         """
         self.db_config = db_config or PostgresConnection.get_db_config()
-        self.velneo_mappings = VelneoMappings(self.db_config)
+        # The preloaded mappings are shared by every DataMap of the process
+        if os.getenv('VELNEO_MAP_CACHE', 'True').lower() == 'true':
+            self.velneo_mappings = VelneoMappingCache.shared(self.db_config)
+        else:
+            self.velneo_mappings = VelneoMappings(self.db_config)
     
     def apply_map_serie(self) -> Optional[int]:
         """Get the Velneo ID for serie from the database
@@ -181,6 +187,15 @@ class DataMap:
             logging.error(f"Error mapping articulo with ref {ref}: {e}")
             return None
 
+    def prefetch_articulos(self, refs) -> None:
+        """Resolve the articulos of many details at once, before they are mapped
+        
+        Args:
+            refs: The REF codes of the details
+        """
+        if isinstance(self.velneo_mappings, VelneoMappingCache):
+            self.velneo_mappings.prefetch_articulos(refs)
+
     def apply_map_tipo_iva(self, ref: str) -> Optional[int]:
         """Get the Velneo ID for iva from the database
         
@@ -304,21 +319,34 @@ class DataMap:
 
         result['emp'] = self.apply_map_emp()
 
-        result['art'] = self.apply_map_articulo(record['REF'])
-     
-            
         result['ser_vta'] = self.apply_map_serie()
-     
-        #result['mov_tip'] = self.apply_map_tipo_mov(record['tipo_mov'])
-        result['mov_tip'] = 'V'
-
-        result['reg_iva_vta'] = self.apply_map_tipo_iva(record['iva_vta'])
 
         result['clt'] = self.apply_map_cliente()
 
+        result.update(self.process_detail_fields(record))
+
         # print(f' MAP DETAIL AFTER {result}')
    
         return result
+
+    def process_detail_fields(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Get the mapped fields that differ from one detail to another
+        
+        The header-level ones (alm, emp_div, emp, ser_vta, clt) are read from
+        the header the detail is attached to, see Partida.SHARED_FIELDS.
+        
+        Args:
+            record: Dictionary containing the DBF detail data
+            
+        Returns:
+            Dict[str, Any]: Only the mapped fields of the detail
+        """
+        return {
+            'art': self.apply_map_articulo(record['REF']),
+            #'mov_tip': self.apply_map_tipo_mov(record['tipo_mov']),
+            'mov_tip': 'V',
+            'reg_iva_vta': self.apply_map_tipo_iva(record['iva_vta']),
+        }
     
 
     def process_record_rec(self, record: Dict[str, Any]) -> Dict[str, Any]:
@@ -334,13 +362,24 @@ class DataMap:
         # print(f' MAP DETAIL BEFORE {record}')
         
         # Apply mappings based on available fields in the record
-        
-        result['caja_bco'] = self.apply_map_caja_banco(record['caja_bco'])
-
-        result['plaza'] = self.apply_map_plaza()
+        result.update(self.process_receipt_fields(record))
 
         # result['fpg'] = self.apply_map_caja_banco(record['']) #TODO update this value
    
         return result
 
+    def process_receipt_fields(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Get the mapped fields of a receipt
+        
+        Args:
+            record: Dictionary containing the DBF receipt data
+            
+        Returns:
+            Dict[str, Any]: Only the mapped fields of the receipt
+        """
+        return {
+            'caja_bco': self.apply_map_caja_banco(record['caja_bco']),
+            'plaza': self.apply_map_plaza(),
+        }
+
 
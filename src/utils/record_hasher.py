@@ -0,0 +1,304 @@
+import hashlib
+import json
+import math
+import os
+import struct
+from collections.abc import Mapping
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from src.models.sales_records import record_to_json
+
+# Version 1 hashes the json.dumps(sort_keys=True) text of a record with MD5,
+# the encoding every hash stored before hash_version existed was made with.
+HASH_VERSION_JSON = 1
+# The other versions hash the canonical binary encoding of encode_canonical
+HASH_VERSION_CANONICAL = 2  # MD5
+HASH_VERSION_BLAKE2B = 3  # BLAKE2b, 128 bit digest
+HASH_VERSION_XXH3 = 4  # xxHash XXH3 128 bit, needs the optional xxhash package
+
+# Encoded values are buffered and fed to the hash in chunks of this size
+_FLUSH_SIZE = 64 * 1024
+
+_NAN = struct.pack('>d', float('nan'))
+
+
+def _xxh3_128():
+    """Start an XXH3 128 bit digest, xxhash is only imported when this version is used."""
+    try:
+        import xxhash
+    except ImportError as e:
+        raise ImportError("HASH_VERSION 4 needs the xxhash package (pip install xxhash)") from e
+    return xxhash.xxh3_128()
+
+
+class HashStrategy(NamedTuple):
+    """Encoding and digest algorithm of a hash version.
+
+    Every algorithm gives a 128 bit digest, 32 hex characters, so hashes of
+    any version fit the existing hash columns.
+    """
+    version: int
+    encoding: str  # 'json' or 'canonical'
+    algorithm: str
+    new: Callable[[], Any]  # Returns a new hashlib-like digest
+
+
+HASH_STRATEGIES: Dict[int, HashStrategy] = {
+    HASH_VERSION_JSON: HashStrategy(HASH_VERSION_JSON, 'json', 'md5', hashlib.md5),
+    HASH_VERSION_CANONICAL: HashStrategy(HASH_VERSION_CANONICAL, 'canonical', 'md5', hashlib.md5),
+    HASH_VERSION_BLAKE2B: HashStrategy(HASH_VERSION_BLAKE2B, 'canonical', 'blake2b', lambda: hashlib.blake2b(digest_size=16)),
+    HASH_VERSION_XXH3: HashStrategy(HASH_VERSION_XXH3, 'canonical', 'xxh3_128', _xxh3_128),
+}
+HASH_VERSIONS = tuple(HASH_STRATEGIES)
+
+
+def get_strategy(version: int) -> HashStrategy:
+    """Get the strategy of a hash version.
+
+    Args:
+        version: Hash version
+
+    Returns:
+        The strategy
+
+    Raises:
+        ValueError: If the version is unknown
+    """
+    strategy = HASH_STRATEGIES.get(version)
+    if strategy is None:
+        raise ValueError(f"Unsupported hash version {version}, expected one of {HASH_VERSIONS}")
+    return strategy
+
+
+def get_hash_version() -> int:
+    """Get the record hash version configured with HASH_VERSION, 1 by default."""
+    version = int(os.getenv('HASH_VERSION', str(HASH_VERSION_JSON)))
+    get_strategy(version)
+    return version
+
+
+def get_compat_versions(version: Optional[int] = None) -> List[int]:
+    """Get the older hash versions stored rows may still have, from HASH_COMPAT_VERSIONS.
+
+    Records are also hashed with these versions so rows written with them
+    compare correctly until they are rehashed. By default that is version 1
+    whenever another version is configured.
+
+    Args:
+        version: Current hash version, the HASH_VERSION setting if None
+
+    Returns:
+        Versions other than the current one
+    """
+    version = version or get_hash_version()
+    default = '' if version == HASH_VERSION_JSON else str(HASH_VERSION_JSON)
+    setting = os.getenv('HASH_COMPAT_VERSIONS', default)
+    versions = [int(value) for value in setting.split(',') if value.strip()]
+    for compat in versions:
+        get_strategy(compat)
+    return [compat for compat in dict.fromkeys(versions) if compat != version]
+
+
+def encode_canonical(value: Any, out: bytearray, flush: Optional[Callable[[bytearray], None]] = None) -> None:
+    """Append the canonical binary encoding of a value (version 2) to a buffer.
+
+    Every value is a one byte tag followed by its payload. Strings, numbers
+    and dates are length prefixed, mappings are encoded with their keys
+    sorted and floats with their IEEE 754 bits, so the result depends
+    neither on dictionary order nor on float repr.
+
+    Args:
+        value: Value to encode (None, bool, int, float, Decimal, str, bytes,
+               date, datetime, time, mappings and sequences of them)
+        out: Buffer the encoding is appended to
+        flush: Called with the buffer whenever it grows past 64 KiB, it
+               must consume and empty it
+    """
+    if value is None:
+        out += b'N'
+    elif value is True:
+        out += b'T'
+    elif value is False:
+        out += b'F'
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        out += b's' + struct.pack('>I', len(data)) + data
+    elif isinstance(value, int):
+        data = str(value).encode('ascii')
+        out += b'i' + struct.pack('>I', len(data)) + data
+    elif isinstance(value, float):
+        if math.isnan(value):
+            out += b'f' + _NAN
+        else:
+            # -0.0 and 0.0 compare equal and hash the same
+            out += b'f' + struct.pack('>d', value + 0.0)
+    elif isinstance(value, Decimal):
+        data = str(value.normalize()).encode('ascii')
+        out += b'd' + struct.pack('>I', len(data)) + data
+    elif isinstance(value, (datetime, date, time)):
+        data = value.isoformat().encode('ascii')
+        out += b't' + struct.pack('>I', len(data)) + data
+    elif isinstance(value, (bytes, bytearray)):
+        out += b'b' + struct.pack('>I', len(value)) + value
+    elif isinstance(value, Mapping):
+        keys = sorted(value, key=str)
+        out += b'm' + struct.pack('>I', len(keys))
+        for key in keys:
+            encode_canonical(str(key), out)
+            encode_canonical(value[key], out, flush)
+    elif isinstance(value, (list, tuple)):
+        out += b'l' + struct.pack('>I', len(value))
+        for item in value:
+            encode_canonical(item, out, flush)
+    else:
+        raise TypeError(f"Cannot hash value of type {type(value).__name__}")
+    if flush is not None and len(out) >= _FLUSH_SIZE:
+        flush(out)
+
+
+class RecordHasher:
+    """Hashes records one by one and builds the dataset hash in the same pass.
+
+    The dataset hash is the digest of the version and the record digests in
+    order, so the records are never serialized a second time to get it. The
+    encoding and digest algorithm come from the strategy of the version.
+    """
+
+    def __init__(self, version: Optional[int] = None):
+        """
+        Initialize the hasher.
+
+        Args:
+            version: Hash version (see HASH_STRATEGIES), the HASH_VERSION setting if None
+        """
+        self.version = version or get_hash_version()
+        self.strategy = get_strategy(self.version)
+        self._dataset = self.new_digest(b'RH-DATASET')
+        self.record_count = 0
+
+    def hash_record(self, record: Any) -> str:
+        """Get the hex digest of a single record.
+
+        Args:
+            record: Record to hash
+
+        Returns:
+            Hex digest of the record's encoding
+        """
+        return self.hash_record_versions(record, [self.version])[self.version]
+
+    def hash_record_versions(self, record: Any, versions: Iterable[int]) -> Dict[int, str]:
+        """Hash a record with several versions, encoding it once per encoding.
+
+        Args:
+            record: Record to hash
+            versions: Hash versions to compute
+
+        Returns:
+            Hex digest of the record by version
+        """
+        strategies = [get_strategy(version) for version in versions]
+        digests = {strategy.version: strategy.new() for strategy in strategies}
+
+        json_digests = [digests[s.version] for s in strategies if s.encoding == 'json']
+        if json_digests:
+            data = json.dumps(record, sort_keys=True, default=record_to_json).encode('utf-8')
+            for digest in json_digests:
+                digest.update(data)
+
+        canonical_digests = [digests[s.version] for s in strategies if s.encoding == 'canonical']
+        if canonical_digests:
+            def flush(out: bytearray) -> None:
+                for digest in canonical_digests:
+                    digest.update(out)
+                out.clear()
+            buffer = bytearray(b'RH2')
+            encode_canonical(record, buffer, flush)
+            flush(buffer)
+
+        return {version: digest.hexdigest() for version, digest in digests.items()}
+
+    def hash_detail(self, detail: Dict[str, Any]) -> str:
+        """Get the hex digest of a partida, before the mapped fields are added.
+
+        Version 1 keeps the MD5 of str(sorted(items)) stored in hash_detalle so far.
+
+        Args:
+            detail: Partida to hash
+
+        Returns:
+            Hex digest of the partida
+        """
+        return self.hash_detail_versions(detail, [self.version])[self.version]
+
+    def hash_detail_versions(self, detail: Dict[str, Any], versions: Iterable[int]) -> Dict[int, str]:
+        """Hash a partida with several versions, like hash_record_versions.
+
+        Args:
+            detail: Partida to hash
+            versions: Hash versions to compute
+
+        Returns:
+            Hex digest of the partida by version
+        """
+        versions = list(versions)
+        hashes = {}
+        if HASH_VERSION_JSON in versions:
+            hashes[HASH_VERSION_JSON] = hashlib.md5(str(sorted(detail.items())).encode()).hexdigest()
+        others = [version for version in versions if version != HASH_VERSION_JSON]
+        if others:
+            hashes.update(self.hash_record_versions(detail, others))
+        return hashes
+
+    def new_digest(self, prefix: bytes = b''):
+        """Start a digest of this version's algorithm, seeded with a prefix and the version.
+
+        Args:
+            prefix: Bytes telling apart what the digest is for
+
+        Returns:
+            hashlib-like digest
+        """
+        digest = self.strategy.new()
+        digest.update(prefix + bytes([self.version]))
+        return digest
+
+    def add(self, record: Any) -> str:
+        """Hash a record and add its digest to the dataset hash.
+
+        Args:
+            record: Record to hash
+
+        Returns:
+            Hex digest of the record
+        """
+        record_hash = self.hash_record(record)
+        self.add_digest(record_hash)
+        return record_hash
+
+    def add_digest(self, record_hash: str) -> None:
+        """Add an already computed record digest to the dataset hash."""
+        self._dataset.update(bytes.fromhex(record_hash))
+        self.record_count += 1
+
+    def dataset_hash(self) -> str:
+        """Get the hex digest of the records added so far."""
+        return self._dataset.hexdigest()
+
+    @classmethod
+    def combine(cls, record_hashes: Iterable[str], version: Optional[int] = None) -> str:
+        """Get the dataset hash of a sequence of record digests.
+
+        Args:
+            record_hashes: Hex digests of the records, in order
+            version: Version the digests were made with, the HASH_VERSION setting if None
+
+        Returns:
+            Hex digest of the dataset
+        """
+        hasher = cls(version)
+        for record_hash in record_hashes:
+            hasher.add_digest(record_hash)
+        return hasher.dataset_hash()
@@ -0,0 +1,173 @@
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from datetime import date, datetime
+from decimal import Decimal
+
+# Set up project root
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.config.dbf_config import DBFConfig
+from src.controllers.ventas_controller import VentasController
+from src.dbf_enc_reader.day_cache import DayCache, iter_days, day_ranges
+from src.dbf_enc_reader.mapping_manager import MappingManager
+from src.dbf_enc_reader.watermarks import TableWatermark
+from test_mmap_backend import write_dbf
+
+ROWS = [
+    {'NO_REFEREN': '000123', 'F_EMISION': datetime(2025, 7, 6), 'TOTAL_BRUT': Decimal('150.50')},
+    {'NO_REFEREN': '000124', 'F_EMISION': datetime(2025, 7, 6), 'TOTAL_BRUT': None},
+]
+COLUMNS = ['NO_REFEREN', 'F_EMISION', 'TOTAL_BRUT']
+SOURCE = TableWatermark(4, 1000, 1, 'abc')
+
+def test_round_trip_keeps_values_and_order():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = DayCache(tmp_dir)
+        cache.store('VENTA.DBF', date(2025, 7, 6), ROWS, ['NO_REFEREN', 'F_EMISION', 'TOTAL_BRUT'])
+        cache.store('VENTA.DBF', date(2025, 7, 7), [], ['NO_REFEREN', 'F_EMISION', 'TOTAL_BRUT'])
+
+        assert cache.load('venta.dbf', date(2025, 7, 6), ['total_brut', 'NO_REFEREN', 'F_EMISION']) == ROWS
+        assert cache.load('VENTA.DBF', date(2025, 7, 7), ['NO_REFEREN', 'F_EMISION', 'TOTAL_BRUT']) == []
+        assert cache.load('VENTA.DBF', date(2025, 7, 8), ['NO_REFEREN', 'F_EMISION', 'TOTAL_BRUT']) is None
+
+def test_different_columns_are_a_miss():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = DayCache(tmp_dir)
+        cache.store('VENTA.DBF', date(2025, 7, 6), ROWS, ['NO_REFEREN', 'F_EMISION', 'TOTAL_BRUT'])
+
+        assert cache.load('VENTA.DBF', date(2025, 7, 6), ['NO_REFEREN', 'F_EMISION']) is None
+
+def test_entries_of_another_file_state_or_tampered_are_a_miss():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = DayCache(tmp_dir)
+        cache.store('VENTA.DBF', date(2025, 7, 6), ROWS, COLUMNS, SOURCE)
+        assert cache.load('VENTA.DBF', date(2025, 7, 6), COLUMNS, SOURCE) == ROWS
+
+        # Any write to the DBF, an edit in place included, changes its mtime
+        assert cache.load('VENTA.DBF', date(2025, 7, 6), COLUMNS, SOURCE._replace(recno=5, mtime_ns=2)) is None
+
+        path = cache._get_path('VENTA.DBF', date(2025, 7, 6))
+        path.write_bytes(path.read_bytes().replace(b'150.50', b'999.99'))
+        assert cache.load('VENTA.DBF', date(2025, 7, 6), COLUMNS, SOURCE) is None
+
+def test_only_days_before_the_open_window_are_closed():
+    cache = DayCache('unused', open_days=2)
+    today = date(2025, 7, 10)
+
+    assert cache.is_closed(date(2025, 7, 8), today)
+    assert not cache.is_closed(date(2025, 7, 9), today)
+    assert not cache.is_closed(today, today)
+
+def test_iter_days_includes_both_ends():
+    assert list(iter_days(date(2025, 2, 27), date(2025, 3, 2))) == [
+        date(2025, 2, 27), date(2025, 2, 28), date(2025, 3, 1), date(2025, 3, 2)]
+    assert list(iter_days(date(2025, 3, 1), date(2025, 3, 1))) == [date(2025, 3, 1)]
+    assert list(iter_days(date(2025, 3, 2), date(2025, 3, 1))) == []
+
+
+def test_day_ranges():
+    days = [day for day in iter_days(date(2025, 6, 29), date(2025, 7, 4)) if day != date(2025, 7, 1)]
+
+    assert day_ranges(days) == [(date(2025, 6, 29), date(2025, 6, 30)), (date(2025, 7, 2), date(2025, 7, 4))]
+    assert day_ranges([]) == []
+
+SALES_FIELDS = {
+    'VENTA.DBF': [('TIPO_DOC', 'C', 2, 0), ('NO_REFEREN', 'C', 6, 0), ('F_EMISION', 'D', 8, 0),
+                  ('TOTAL_BRUT', 'N', 10, 2), ('CAMPO1', 'C', 6, 0)],
+    'PARTVTA.DBF': [('NO_REFEREN', 'C', 6, 0), ('CLAVE_ART', 'C', 6, 0), ('CANTIDAD', 'N', 6, 0)],
+    'FLUJORES.DBF': [('FECHA', 'D', 8, 0), ('REF_NUM', 'C', 6, 0), ('IMPORTE', 'N', 10, 2)],
+    'FLUJO01.DBF': [('FECHA', 'D', 8, 0), ('REF_NUM', 'C', 6, 0), ('IMPORTE', 'N', 10, 2)],
+}
+
+def write_sales(tmp_dir, first_total='     10.00'):
+    rows = {
+        'VENTA.DBF': [(' ', ['FA', '000001', '20250701', first_total, '000001']),
+                      (' ', ['FA', '000002', '20250702', '     20.00', '000002'])],
+        'PARTVTA.DBF': [(' ', ['000001', 'A1', '     1']), (' ', ['000002', 'A2', '     2'])],
+        'FLUJORES.DBF': [(' ', ['20250701', '000001', '     10.00'])],
+        'FLUJO01.DBF': [(' ', ['20250702', '000002', '     20.00'])],
+    }
+    for table, fields in SALES_FIELDS.items():
+        write_dbf(Path(tmp_dir) / table, fields, rows[table])
+
+def make_sales_controller(tmp_dir):
+    field = lambda dbf, target, kind: {'dbf': dbf, 'velneo_table': target, 'type': kind}
+    receipts = {'fields': {'FECHA': field('FECHA', 'fecha', 'string'),
+                           'REF_NUM': field('REF_NUM', 'ref_recibo', 'number'),
+                           'IMPORTE': field('IMPORTE', 'importe', 'number')}}
+    mappings = {
+        'VENTA.DBF': {'fields': {'TIPO_DOC': field('TIPO_DOC', 'Cabecera', 'string'),
+                                 'NO_REFEREN': field('NO_REFEREN', 'Folio', 'number'),
+                                 'TOTAL_BRUT': field('TOTAL_BRUT', 'total_bruto', 'number'),
+                                 'CAMPO1': field('CAMPO1', 'ref_recibo', 'string')}},
+        'PARTVTA.DBF': {'fields': {'NO_REFEREN': field('NO_REFEREN', 'Folio', 'number'),
+                                   'CLAVE_ART': field('CLAVE_ART', 'REF', 'string')}},
+        'FLUJORES.DBF': receipts,
+        'FLUJO01.DBF': receipts,
+    }
+    mapping_file = Path(tmp_dir) / 'mappings.json'
+    mapping_file.write_text(json.dumps(mappings), encoding='utf-8')
+    config = DBFConfig(source_directory=tmp_dir, reader_backend='mmap', day_cache=True,
+                       cache_dir=str(Path(tmp_dir) / 'cache'), cache_open_days=1)
+    controller = VentasController(MappingManager(str(mapping_file)), config)
+
+    # Record the tables read from the DBFs
+    controller.tables_read = []
+    iter_table = controller.reader.iter_table
+    def recording_iter_table(table_name, *args, **kwargs):
+        controller.tables_read.append(table_name)
+        return iter_table(table_name, *args, **kwargs)
+    controller.reader.iter_table = recording_iter_table
+    return controller
+
+def summarize(headers):
+    return [(header['Folio'], header['total_bruto'], [detail['REF'] for detail in header['detalles']],
+             [receipt['importe'] for receipt in header['recibos']]) for header in headers]
+
+def test_sales_are_served_from_the_cache_until_the_dbf_changes():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_sales(tmp_dir)
+        controller = make_sales_controller(tmp_dir)
+        try:
+            first = summarize(controller.get_sales_in_range(date(2025, 7, 1), date(2025, 7, 2)))
+            assert first == [(1, 10, ['A1'], [10]), (2, 20, ['A2'], [20])]
+            assert set(controller.tables_read) == set(SALES_FIELDS)
+
+            controller.tables_read.clear()
+            assert summarize(controller.get_sales_in_range(date(2025, 7, 1), date(2025, 7, 2))) == first
+            assert controller.tables_read == []
+
+            # An old invoice edited in place is read again
+            venta = Path(tmp_dir) / 'VENTA.DBF'
+            mtime_ns = venta.stat().st_mtime_ns
+            write_sales(tmp_dir, first_total='     15.00')
+            os.utime(venta, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+            edited = summarize(controller.get_sales_in_range(date(2025, 7, 1), date(2025, 7, 2)))
+            assert edited[0] == (1, 15, ['A1'], [10])
+            assert 'VENTA.DBF' in controller.tables_read
+        finally:
+            controller.close()
+
+def test_day_cache_is_off_by_default():
+    original = os.environ.pop('DBF_DAY_CACHE', None)
+    try:
+        assert not DBFConfig(source_directory='unused', reader_backend='mmap').day_cache
+    finally:
+        if original is not None:
+            os.environ['DBF_DAY_CACHE'] = original
+
+if __name__ == "__main__":
+    test_round_trip_keeps_values_and_order()
+    test_different_columns_are_a_miss()
+    test_entries_of_another_file_state_or_tampered_are_a_miss()
+    test_only_days_before_the_open_window_are_closed()
+    test_iter_days_includes_both_ends()
+    test_day_ranges()
+    test_sales_are_served_from_the_cache_until_the_dbf_changes()
+    test_day_cache_is_off_by_default()
+    print("Day cache tests passed!")
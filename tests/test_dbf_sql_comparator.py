@@ -0,0 +1,230 @@
+import os
+import sys
+from datetime import date
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.controllers.dbf_sql_comparator import DBFSQLComparator
+from src.db.postgres_tracking import PostgresTracking
+from src.utils.record_hasher import RecordHasher, HASH_VERSION_JSON
+
+DB_CONFIG = {'host': 'localhost', 'database': 'test', 'user': 'test', 'password': 'test', 'port': '5432'}
+
+
+class FakeTracker:
+    """Keeps the estado_factura_venta rows and the saved day trees in memory"""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.trees = {}
+        self.range_queries = []
+        self.streamed_queries = []
+        self.streamed_rows = 0
+        self.diff_rows = []
+        self.diff_calls = []
+        self.rehashed = []
+
+    def has_hash_tree_column(self):
+        return True
+
+    def get_day_trees(self, start_date, end_date):
+        return {day: tree for day, tree in self.trees.items() if start_date <= day <= end_date}
+
+    def get_records_by_date_range(self, start_date, end_date):
+        self.range_queries.append((start_date, end_date))
+        return [row for row in self.rows if start_date <= row['fecha_emision'] <= end_date]
+
+    def iter_records_by_date_range(self, start_date, end_date, itersize=2000, days=None):
+        self.streamed_queries.append((start_date, end_date, days))
+        rows = [row for row in self.rows if start_date <= row['fecha_emision'] <= end_date
+                and (days is None or row['fecha_emision'] in days)]
+        for row in sorted(rows, key=lambda row: (str(row['folio']), row['fecha_emision'], row['id'])):
+            self.streamed_rows += 1
+            yield row
+
+    def insert_day_tree(self, lote_id, fecha_referencia, hash_lote, arbol_hash, hash_version=1):
+        self.trees[fecha_referencia] = arbol_hash
+        return True
+
+    def diff_by_folio(self, hashes, start_date, end_date, days=None):
+        self.diff_calls.append({'hashes': list(hashes), 'days': days})
+        return self.diff_rows
+
+    def rehash_records(self, records):
+        self.rehashed.extend(records)
+        return len(records)
+
+
+def make_record(folio, day):
+    record = {'Folio': folio, 'fecha': f'{day:02d}/07/2025 12:00:00 a. m.', 'detalles': [], 'recibos': []}
+    record['md5_hash'] = RecordHasher(HASH_VERSION_JSON).hash_record(record)
+    record['hash_version'] = HASH_VERSION_JSON
+    return record
+
+
+def make_row(row_id, record, day):
+    return {'id': row_id, 'folio': str(record['Folio']), 'hash': record['md5_hash'],
+            'hash_version': HASH_VERSION_JSON, 'fecha_emision': date(2025, 7, day)}
+
+
+def make_comparator(tracker, engine='hash'):
+    comparator = DBFSQLComparator(DB_CONFIG, engine=engine)
+    comparator.tracker = tracker
+    return comparator
+
+
+def discard(result, folios):
+    """Remove folios from the operations, as MatchesProcess.dischard_by_retries does"""
+    for name, operations in result['api_operations'].items():
+        operations[:] = [op for op in operations if op['folio'] not in folios]
+
+
+def test_days_in_sync_are_saved_and_skipped_next_run():
+    synced, pending = make_record(1, 1), make_record(2, 2)
+    tracker = FakeTracker([make_row(1, synced, 1)])
+    comparator = make_comparator(tracker)
+    data = {'data': [synced, pending]}
+
+    result = comparator.compare_batch_by_day(data, date(2025, 7, 1), date(2025, 7, 2))
+    assert [op['folio'] for op in result['api_operations']['create']] == ['2']
+    assert comparator.save_synced_days(result, comparator.pending_work(result)) == [date(2025, 7, 1)]
+
+    # The saved day is skipped without querying its SQL rows
+    tracker.range_queries.clear()
+    result = comparator.compare_batch_by_day(data, date(2025, 7, 1), date(2025, 7, 2))
+    assert result['unchanged_days'] == [date(2025, 7, 1)]
+    assert tracker.range_queries == [(date(2025, 7, 2), date(2025, 7, 2))]
+
+
+def test_days_with_discarded_folios_are_not_saved():
+    created, updated = make_record(1, 1), make_record(2, 2)
+    stale = dict(make_row(2, updated, 2), hash='old')
+    deleted = {'id': 3, 'folio': '3', 'hash': 'x', 'hash_version': HASH_VERSION_JSON, 'fecha_emision': date(2025, 7, 3)}
+    tracker = FakeTracker([stale, deleted])
+    comparator = make_comparator(tracker)
+
+    result = comparator.compare_batch_by_day({'data': [created, updated]}, date(2025, 7, 1), date(2025, 7, 3))
+    pending = comparator.pending_work(result)
+    # Every folio reached its retry limit and is not sent
+    discard(result, {'1', '2', '3'})
+
+    assert comparator.save_synced_days(result, pending) == []
+    assert tracker.trees == {}
+
+
+def test_days_with_discarded_folios_are_not_saved_with_the_sql_engine():
+    created, updated = make_record(1, 1), make_record(2, 2)
+    tracker = FakeTracker()
+    # Postgres returns the folios of the retries ignore list like the others
+    tracker.diff_rows = [diff_row('1', 'create'), diff_row('2', 'update', 2, day=2), diff_row('3', 'delete', 3, day=3)]
+    comparator = make_comparator(tracker, engine='sql')
+
+    result = comparator.compare_batch_by_day({'data': [created, updated]}, date(2025, 7, 1), date(2025, 7, 3))
+    pending = comparator.pending_work(result)
+    assert pending == ({'1', '2', '3'}, {date(2025, 7, 3)})
+    discard(result, {'1', '2', '3'})
+
+    assert comparator.save_synced_days(result, pending) == []
+    assert tracker.trees == {}
+
+
+def diff_row(folio, operation, row_id=None, hash_version=HASH_VERSION_JSON, day=1):
+    return {'folio': folio, 'operation': operation, 'id': row_id,
+            'hash_version': hash_version if row_id else None, 'fecha_emision': date(2025, 7, day) if row_id else None}
+
+
+def test_copy_text_escapes_the_copy_format():
+    assert PostgresTracking._copy_text(None) == '\\N'
+    assert PostgresTracking._copy_text(12) == '12'
+    assert PostgresTracking._copy_text('a\tb\\c\nd\re') == 'a\\tb\\\\c\\nd\\re'
+
+
+def test_diff_rows_are_mapped_to_api_operations():
+    created, updated, matching, old_version = (make_record(folio, 1) for folio in (1, 2, 3, 4))
+    old_version.update(hash_version=3, compat_hashes={HASH_VERSION_JSON: 'compat'})
+    tracker = FakeTracker()
+    tracker.diff_rows = [
+        diff_row('1', 'create'),
+        diff_row('2', 'update', 12),
+        diff_row('3', 'next_check', 13),
+        diff_row('4', 'next_check', 14, hash_version=HASH_VERSION_JSON),
+        diff_row('5', 'delete', 15),
+    ]
+    comparator = make_comparator(tracker, engine='sql')
+
+    result = comparator.compare_records_in_db({'data': [created, updated, matching, old_version]},
+                                              date(2025, 7, 1), date(2025, 7, 1))
+    operations = result['api_operations']
+    assert [op['folio'] for op in operations['create']] == ['1']
+    assert operations['create'][0]['dbf_record'] is created
+    assert [(op['folio'], op['id']) for op in operations['update']] == [('2', 12)]
+    assert [(op['folio'], op['id']) for op in operations['next_check']] == [('3', 13), ('4', 14)]
+    assert operations['delete'][0]['sql_record']['fecha_emision'] == date(2025, 7, 1)
+    assert result['summary']['total_actions_needed'] == 3
+
+    # The compat hashes are copied too, and a row of an older version is moved to the current one
+    assert ('4', HASH_VERSION_JSON, 'compat') in tracker.diff_calls[0]['hashes']
+    assert tracker.rehashed == [(14, old_version['md5_hash'], 3)]
+
+
+def test_sql_engine_diffs_only_the_changed_days_in_postgres():
+    records = [make_record(1, 1), make_record(2, 2), make_record(3, 2)]
+    tracker = FakeTracker()
+    comparator = make_comparator(tracker, engine='sql')
+    tracker.diff_rows = [diff_row(str(folio), 'next_check', folio, day=day) for folio, day in ((1, 1), (2, 2), (3, 2))]
+    result = comparator.compare_batch_by_day({'data': records}, date(2025, 7, 1), date(2025, 7, 2))
+    assert len(comparator.save_synced_days(result, comparator.pending_work(result))) == 2
+
+    records[2] = dict(records[2], md5_hash='new')
+    tracker.diff_calls.clear()
+    # Only folio 3 is copied, so the row of the unchanged folio 2 comes back as a delete
+    tracker.diff_rows = [diff_row('2', 'delete', 2, day=2), diff_row('3', 'update', 3, day=2)]
+    result = comparator.compare_batch_by_day({'data': records}, date(2025, 7, 1), date(2025, 7, 2))
+
+    assert tracker.range_queries == []
+    assert tracker.diff_calls[0]['days'] == [date(2025, 7, 2)]
+    assert [folio for folio, _, _ in tracker.diff_calls[0]['hashes']] == ['3']
+    assert [op['folio'] for op in result['api_operations']['update']] == ['3']
+    assert result['api_operations']['delete'] == []
+
+
+def test_merge_engine_streams_only_the_changed_days():
+    records = [make_record(3, 2), make_record(1, 1), make_record(2, 2)]
+    tracker = FakeTracker([make_row(1, records[1], 1), make_row(2, records[2], 2), make_row(3, records[0], 2)])
+    comparator = make_comparator(tracker, engine='merge')
+    data = {'data': records}
+
+    result = comparator.compare_batch_by_day(data, date(2025, 7, 1), date(2025, 7, 2))
+    # The rows come from the server-side cursor, matching folios are only counted
+    assert tracker.range_queries == []
+    assert tracker.streamed_queries == [(date(2025, 7, 1), date(2025, 7, 2), [date(2025, 7, 1), date(2025, 7, 2)])]
+    assert result['api_operations']['next_check'] == []
+    assert result['summary']['matching_count'] == 3
+    # The caller's list keeps its order
+    assert [record['Folio'] for record in data['data']] == [3, 1, 2]
+    assert len(comparator.save_synced_days(result, comparator.pending_work(result))) == 2
+
+    records[0] = dict(records[0], md5_hash='new')
+    tracker.streamed_queries.clear()
+    tracker.streamed_rows = 0
+    result = comparator.compare_batch_by_day({'data': records}, date(2025, 7, 1), date(2025, 7, 2))
+
+    # Only day 2 is streamed, and the row of its unchanged folio 2 is not taken as a delete
+    assert tracker.streamed_queries == [(date(2025, 7, 1), date(2025, 7, 2), [date(2025, 7, 2)])]
+    assert tracker.streamed_rows == 2
+    assert [op['folio'] for op in result['api_operations']['update']] == ['3']
+    assert result['api_operations']['delete'] == []
+    assert result['summary']['matching_count'] == 0
+
+
+if __name__ == "__main__":
+    test_days_in_sync_are_saved_and_skipped_next_run()
+    test_days_with_discarded_folios_are_not_saved()
+    test_days_with_discarded_folios_are_not_saved_with_the_sql_engine()
+    test_copy_text_escapes_the_copy_format()
+    test_diff_rows_are_mapped_to_api_operations()
+    test_sql_engine_diffs_only_the_changed_days_in_postgres()
+    test_merge_engine_streams_only_the_changed_days()
+    print("DBF/SQL comparator tests passed!")
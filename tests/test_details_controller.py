@@ -0,0 +1,54 @@
+import os
+import sys
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.controllers.details_controller import DetailsController
+from src.utils.record_hasher import HASH_VERSION_JSON, HASH_VERSION_BLAKE2B
+
+
+def combined_detail(ref, detail_hash, compat_hash=None):
+    return {'folio': '10', 'ref': ref, 'fecha': '2025-07-01', 'detail_hash': detail_hash,
+            'hash_version': HASH_VERSION_BLAKE2B, 'compat_hashes': {HASH_VERSION_JSON: compat_hash} if compat_hash else {}}
+
+
+def make_controller():
+    # analyze_sync needs no database, skip reading its configuration
+    return DetailsController.__new__(DetailsController)
+
+
+def sql_detail(id, ref, hash_detalle, hash_version):
+    return {'id': id, 'folio': '10', 'ref': ref, 'hash_detalle': hash_detalle, 'hash_version': hash_version}
+
+
+def test_details_are_compared_with_the_hash_of_their_version():
+    controller = make_controller()
+    combined = [combined_detail('A1', 'new-a1', 'old-a1'), combined_detail('B2', 'new-b2', 'old-b2'),
+                combined_detail('C3', 'new-c3')]
+    sql_records = [sql_detail('10-1', 'A1', 'old-a1', HASH_VERSION_JSON),  # Same partida, stored with version 1
+                   sql_detail('10-2', 'B2', 'stale', HASH_VERSION_JSON),  # Changed partida
+                   sql_detail('10-3', 'C3', 'new-c3', HASH_VERSION_BLAKE2B)]  # Same partida, current version
+
+    result = controller.analyze_sync(combined, sql_records)
+
+    updates = result['operations']['update']
+    assert [item['sql_id'] for item in updates] == ['10-2']
+    assert updates[0]['detail_hash'] == 'new-b2'
+    assert updates[0]['hash_version'] == HASH_VERSION_BLAKE2B
+    assert result['rehash'] == [('10-1', 'new-a1', HASH_VERSION_BLAKE2B)]
+
+
+def test_rows_without_a_compat_hash_are_updated():
+    controller = make_controller()
+    result = controller.analyze_sync([combined_detail('A1', 'new-a1')],
+                                     [sql_detail('10-1', 'A1', 'old-a1', HASH_VERSION_JSON)])
+    assert [item['sql_id'] for item in result['operations']['update']] == ['10-1']
+    assert result['rehash'] == []
+
+
+if __name__ == "__main__":
+    test_details_are_compared_with_the_hash_of_their_version()
+    test_rows_without_a_compat_hash_are_updated()
+    print("Details controller tests passed!")
@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+# Set up project root
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.dbf_enc_reader.filters import coalesce_ranges, build_folio_filters
+
+def test_coalesce_contiguous_ranges():
+    assert coalesce_ranges([5, 1, 2, 3, 9, 10]) == [(1, 3), (5, 5), (9, 10)]
+    assert coalesce_ranges([1, 3, 4, 8], max_gap=1) == [(1, 4), (8, 8)]
+    assert coalesce_ranges([]) == []
+
+def test_folio_filters_are_padded_ranges():
+    chunks = build_folio_filters('NO_REFEREN', ['123', '124', '125', '200'], max_gap=0)
+
+    assert len(chunks) == 1
+    assert chunks[0] == [
+        {'field': 'NO_REFEREN', 'operator': 'range', 'from_value': '000123', 'to_value': '000125', 'is_numeric': False},
+        {'field': 'NO_REFEREN', 'operator': '=', 'value': '000200', 'is_numeric': False},
+    ]
+
+def test_folio_filters_are_chunked():
+    folios = range(1, 200, 10)
+    chunks = build_folio_filters('NO_REFEREN', folios, max_gap=0, max_ranges=7)
+
+    assert [len(chunk) for chunk in chunks] == [7, 7, 6]
+
+def test_ranges_do_not_mix_widths():
+    chunks = build_folio_filters('NO_REFEREN', [999999, 1000000], max_gap=5)
+
+    values = [term['value'] for term in chunks[0]]
+    assert values == ['999999', '1000000']
+
+if __name__ == "__main__":
+    test_coalesce_contiguous_ranges()
+    test_folio_filters_are_padded_ranges()
+    test_folio_filters_are_chunked()
+    test_ranges_do_not_mix_widths()
+    print("Folio filter tests passed!")
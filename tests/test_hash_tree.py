@@ -0,0 +1,63 @@
+import os
+import sys
+from datetime import date
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.utils.hash_tree import DayTree, build_day_trees
+from src.utils.record_hasher import RecordHasher, HASH_VERSION_JSON, HASH_VERSION_BLAKE2B
+
+
+def make_record(folio, day, details=('a', 'b'), receipts=(10,)):
+    record = {
+        'Folio': folio,
+        'fecha': f'{day:02d}/07/2025 12:00:00 a. m.',
+        'detalles': [{'REF': ref, 'detail_hash': f'hash-{folio}-{ref}'} for ref in details],
+        'recibos': [{'ref_recibo': ref} for ref in receipts],
+    }
+    record['md5_hash'] = RecordHasher(HASH_VERSION_JSON).hash_record(record)
+    return record
+
+
+def test_trees_are_built_per_day():
+    records = [make_record(1, 1), make_record(2, 1), make_record(3, 2), {'Folio': 4, 'fecha': None, 'md5_hash': 'x'}]
+    trees = build_day_trees(records, RecordHasher(HASH_VERSION_JSON))
+    assert sorted(trees) == [date(2025, 7, 1), date(2025, 7, 2)]
+    assert sorted(trees[date(2025, 7, 1)].folios) == ['1', '2']
+    assert trees[date(2025, 7, 1)].folios['1'].partidas == ['hash-1-a', 'hash-1-b']
+
+
+def test_unchanged_day_has_the_same_root_after_a_round_trip():
+    tree = build_day_trees([make_record(1, 1), make_record(2, 1)])[date(2025, 7, 1)]
+    stored = DayTree.from_json(tree.day, tree.to_json())
+    assert stored.root == tree.root == tree.to_json()['root']
+    assert tree.changed_folios(stored) == set()
+
+
+def test_only_changed_folios_are_reported():
+    day = date(2025, 7, 1)
+    stored = build_day_trees([make_record(1, 1), make_record(2, 1), make_record(3, 1)])[day]
+    current = build_day_trees([make_record(1, 1), make_record(2, 1, details=('a', 'c')), make_record(4, 1)])[day]
+    assert current.root != stored.root
+    assert current.changed_folios(stored) == {'2', '3', '4'}
+    assert current.changed_folios(None) == {'1', '2', '4'}
+
+
+def test_trees_of_another_hash_version_are_compared_in_full():
+    day = date(2025, 7, 1)
+    stored = build_day_trees([make_record(1, 1)], RecordHasher(HASH_VERSION_JSON))[day]
+    current = build_day_trees([make_record(1, 1)], RecordHasher(HASH_VERSION_BLAKE2B))[day]
+    stored = DayTree.from_json(day, stored.to_json())
+    assert stored.version == HASH_VERSION_JSON and current.version == HASH_VERSION_BLAKE2B
+    assert current.root != stored.root
+    assert current.changed_folios(stored) == {'1'}
+
+
+if __name__ == "__main__":
+    test_trees_are_built_per_day()
+    test_unchanged_day_has_the_same_root_after_a_round_trip()
+    test_only_changed_folios_are_reported()
+    test_trees_of_another_hash_version_are_compared_in_full()
+    print("Hash tree tests passed!")
@@ -0,0 +1,39 @@
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+# Set up project root
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Importing the workflow must not start the CLR or load heavy optional modules
+IMPORT_BUDGET_SECONDS = 1.5
+FORBIDDEN_MODULES = ['clr', 'System', 'Advantage', 'tkinter', 'turtle']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import src.controllers.main_workflow
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules)}))
+"""
+
+def measure_import():
+    # A fresh interpreter so nothing is already imported
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=str(project_root),
+                            capture_output=True, text=True)
+    assert result.returncode == 0, f"Importing main_workflow failed:\n{result.stderr}"
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_main_workflow_import_is_cheap():
+    probe = min((measure_import() for _ in range(3)), key=lambda run: run['elapsed'])
+
+    loaded = [name for name in FORBIDDEN_MODULES if name in probe['modules']]
+    assert not loaded, f"Importing main_workflow loaded {loaded}"
+    assert probe['elapsed'] < IMPORT_BUDGET_SECONDS, \
+        f"Importing main_workflow took {probe['elapsed']:.2f}s, budget is {IMPORT_BUDGET_SECONDS}s"
+
+if __name__ == "__main__":
+    test_main_workflow_import_is_cheap()
+    print("Import time test passed!")
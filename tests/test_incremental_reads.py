@@ -0,0 +1,61 @@
+import sys
+import tempfile
+from pathlib import Path
+
+# Set up project root
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.dbf_enc_reader.mmap_backend import MMapDBFBackend
+from src.dbf_enc_reader.watermarks import WatermarkStore
+from test_mmap_backend import write_dbf, FIELDS, ROWS
+
+NEW_ROW = (' ', ['000127', 'FA', '20250710', '     12.00'])
+
+def folios(result):
+    return [record['NO_REFEREN'] for record in result.records]
+
+def test_only_appended_rows_are_read():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / 'VENTA.DBF'
+        write_dbf(path, FIELDS, ROWS)
+        backend = MMapDBFBackend(tmp_dir)
+        store = WatermarkStore(str(Path(tmp_dir) / 'watermarks.json'))
+
+        first = backend.read_new_records('VENTA.DBF', store)
+        unchanged = backend.read_new_records('VENTA.DBF', store)
+        write_dbf(path, FIELDS, ROWS + [NEW_ROW])
+        appended = backend.read_new_records('VENTA.DBF', store)
+        backend.close()
+
+        # Watermarks survive a new store on the same file
+        assert WatermarkStore(str(Path(tmp_dir) / 'watermarks.json')).get('VENTA.DBF') == appended.watermark
+
+    assert first.full_scan and folios(first) == ['000123', '000124', '000126']
+    assert not unchanged.full_scan and unchanged.records == []
+    assert not appended.full_scan and folios(appended) == ['000127']
+    assert appended.watermark.recno == 5
+
+def test_shrink_or_header_change_rescans():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / 'VENTA.DBF'
+        write_dbf(path, FIELDS, ROWS)
+        backend = MMapDBFBackend(tmp_dir)
+        store = WatermarkStore()
+
+        backend.read_new_records('VENTA.DBF', store)
+        write_dbf(path, FIELDS, ROWS[:1])
+        packed = backend.read_new_records('VENTA.DBF', store)
+        write_dbf(path, FIELDS + [('CAMPO1', 'C', 6, 0)],
+                  [(flag, values + ['000010']) for flag, values in ROWS[:1] + [NEW_ROW]])
+        restructured = backend.read_new_records('VENTA.DBF', store)
+        backend.close()
+
+    assert packed.full_scan and folios(packed) == ['000123']
+    assert restructured.full_scan and folios(restructured) == ['000123', '000127']
+
+if __name__ == "__main__":
+    test_only_appended_rows_are_read()
+    test_shrink_or_header_change_rescans()
+    print("Incremental read tests passed!")
@@ -0,0 +1,67 @@
+import os
+import sys
+import json
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from decimal import Decimal
+
+# Set up project root
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.dbf_enc_reader.mapping_manager import MappingManager
+
+MAPPINGS = {
+    "VENTA.DBF": {
+        "fields": {
+            "NO_REFEREN": {"dbf": "NO_REFEREN", "velneo_table": "Folio", "type": "number"},
+            "F_EMISION": {"dbf": "F_EMISION", "velneo_table": "fecha", "type": "string"},
+            "TOTAL_BRUT": {"dbf": "TOTAL_BRUT", "velneo_table": "total_bruto", "type": "number"},
+            "CAMPO1": {"dbf": "CAMPO1", "velneo_table": "ref_recibo", "type": "string"}
+        }
+    }
+}
+
+def write_mappings(path, mappings):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(mappings, f)
+
+def test_transform_many_keeps_the_legacy_values():
+    records = [
+        {'NO_REFEREN': '000123', 'F_EMISION': datetime(2025, 7, 6), 'TOTAL_BRUT': Decimal('150.50'), 'TIPO_DOC': 'FA'},
+        {'NO_REFEREN': '000124', 'F_EMISION': datetime(2025, 7, 6, 13, 5), 'TOTAL_BRUT': Decimal('20')},
+        {'TIPO_DOC': 'FA'},
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / 'mappings.json'
+        write_mappings(path, MAPPINGS)
+        transformed = MappingManager(str(path)).transform_many('VENTA.DBF', records)
+
+    # Missing source fields are left out and records mapping nothing are dropped
+    assert transformed == [
+        {'Folio': 123, 'fecha': '06/07/2025 12:00:00 a. m.', 'total_bruto': 150.5},
+        {'Folio': 124, 'fecha': '06/07/2025 01:05:00 p. m.', 'total_bruto': 20},
+    ]
+
+def test_plans_are_shared_until_mappings_change():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / 'mappings.json'
+        write_mappings(path, MAPPINGS)
+        first = MappingManager(str(path))
+        plan = first.get_plan('VENTA.DBF')
+
+        assert MappingManager(str(path)).get_plan('VENTA.DBF') is plan
+
+        changed = json.loads(json.dumps(MAPPINGS))
+        changed['VENTA.DBF']['fields']['CAMPO1']['velneo_table'] = 'referencia'
+        write_mappings(path, changed)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        assert [step.target for step in first.get_plan('VENTA.DBF')][-1] == 'referencia'
+
+if __name__ == "__main__":
+    test_transform_many_keeps_the_legacy_values()
+    test_plans_are_shared_until_mappings_change()
+    print("Mapping plan tests passed!")
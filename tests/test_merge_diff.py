@@ -0,0 +1,94 @@
+import os
+import sys
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.utils.merge_diff import merge_diff, sort_by_folio
+
+
+def hash_for_version(record, version):
+    if version == record.get('hash_version', 1):
+        return record.get('md5_hash')
+    return (record.get('compat_hashes') or {}).get(version)
+
+
+def diff(dbf_records, sql_records):
+    events = merge_diff(sort_by_folio(dbf_records, 'Folio'), sort_by_folio(sql_records, 'folio'), hash_for_version)
+    return [(event.operation, event.folio) for event in events]
+
+
+def test_folios_are_merged_into_operations():
+    dbf = [
+        {'Folio': 3, 'md5_hash': 'c'},
+        {'Folio': 1, 'md5_hash': 'a'},
+        {'Folio': 2, 'md5_hash': 'b2'},
+        {'Folio': 5, 'md5_hash': None},  # Not hashed, left out
+    ]
+    sql = [
+        {'id': 4, 'folio': '4', 'hash': 'd'},
+        {'id': 1, 'folio': '1', 'hash': 'a'},
+        {'id': 2, 'folio': '2', 'hash': 'b'},
+    ]
+    assert diff(dbf, sql) == [
+        ('next_check', '1'),
+        ('update', '2'),
+        ('create', '3'),
+        ('delete', '4'),
+    ]
+    assert diff(dbf, []) == [('create', '1'), ('create', '2'), ('create', '3')]
+
+
+def test_rows_of_an_older_hash_version_use_the_compat_hash():
+    dbf = [{'Folio': 1, 'md5_hash': 'new', 'hash_version': 3, 'compat_hashes': {1: 'old'}}]
+    events = list(merge_diff(dbf, [{'id': 1, 'folio': '1', 'hash': 'old', 'hash_version': 1}], hash_for_version))
+    assert events[0].operation == 'next_check' and events[0].dbf_hash == 'old'
+
+
+def test_last_record_of_a_folio_wins_and_order_is_checked():
+    dbf = sort_by_folio([{'Folio': 1, 'md5_hash': 'x'}, {'Folio': 1, 'md5_hash': 'a'}], 'Folio')
+    events = list(merge_diff(dbf, [{'id': 1, 'folio': '1', 'hash': 'a'}], hash_for_version))
+    assert [event.operation for event in events] == ['next_check']
+
+    try:
+        list(merge_diff([{'Folio': 2, 'md5_hash': 'b'}, {'Folio': 1, 'md5_hash': 'a'}], [], hash_for_version))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Unordered records were not detected")
+
+
+def test_last_sql_row_of_a_duplicated_folio_wins():
+    # Rows as get_records_by_date_range returns them, ordered by fecha_emision and id
+    sql = [
+        {'id': 7, 'folio': '1', 'hash': 'old', 'fecha_emision': 1},
+        {'id': 3, 'folio': '2', 'hash': 'b', 'fecha_emision': 1},
+        {'id': 8, 'folio': '1', 'hash': 'a', 'fecha_emision': 2},
+        {'id': 9, 'folio': '1', 'hash': 'older', 'fecha_emision': 2},
+    ]
+    events = list(merge_diff(sort_by_folio([{'Folio': 1, 'md5_hash': 'older'}], 'Folio'),
+                             sort_by_folio(sql, 'folio'), hash_for_version))
+    # Same fecha_emision, the highest id is the row compared and deleted or updated
+    assert [(event.operation, event.folio) for event in events] == [('next_check', '1'), ('delete', '2')]
+    assert events[0].sql_record['id'] == 9
+
+
+def test_sorted_lists_are_not_copied():
+    ordered = [{'Folio': 1}, {'Folio': 10}, {'Folio': 2}]
+    assert sort_by_folio(ordered, 'Folio') is ordered
+
+    unordered = [{'Folio': 2}, {'Folio': 1}]
+    copy = sort_by_folio(unordered, 'Folio')
+    assert copy is not unordered and [record['Folio'] for record in unordered] == [2, 1]
+    assert sort_by_folio(unordered, 'Folio', in_place=True) is unordered
+    assert [record['Folio'] for record in unordered] == [1, 2]
+
+
+if __name__ == "__main__":
+    test_folios_are_merged_into_operations()
+    test_rows_of_an_older_hash_version_use_the_compat_hash()
+    test_last_record_of_a_folio_wins_and_order_is_checked()
+    test_last_sql_row_of_a_duplicated_folio_wins()
+    test_sorted_lists_are_not_copied()
+    print("Merge diff tests passed!")
@@ -0,0 +1,142 @@
+import sys
+import struct
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from decimal import Decimal
+
+# Set up project root
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.dbf_enc_reader.backend import ReaderBackend
+from src.dbf_enc_reader.mmap_backend import MMapDBFBackend
+from src.dbf_enc_reader.stats import ReadStats
+
+FIELDS = [
+    ('NO_REFEREN', 'C', 6, 0),
+    ('TIPO_DOC', 'C', 2, 0),
+    ('F_EMISION', 'D', 8, 0),
+    ('TOTAL_BRUT', 'N', 10, 2),
+]
+
+ROWS = [
+    (' ', ['000123', 'FA', '20250706', '    150.50']),
+    (' ', ['000124', 'NC', '20250707', '     20.00']),
+    ('*', ['000125', 'FA', '20250707', '     99.99']),
+    (' ', ['000126', 'FA', '20250709', '      5.00']),
+]
+
+def write_dbf(path, fields, rows):
+    """Write a minimal dBase III table"""
+    header_length = 32 + 32 * len(fields) + 1
+    record_length = 1 + sum(length for _, _, length, _ in fields)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<BBBBIHH', 0x03, 125, 7, 10, len(rows), header_length, record_length))
+        f.write(b'\0' * 17 + b'\x03' + b'\0' * 2)
+        for name, field_type, length, decimals in fields:
+            f.write(name.encode('ascii').ljust(11, b'\0'))
+            f.write(field_type.encode('ascii') + b'\0' * 4)
+            f.write(bytes([length, decimals]) + b'\0' * 14)
+        f.write(b'\x0D')
+        for flag, values in rows:
+            f.write(flag.encode('ascii'))
+            for (_, _, length, _), value in zip(fields, values):
+                f.write(value.encode('cp1252').ljust(length))
+        f.write(b'\x1A')
+
+def make_backend(tmp_dir):
+    write_dbf(Path(tmp_dir) / 'VENTA.DBF', FIELDS, ROWS)
+    return MMapDBFBackend(tmp_dir)
+
+def test_reads_native_values_and_skips_deleted():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        backend = make_backend(tmp_dir)
+        records = list(backend.iter_table('venta.dbf'))
+        backend.close()
+
+    assert [r['NO_REFEREN'] for r in records] == ['000123', '000124', '000126']
+    assert records[0]['F_EMISION'] == datetime(2025, 7, 6)
+    assert records[0]['TOTAL_BRUT'] == Decimal('150.50')
+    assert str(records[2]['TOTAL_BRUT']) == '5.00'
+
+def test_date_range_filter_and_projection():
+    filters = [{
+        'field': 'F_EMISION',
+        'operator': 'range',
+        'from_value': '07-07-2025',
+        'to_value': '07-09-2025',
+    }]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        backend = make_backend(tmp_dir)
+        records = list(backend.iter_table('VENTA.DBF', filters=filters, columns=['no_referen', 'TIPO_DOC']))
+        backend.close()
+
+    assert records == [
+        {'NO_REFEREN': '000124', 'TIPO_DOC': 'NC'},
+        {'NO_REFEREN': '000126', 'TIPO_DOC': 'FA'},
+    ]
+
+def test_same_field_filters_are_ored_and_limit_applies():
+    filters = [
+        {'field': 'NO_REFEREN', 'operator': '=', 'value': '000123'},
+        {'field': 'NO_REFEREN', 'operator': 'range', 'from_value': '000125', 'to_value': '000126'},
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        backend = make_backend(tmp_dir)
+        records = list(backend.iter_table('VENTA.DBF', filters=filters))
+        limited = list(backend.iter_table('VENTA.DBF', limit=1))
+        backend.close()
+
+    assert [r['NO_REFEREN'] for r in records] == ['000123', '000126']
+    assert len(limited) == 1
+
+def test_read_stats():
+    filters = [{'field': 'TIPO_DOC', 'operator': '=', 'value': 'FA'}]
+    stats = ReadStats()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        backend = make_backend(tmp_dir)
+        records = list(backend.iter_table('VENTA.DBF', filters=filters, columns=['NO_REFEREN', 'TOTAL_BRUT'], stats=stats))
+        backend.close()
+
+    assert len(records) == 2
+    assert (stats.table_name, stats.backend) == ('VENTA.DBF', 'mmap')
+    assert stats.rows_scanned == 3  # The deleted record is not scanned
+    assert stats.rows_returned == 2
+    assert stats.value_calls == 4
+    assert stats.bytes_decoded == 2 * (6 + 10)
+    assert stats.elapsed >= stats.filter_time + stats.convert_time
+
+def test_table_closes_after_a_stopped_read():
+    filters = [{'field': 'TIPO_DOC', 'operator': '=', 'value': 'FA'}]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        backend = make_backend(tmp_dir)
+        records = backend.iter_table('VENTA.DBF', filters=filters)
+        first = next(records)
+        records.close()
+        # No view over the mapping is left behind to keep it open
+        backend.close()
+
+    assert first['NO_REFEREN'] == '000123'
+    assert isinstance(first['NO_REFEREN'], str)
+
+def test_backend_missing_a_method_fails_when_created():
+    class PartialBackend(ReaderBackend):
+        def iter_table(self, table_name, limit=None, filters=None, columns=None, stats=None):
+            return iter([])
+
+    try:
+        PartialBackend()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("A backend without iter_records, get_table_info and fork was created")
+
+if __name__ == "__main__":
+    test_reads_native_values_and_skips_deleted()
+    test_date_range_filter_and_projection()
+    test_same_field_filters_are_ored_and_limit_applies()
+    test_read_stats()
+    test_table_closes_after_a_stopped_read()
+    test_backend_missing_a_method_fails_when_created()
+    print("MMap backend tests passed!")
@@ -0,0 +1,95 @@
+import sys
+import json
+import tempfile
+from pathlib import Path
+from decimal import Decimal
+
+# Set up project root
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.dbf_enc_reader.converters import normalize_reference
+from src.dbf_enc_reader.mapping_manager import MappingManager
+from src.controllers.ventas_controller import VentasController
+
+def test_numeric_references_compare_by_value():
+    assert normalize_reference('000010') == '10'
+    assert normalize_reference(' 10 ') == '10'
+    assert normalize_reference(10) == '10'
+    assert normalize_reference(Decimal('10')) == '10'
+    assert normalize_reference(10.0) == '10'
+
+def test_other_references_are_stripped():
+    assert normalize_reference(' A-10 ') == 'A-10'
+    assert normalize_reference(Decimal('10.5')) == '10.5'
+    assert normalize_reference(None) == ''
+    assert normalize_reference('  ') == ''
+
+def test_receipt_tables_map_the_same_fields():
+    with open(project_root / 'mappings.json', 'r', encoding='utf-8') as f:
+        mappings = json.load(f)
+
+    # Each receipts table is transformed with its own mappings into the same record shape
+    assert mappings['FLUJORES.DBF']['fields'] == mappings['FLUJO01.DBF']['fields']
+    assert mappings['FLUJO01.DBF']['fields']['REF_NUM']['dbf'] == 'REF_NUM'
+
+def make_controller(tmp_dir):
+    """Controller with only what _get_receipts_for_folios uses, no DBF reader"""
+    field = lambda dbf, target, kind: {'dbf': dbf, 'velneo_table': target, 'type': kind}
+    mappings = {
+        'FLUJORES.DBF': {'fields': {
+            'REF_NUM': field('REF_NUM', 'ref_recibo', 'number'),
+            'IMPORTE': field('IMPORTE', 'importe', 'number'),
+        }},
+        # The second table names the amount differently
+        'FLUJO01.DBF': {'fields': {
+            'REF_NUM': field('REF_NUM', 'ref_recibo', 'number'),
+            'IMP_01': field('IMP_01', 'importe', 'number'),
+        }},
+    }
+    mapping_file = Path(tmp_dir) / 'mappings.json'
+    mapping_file.write_text(json.dumps(mappings), encoding='utf-8')
+    controller = VentasController.__new__(VentasController)
+    controller.mapping_manager = MappingManager(str(mapping_file))
+    controller.receipt_dbfs = ['FLUJORES.DBF', 'FLUJO01.DBF']
+    return controller
+
+def test_receipts_are_joined_to_their_folios():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        controller = make_controller(tmp_dir)
+        raw_receipts = [
+            [{'REF_NUM': '000010', 'IMPORTE': 100}, {'REF_NUM': '99', 'IMPORTE': 5}, {'REF_NUM': ' ', 'IMPORTE': 1}],
+            [{'REF_NUM': 10, 'IMP_01': 50}, {'REF_NUM': '20', 'IMP_01': 7}],
+        ]
+        references = [
+            {'folio': '1', 'ref_recibo': '10'},
+            {'folio': '2', 'ref_recibo': '0010'},  # Shares the receipts of folio 1
+            {'folio': '3', 'ref_recibo': '20'},
+            {'folio': '4', 'ref_recibo': '30'},  # No receipt with this reference
+        ]
+        receipts = controller._get_receipts_for_folios(references, raw_receipts)
+
+    # Each table is transformed with its own mappings
+    assert [dict(receipt) for receipt in receipts['1']] == [
+        {'ref_recibo': 10, 'importe': 100},
+        {'ref_recibo': 10, 'importe': 50},
+    ]
+    assert [receipt['importe'] for receipt in receipts['3']] == [7]
+
+    # Shared receipts are copies, updating one folio's does not change the other's
+    assert receipts['2'] == receipts['1']
+    assert all(a is not b for a, b in zip(receipts['1'], receipts['2']))
+    receipts['2'][0]['caja_bco'] = 'X'
+    assert 'caja_bco' not in receipts['1'][0]
+
+    # References without receipts, and receipts without a header, are dropped
+    assert receipts['4'] == []
+    assert sorted(receipts) == ['1', '2', '3', '4']
+    assert all(receipt['ref_recibo'] != 99 for folio_receipts in receipts.values() for receipt in folio_receipts)
+
+if __name__ == "__main__":
+    test_numeric_references_compare_by_value()
+    test_other_references_are_stripped()
+    test_receipt_tables_map_the_same_fields()
+    test_receipts_are_joined_to_their_folios()
+    print("Receipt join tests passed!")
@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import hashlib
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.models.sales_records import Venta, Partida
+from src.utils.record_hasher import (RecordHasher, encode_canonical, get_compat_versions, HASH_VERSION_JSON,
+                                     HASH_VERSION_CANONICAL, HASH_VERSION_BLAKE2B, HASH_VERSION_XXH3)
+
+RECORD = {'Folio': 1, 'fecha': '01/07/2025 12:00:00 a. m.', 'total_bruto': 100.5,
+          'detalles': [{'REF': 'A1', 'cantidad': 2, 'precio': 50.25}], 'recibos': []}
+
+
+def test_json_version_matches_stored_hashes():
+    expected = hashlib.md5(json.dumps(RECORD, sort_keys=True).encode('utf-8')).hexdigest()
+    assert RecordHasher(HASH_VERSION_JSON).hash_record(RECORD) == expected
+
+
+def test_canonical_version_ignores_order_and_record_type():
+    hasher = RecordHasher(HASH_VERSION_CANONICAL)
+    reordered = dict(reversed(list(RECORD.items())))
+    venta = Venta(RECORD)
+    venta['detalles'] = [Partida(detail) for detail in RECORD['detalles']]
+    assert hasher.hash_record(RECORD) == hasher.hash_record(reordered) == hasher.hash_record(venta)
+    assert hasher.hash_record({'a': -0.0}) == hasher.hash_record({'a': 0.0})
+    assert hasher.hash_record({'a': 1}) != hasher.hash_record({'a': '1'})
+    assert hasher.hash_record({'a': 1}) != hasher.hash_record({'a': 1.0})
+
+
+def test_canonical_version_streams_large_records():
+    record = {'detalles': [{'REF': f'A{i}', 'precio': i / 3} for i in range(20000)]}
+    buffer = bytearray(b'RH2')
+    encode_canonical(record, buffer)
+    assert len(buffer) > 64 * 1024
+    expected = hashlib.md5(bytes(buffer)).hexdigest()
+    assert RecordHasher(HASH_VERSION_CANONICAL).hash_record(record) == expected
+
+
+def test_dataset_hash_comes_from_record_hashes():
+    records = [dict(RECORD, Folio=folio) for folio in range(5)]
+    for version in (HASH_VERSION_JSON, HASH_VERSION_CANONICAL):
+        hasher = RecordHasher(version)
+        hashes = [hasher.add(record) for record in records]
+        assert hasher.dataset_hash() == RecordHasher.combine(hashes, version)
+        assert hasher.dataset_hash() != RecordHasher.combine(hashes[::-1], version)
+    assert RecordHasher.combine([], HASH_VERSION_JSON) != RecordHasher.combine([], HASH_VERSION_CANONICAL)
+
+
+def test_versions_are_computed_in_one_pass():
+    versions = [HASH_VERSION_BLAKE2B, HASH_VERSION_JSON, HASH_VERSION_CANONICAL]
+    hashes = RecordHasher(HASH_VERSION_BLAKE2B).hash_record_versions(RECORD, versions)
+    assert hashes == {version: RecordHasher(version).hash_record(RECORD) for version in versions}
+    assert len(set(hashes.values())) == 3
+    assert all(len(value) == 32 for value in hashes.values())
+
+
+def test_detail_hash_keeps_the_stored_format_in_version_1():
+    detail = {'REF': 'A1', 'cantidad': 2}
+    assert RecordHasher(HASH_VERSION_JSON).hash_detail(detail) == hashlib.md5(str(sorted(detail.items())).encode()).hexdigest()
+    assert RecordHasher(HASH_VERSION_BLAKE2B).hash_detail(detail) == RecordHasher(HASH_VERSION_BLAKE2B).hash_record(detail)
+    hashes = RecordHasher(HASH_VERSION_BLAKE2B).hash_detail_versions(detail, [HASH_VERSION_BLAKE2B, HASH_VERSION_JSON])
+    assert hashes == {version: RecordHasher(version).hash_detail(detail) for version in (HASH_VERSION_BLAKE2B, HASH_VERSION_JSON)}
+
+
+def test_xxhash_is_optional():
+    try:
+        import xxhash  # noqa: F401
+    except ImportError:
+        try:
+            RecordHasher(HASH_VERSION_XXH3)
+        except ImportError as e:
+            assert 'xxhash' in str(e)
+        else:
+            raise AssertionError("Expected ImportError without xxhash")
+    else:
+        assert len(RecordHasher(HASH_VERSION_XXH3).hash_record(RECORD)) == 32
+
+
+def test_compat_versions_default_to_version_1():
+    os.environ.pop('HASH_COMPAT_VERSIONS', None)
+    assert get_compat_versions(HASH_VERSION_BLAKE2B) == [HASH_VERSION_JSON]
+    assert get_compat_versions(HASH_VERSION_JSON) == []
+    os.environ['HASH_COMPAT_VERSIONS'] = '2,3'
+    try:
+        assert get_compat_versions(HASH_VERSION_BLAKE2B) == [HASH_VERSION_CANONICAL]
+    finally:
+        del os.environ['HASH_COMPAT_VERSIONS']
+
+
+if __name__ == "__main__":
+    test_json_version_matches_stored_hashes()
+    test_canonical_version_ignores_order_and_record_type()
+    test_canonical_version_streams_large_records()
+    test_dataset_hash_comes_from_record_hashes()
+    test_versions_are_computed_in_one_pass()
+    test_detail_hash_keeps_the_stored_format_in_version_1()
+    test_xxhash_is_optional()
+    test_compat_versions_default_to_version_1()
+    print("Record hasher tests passed!")
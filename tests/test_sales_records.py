@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import hashlib
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.models.sales_records import Venta, Partida, Recibo, record_to_json
+
+HEADER = {'Cabecera': 'FA', 'Folio': 1, 'fecha': '01/07/2025 12:00:00 a. m.', 'total_bruto': 100.0, 'hor': 10, 'fpg': 'EF'}
+DETAIL = {'Folio': 1, 'REF': 'A1', 'cantidad': 2, 'precio': 50.0, 'iva_vta': '1'}
+RECEIPT = {'ref_recibo': 10, 'importe': 100.0, 'caja_bco': 'EF'}
+
+
+def build_sale():
+    venta = Venta(HEADER)
+    venta['detalles'] = [Partida(DETAIL)]
+    venta['recibos'] = [Recibo(RECEIPT)]
+    return venta
+
+
+def test_records_hash_like_dicts():
+    plain = dict(HEADER, detalles=[dict(DETAIL)], recibos=[dict(RECEIPT)])
+    expected = hashlib.md5(json.dumps(plain, sort_keys=True).encode('utf-8')).hexdigest()
+    venta = build_sale()
+    actual = hashlib.md5(json.dumps(venta, sort_keys=True, default=record_to_json).encode('utf-8')).hexdigest()
+    assert actual == expected
+    assert str(sorted(venta['detalles'][0].items())) == str(sorted(DETAIL.items()))
+
+
+def test_partida_reads_header_fields_once_attached():
+    venta = build_sale()
+    partida = venta['detalles'][0]
+    assert 'emp' not in partida
+    venta.update({'emp': 7, 'emp_div': 3, 'ser': 2, 'clt': 5, 'alm': 9})
+    partida.attach(venta)
+    assert partida['metodo_pago'] == 'EF'
+    assert partida['ser_vta'] == 2
+    assert partida.get('emp') == 7
+    assert partida.to_dict()['hor'] == 10
+    # Fields set on the partida take precedence over the header
+    partida['emp'] = 8
+    assert partida['emp'] == 8 and venta['emp'] == 7
+
+
+def test_records_behave_like_dicts():
+    recibo = Recibo(RECEIPT)
+    clone = recibo.copy()
+    clone['caja_bco'] = 4
+    assert recibo['caja_bco'] == 'EF' and clone['caja_bco'] == 4
+    assert recibo.get('missing', 'x') == 'x'
+    del clone['importe']
+    assert 'importe' not in clone and len(clone) == 2
+    assert not hasattr(recibo, '__dict__')
+
+
+def test_short_strings_are_interned():
+    first = Partida({'REF': ''.join(['A', '1'])})
+    second = Partida({'REF': ''.join(['A', '1'])})
+    assert first['REF'] is second['REF']
+
+
+if __name__ == "__main__":
+    test_records_hash_like_dicts()
+    test_partida_reads_header_fields_once_attached()
+    test_records_behave_like_dicts()
+    test_short_strings_are_interned()
+    print("Sales record tests passed!")
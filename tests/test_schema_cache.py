@@ -0,0 +1,30 @@
+import sys
+import tempfile
+from pathlib import Path
+
+# Set up project root
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.dbf_enc_reader.schema_cache import SchemaCache, TableSchema
+
+SCHEMA = TableSchema(['NO_REFEREN', 'TOTAL_BRUT'], ['System.String', 'System.Decimal'], [6, 10])
+
+def test_schema_is_reused_across_runs():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = str(Path(tmp_dir) / 'schema.json')
+        SchemaCache(path).set('venta.dbf', 'abc', SCHEMA)
+
+        assert SchemaCache(path).get('VENTA.DBF', 'abc') == SCHEMA
+
+def test_header_change_invalidates_schema():
+    cache = SchemaCache()
+    cache.set('VENTA.DBF', 'abc', SCHEMA)
+
+    assert cache.get('VENTA.DBF', 'def') is None
+    assert cache.get('PARTVTA.DBF', 'abc') is None
+
+if __name__ == "__main__":
+    test_schema_is_reused_across_runs()
+    test_header_change_invalidates_schema()
+    print("Schema cache tests passed!")
@@ -0,0 +1,103 @@
+import os
+import sys
+import threading
+import time
+from datetime import date
+from types import SimpleNamespace
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.controllers import main_workflow
+from src.controllers.main_workflow import WorkFlow
+from src.dbf_enc_reader.session import DBFSession
+
+
+class FakeWorkFlow(WorkFlow):
+    """Runs fake days, recording how many were in flight at once"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.submitted = []
+
+    def _run_day(self, config, day):
+        with self.lock:
+            self.submitted.append(day)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(0.01)
+            if day.day == 3:
+                raise RuntimeError("DBF not available")
+            return {'create_count': day.day, 'update_count': 1}
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def test_days_are_run_through_a_window_and_summed():
+    workflow = FakeWorkFlow()
+    config = SimpleNamespace(days_in_flight=2)
+    result = workflow.start_by_day(config, date(2025, 7, 1), date(2025, 7, 6))
+
+    assert workflow.max_running <= 2
+    assert sorted(workflow.submitted) == [date(2025, 7, day) for day in range(1, 7)]
+    assert result['status'] == 'failed_days'
+    assert result['failed'] == {date(2025, 7, 3): 'DBF not available'}
+    assert list(result['days']) == [date(2025, 7, day) for day in (1, 2, 4, 5, 6)]
+    assert result['summary'] == {'create_count': 1 + 2 + 4 + 5 + 6, 'update_count': 5}
+
+
+class FakeMatchesProcess:
+    """Records the objects and DBF session each day was compared with"""
+
+    runs = []
+    lock = threading.Lock()
+
+    def compare_data(self, config, start_date, end_date):
+        session = DBFSession.get(config.source_directory, 'secret')
+        # Another day in flight would show up here if objects were shared
+        time.sleep(0.01)
+        with self.lock:
+            self.runs.append((start_date, end_date, self, session, threading.get_ident()))
+        return {'api_operations': {'create': [start_date]}, 'summary': {'create_count': 1}}
+
+
+class FakeOP:
+    sent = []
+
+    def execute(self, operations):
+        self.sent.append((self, operations['create'][0]))
+
+
+def test_days_in_flight_do_not_share_objects_or_sessions():
+    originals = main_workflow.MatchesProcess, main_workflow.OP
+    main_workflow.MatchesProcess, main_workflow.OP = FakeMatchesProcess, FakeOP
+    FakeMatchesProcess.runs, FakeOP.sent = [], []
+    try:
+        config = SimpleNamespace(days_in_flight=3, source_directory=project_root)
+        result = WorkFlow().start_by_day(config, date(2025, 7, 1), date(2025, 7, 6))
+    finally:
+        main_workflow.MatchesProcess, main_workflow.OP = originals
+
+    days = [date(2025, 7, day) for day in range(1, 7)]
+    assert result['status'] == 'completed' and result['summary'] == {'create_count': 6}
+    runs = sorted(FakeMatchesProcess.runs, key=lambda run: run[0])
+    assert [(start, end) for start, end, *_ in runs] == [(day, day) for day in days]
+    # Every day had its own MatchesProcess, OP and DBF session, on more than one thread
+    # The runs keep every object alive, so their ids cannot be reused
+    assert len({id(process) for _, _, process, _, _ in runs}) == len(days)
+    assert len({id(op) for op, _ in FakeOP.sent}) == len(days)
+    assert len({id(session) for _, _, _, session, _ in runs}) == len(days)
+    assert len({thread for *_, thread in runs}) > 1
+    # The sessions of a day are closed when it is done
+    assert not DBFSession._sessions
+
+
+if __name__ == "__main__":
+    test_days_are_run_through_a_window_and_summed()
+    test_days_in_flight_do_not_share_objects_or_sessions()
+    print("Start by day tests passed!")
@@ -0,0 +1,320 @@
+import json
+import os
+import re
+import sys
+import tempfile
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.db import velneo_mapping_cache
+from src.db.velneo_mapping_cache import ArticuloResolver, VelneoMappingCache
+
+DB_CONFIG = {'host': 'localhost', 'database': 'test', 'user': 'test', 'password': 'test', 'port': '5432'}
+
+
+class FakeDatabase:
+    """Answers the queries of the mapping cache from dictionaries"""
+
+    def __init__(self, articulos=None, tables=None, cliente=None, watermarks=None):
+        self.articulos = articulos or {}
+        self.tables = tables or {}
+        self.cliente = cliente
+        self.watermarks = watermarks or {}  # Versions of velneo_map_version
+        self.version_table = True
+        self.queries = []
+        self.fail_after = None  # Number of queries that succeed before the next ones fail
+
+    def respond(self, query, params):
+        if self.fail_after is not None and len(self.queries) > self.fail_after:
+            raise RuntimeError("connection lost")
+        if 'FROM articulos' in query:
+            return [(ref, self.articulos[ref]) for ref in params[0] if ref in self.articulos]
+        if "to_regclass('velneo_map_version')" in query:
+            return [(self.version_table,)]
+        if 'FROM velneo_map_version' in query:
+            assert self.version_table
+            return [(table, version) for table, version in self.watermarks.items() if table in params[0]]
+        if query.startswith('SELECT\n'):
+            columns = re.findall(r'\) AS (\w+)', query)
+            return [tuple(self.cliente if column == 'cliente' else self.tables.get(column) for column in columns)]
+        raise AssertionError(f"Unexpected query {query}")
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.db.queries.append((query, params))
+        self.rows = self.db.respond(query, params)
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def fake_postgres(db):
+    """Route the cache's connections to a FakeDatabase"""
+    original = velneo_mapping_cache.psycopg2
+    velneo_mapping_cache.psycopg2 = SimpleNamespace(connect=lambda **config: FakeConnection(db))
+    VelneoMappingCache._version_table = None
+    try:
+        yield db
+    finally:
+        velneo_mapping_cache.psycopg2 = original
+        VelneoMappingCache._version_table = None
+
+
+def test_load_query_brings_every_table_in_one_select():
+    query = VelneoMappingCache.load_query()
+    assert query.startswith("SELECT\n")
+    assert query.count("SELECT") == 1 + 1 + len(VelneoMappingCache.TABLES)
+    assert "(SELECT velneo FROM clientes WHERE pvsi_clave = 'VTPUB' LIMIT 1) AS cliente" in query
+    assert "(SELECT json_object_agg(title, id_velneo) FROM general_misc WHERE title IS NOT NULL) AS general_misc" in query
+    assert "(SELECT json_object_agg(description, id) FROM pais WHERE description IS NOT NULL) AS pais" in query
+
+    # Only some tables, without the cliente
+    query = VelneoMappingCache.load_query(['iva', 'caja_banco'], cliente=False)
+    assert "clientes" not in query
+    assert query.index(" AS iva") < query.index(" AS caja_banco")
+    assert "metodo_pago" not in query
+
+
+def test_lookups_use_the_loaded_tables():
+    cache = VelneoMappingCache(DB_CONFIG)
+    cache.cliente = 7
+    cache.tables = {table: {} for table in VelneoMappingCache.TABLES}
+    cache.tables['general_misc'] = {'serie': 3, 'almacen': 4}
+    cache.tables['vendedores'] = {'12': 5}
+
+    assert cache.get_cliente() == 7
+    assert cache.get_from_general_serie() == 3
+    assert cache.get_from_general_alm() == 4
+    assert cache.get_from_general_plaza() is None
+    # References are looked up as text, like the pvsi_clave = str(reference) query
+    assert cache.get_vendedor(12) == 5
+    assert cache.get_metodo_pago(None) is None
+
+
+def test_articulos_are_resolved_in_chunks():
+    db = FakeDatabase({'A1': 10, 'A2': 20, 'A3': 30})
+    resolver = ArticuloResolver(DB_CONFIG, max_size=10, chunk_size=2)
+    with fake_postgres(db):
+        resolver.prefetch(['A1', 'A2', 'A1', 'A3', 'X1', None])
+        assert [params[0] for _, params in db.queries] == [['A1', 'A2'], ['A3', 'X1']]
+
+        # Known articulos and misses are not queried again
+        assert [resolver.get(ref) for ref in ('A1', 'A2', 'A3', 'X1')] == [10, 20, 30, None]
+        resolver.prefetch(['A1', 'X1'])
+        assert len(db.queries) == 2
+
+
+def test_lru_and_misses_are_bounded():
+    db = FakeDatabase({'A1': 10, 'A2': 20, 'A3': 30})
+    resolver = ArticuloResolver(DB_CONFIG, max_size=2, chunk_size=10)
+    with fake_postgres(db):
+        resolver.prefetch(['A1', 'A2'])
+        resolver.get('A1')  # A2 is now the least recently used
+        resolver.prefetch(['A3'])
+        assert list(resolver._cache) == ['A1', 'A3']
+
+        # A run of misses only keeps the latest ones
+        resolver.prefetch(['X1', 'X2', 'X3', 'X4'])
+        assert list(resolver._misses) == ['X3', 'X4']
+        assert list(resolver._cache) == ['A1', 'A3']
+
+        # An evicted articulo is fetched again on its own
+        assert resolver.get('A2') == 20
+        assert db.queries[-1][1] == (['A2'],)
+
+
+def test_failed_chunks_are_retried():
+    db = FakeDatabase({'A1': 10, 'A3': 30})
+    resolver = ArticuloResolver(DB_CONFIG, max_size=10, chunk_size=1)
+    with fake_postgres(db):
+        db.fail_after = 1
+        resolver.prefetch(['A1', 'X1', 'A3'])
+        # The first chunk was stored, the failed ones are neither found nor misses
+        assert list(resolver._cache) == ['A1']
+        assert not resolver._misses
+
+        db.fail_after = None
+        assert resolver.get('A3') == 30
+        assert resolver.get('X1') is None
+        assert list(resolver._misses) == ['X1']
+
+
+def make_loaded_cache(db, snapshot_path=None):
+    cache = VelneoMappingCache(DB_CONFIG, snapshot_path)
+    with fake_postgres(db):
+        assert cache.load()
+    db.queries.clear()
+    return cache
+
+
+def test_refresh_reloads_only_the_changed_tables():
+    tables = {table: {'1': 1} for table in VelneoMappingCache.TABLES}
+    watermarks = {table: 5 for table in VelneoMappingCache.WATCHED_TABLES}
+    db = FakeDatabase({'A1': 10}, tables, cliente=7, watermarks=watermarks)
+    cache = make_loaded_cache(db)
+    with fake_postgres(db):
+        assert cache.get_articulo('A1') == 10
+    db.queries.clear()
+
+    db.tables = dict(tables, iva={'1': 2}, pais={'1': 2})
+    db.watermarks = dict(watermarks, iva=6, articulos=6)
+    db.cliente = 8
+    with fake_postgres(db):
+        assert cache.refresh() == ['iva', 'articulos']
+        # Nothing changed since the last refresh
+        assert cache.refresh() == []
+
+    load_queries = [query for query, _ in db.queries if query.startswith('SELECT\n')]
+    assert len(load_queries) == 1 and re.findall(r'\) AS (\w+)', load_queries[0]) == ['iva']
+    assert cache.get_tipo_iva(1) == 2
+    # Tables and cliente without new writes keep the loaded values
+    assert cache.get_pais(1) == 1
+    assert cache.get_cliente() == 7
+    assert not cache.articulos._cache
+
+
+def test_tables_without_a_version_are_always_reloaded():
+    tables = {table: {'1': 1} for table in VelneoMappingCache.TABLES}
+    watermarks = {table: 5 for table in VelneoMappingCache.WATCHED_TABLES}
+    db = FakeDatabase(tables=tables, cliente=7, watermarks=watermarks)
+    cache = make_loaded_cache(db)
+
+    # A table whose trigger is missing has no version to compare
+    db.watermarks = {table: 5 for table in VelneoMappingCache.WATCHED_TABLES if table != 'pais'}
+    db.tables = dict(tables, pais={'1': 2})
+    with fake_postgres(db):
+        assert cache.refresh() == ['pais']
+        assert cache.refresh() == ['pais']
+    assert cache.get_pais(1) == 2
+
+    # Without the migration every table is reloaded, the version table is looked up once
+    db.version_table = False
+    db.tables = {table: {'1': 3} for table in VelneoMappingCache.TABLES}
+    db.cliente = 8
+    db.queries.clear()
+    with fake_postgres(db):
+        assert cache.refresh() == list(VelneoMappingCache.WATCHED_TABLES)
+        assert cache.refresh() == list(VelneoMappingCache.WATCHED_TABLES)
+    assert cache.get_cliente() == 8
+    assert all(cache.tables[table] == {'1': 3} for table in VelneoMappingCache.TABLES)
+    assert sum('to_regclass' in query for query, _ in db.queries) == 1
+
+
+def make_database():
+    tables = {table: {'1': 1} for table in VelneoMappingCache.TABLES}
+    watermarks = {table: 5 for table in VelneoMappingCache.WATCHED_TABLES}
+    return FakeDatabase(tables=tables, cliente=7, watermarks=watermarks)
+
+
+def test_snapshot_round_trip():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'velneo_mappings.json')
+        loaded = make_loaded_cache(make_database(), path)
+
+        cache = VelneoMappingCache(DB_CONFIG, path)
+        assert cache.load_snapshot()
+        assert cache.tables == loaded.tables and cache.cliente == 7
+        assert cache.watermarks == loaded.watermarks
+        # It is used only after being revalidated
+        assert not cache.validated
+
+
+def test_snapshots_of_another_database_or_incomplete_are_rejected():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'velneo_mappings.json')
+        make_loaded_cache(make_database(), path)
+        assert not VelneoMappingCache(dict(DB_CONFIG, database='other'), path).load_snapshot()
+
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        # Snapshots of the pg_stat counters cannot be compared with the versions
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(dict(snapshot, format=None), f)
+        assert not VelneoMappingCache(DB_CONFIG, path).load_snapshot()
+
+        del snapshot['tables']['iva']
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        cache = VelneoMappingCache(DB_CONFIG, path)
+        assert not cache.load_snapshot()
+        assert cache.tables is None
+
+        assert not VelneoMappingCache(DB_CONFIG, os.path.join(tmp_dir, 'missing.json')).load_snapshot()
+
+
+def shared_with_snapshot(db, path):
+    """Warm up and get the shared cache as a new process would"""
+    original_path = os.environ.get('VELNEO_MAP_SNAPSHOT_PATH')
+    os.environ['VELNEO_MAP_SNAPSHOT_PATH'] = path
+    try:
+        with fake_postgres(db):
+            VelneoMappingCache.warm_up(DB_CONFIG)
+            return VelneoMappingCache.shared(DB_CONFIG)
+    finally:
+        VelneoMappingCache._shared.clear()
+        if original_path is None:
+            del os.environ['VELNEO_MAP_SNAPSHOT_PATH']
+        else:
+            os.environ['VELNEO_MAP_SNAPSHOT_PATH'] = original_path
+
+
+def test_shared_cache_never_hands_out_a_stale_snapshot():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'velneo_mappings.json')
+        db = make_database()
+        make_loaded_cache(db, path)
+
+        # iva changed after the snapshot was saved
+        db.tables = dict(db.tables, iva={'1': 2})
+        db.watermarks = dict(db.watermarks, iva=6)
+        cache = shared_with_snapshot(db, path)
+        assert cache.validated
+        assert cache.get_tipo_iva(1) == 2
+
+        # Without Postgres the snapshot cannot be validated and is not used
+        db.fail_after = 0
+        db.queries.clear()
+        cache = shared_with_snapshot(db, path)
+        assert not cache.validated
+        assert cache.tables is None
+
+
+if __name__ == "__main__":
+    test_load_query_brings_every_table_in_one_select()
+    test_lookups_use_the_loaded_tables()
+    test_articulos_are_resolved_in_chunks()
+    test_lru_and_misses_are_bounded()
+    test_failed_chunks_are_retried()
+    test_refresh_reloads_only_the_changed_tables()
+    test_tables_without_a_version_are_always_reloaded()
+    test_snapshot_round_trip()
+    test_snapshots_of_another_database_or_incomplete_are_rejected()
+    test_shared_cache_never_hands_out_a_stale_snapshot()
+    print("Velneo mapping cache tests passed!")